@@ -1,4 +1,8 @@
 import json
+import os
+from functools import lru_cache
+from typing import Iterator, Mapping
+
 RPI = False
 
 abi_list = [
@@ -14,14 +18,34 @@ abi_list = [
 ]
 
 def rpi(path):
-    return "/mnt/usb/RPI4/KIDDO2/settings/abi/" + path 
+    return "/mnt/usb/RPI4/KIDDO2/settings/abi/" + path
 
+@lru_cache(maxsize=None)
 def get_abi(filename):
-
-    with open(f"./abi/{filename}.json" if not RPI else rpi(f"{filename}.json")) as f:
+    """Parsed ABI, read from disk once per process. Treat it as read-only."""
+    path = rpi(f"{filename}.json") if RPI else os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{filename}.json")
+    with open(path) as f:
         return json.load(f)
-        
+
 def get_abis():
     return {i: get_abi(i) for i in abi_list}
 
-ABI_FILES = get_abis()
\ No newline at end of file
+
+class _ABIRegistry(Mapping):
+    """
+    ABI_FILES["erc20_abi"] style access; each file is only read on first
+    lookup, so importing this module touches no files.
+    """
+
+    def __getitem__(self, name):
+        if name not in abi_list:
+            raise KeyError(name)
+        return get_abi(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(abi_list)
+
+    def __len__(self) -> int:
+        return len(abi_list)
+
+ABI_FILES = _ABIRegistry()
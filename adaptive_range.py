@@ -0,0 +1,99 @@
+# adaptive_range.py
+from __future__ import annotations
+import asyncio
+import threading
+from typing import Any, Dict, Hashable, Optional
+
+# Substrings providers use when a getLogs range is too heavy to serve
+_RANGE_ERROR_HINTS = (
+    "too many",
+    "query returned more than",
+    "response size",
+    "limit exceeded",
+    "exceeds the limit",
+    "block range",
+    "range is too large",
+    "timeout",
+    "timed out",
+)
+
+def is_range_error(exc: BaseException) -> bool:
+    """
+    True if exc means "ask for fewer blocks" rather than "endpoint is broken".
+    """
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    if "timeout" in type(exc).__name__.lower():
+        return True
+    msg = str(exc).lower()
+    return any(h in msg for h in _RANGE_ERROR_HINTS)
+
+
+class AdaptiveRange:
+    """
+    Per-key eth_getLogs span controller (key = contract, pool, ...).
+
+    - halves the span on "too many results" / timeouts
+    - grows it while responses stay sparse
+    - trims it towards `target_results` when responses get heavy
+
+    Safe to share between threads (get_swaps_multi's worker pool): every
+    read-modify-write of a span holds a lock.
+    """
+
+    def __init__(
+        self,
+        initial: int = 2000,
+        min_span: int = 1,
+        max_span: int = 100_000,
+        target_results: int = 2000,
+        growth: float = 2.0,
+    ):
+        self.initial = initial
+        self.min_span = min_span
+        self.max_span = max_span
+        self.target_results = target_results
+        self.growth = growth
+        self._spans: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, key: Hashable, default: Optional[int] = None) -> int:
+        """Current good span for key (seeded with default/initial)."""
+        with self._lock:
+            s = self._spans.get(key)
+            if s is None:
+                s = self._clamp(default or self.initial)
+                self._spans[key] = s
+            return s
+
+    def can_shrink(self, key: Hashable) -> bool:
+        return self.span(key) > self.min_span
+
+    def on_success(self, key: Hashable, span: int, n_results: int) -> None:
+        if n_results > self.target_results:
+            new = span * self.target_results // max(n_results, 1)
+        elif n_results < self.target_results // 4:
+            new = int(span * self.growth)
+        else:
+            new = span
+        with self._lock:
+            self._spans[key] = self._clamp(new)
+
+    def on_error(self, key: Hashable, span: int, exc: BaseException) -> bool:
+        """
+        Shrink after a range-type error. Returns True if the caller should
+        retry the same start with the smaller span, False to treat exc normally.
+        """
+        if not is_range_error(exc) or span <= self.min_span:
+            return False
+        with self._lock:
+            # another thread may have shrunk it further meanwhile: keep the smaller
+            self._spans[key] = min(self._spans.get(key, span), self._clamp(span // 2))
+        return True
+
+    def snapshot(self) -> Dict[Any, int]:
+        with self._lock:
+            return dict(self._spans)
+
+    def _clamp(self, span: int) -> int:
+        return max(self.min_span, min(self.max_span, int(span)))
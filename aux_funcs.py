@@ -1,13 +1,19 @@
 from __future__ import annotations
 import os
 from decimal import Decimal, getcontext
-from datetime import datetime, timezone
-from typing import Any, Dict, Optional, Tuple
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from web3 import Web3
-from tortoise.exceptions import IntegrityError
+from web3 import Web3, AsyncWeb3
+
+from rpc import get_backend
+from block_cache import BLOCK_TS
 
 from store.models import Token, Pool, Swap, Transfer  # your Tortoise models
+from store.writer import BatchWriter
+from store.cache import MODELS
+from store.rollups import RollupEngine
+from store.balances import BalanceLedger
 
 getcontext().prec = 60
 
@@ -15,6 +21,14 @@ getcontext().prec = 60
 # Web3 singleton
 # ---------------------------------------------------------------------
 _W3: Optional[Web3] = None
+_AW3: Optional[AsyncWeb3] = None
+
+def _rpc_candidates() -> list[str]:
+    urls = os.environ.get("RPC_URLS", "").strip()
+    return [u.strip() for u in urls.split(",") if u.strip()] if urls else [
+        "https://evm.shidoscan.net/",
+        "https://rpc-nodes.shidoscan.com",
+    ]
 
 def get_w3() -> Web3:
     """
@@ -25,12 +39,7 @@ def get_w3() -> Web3:
     if _W3 is not None:
         return _W3
 
-    urls = os.environ.get("RPC_URLS", "").strip()
-    candidates = [u.strip() for u in urls.split(",") if u.strip()] if urls else [
-        "https://evm.shidoscan.net/",
-        "https://rpc-nodes.shidoscan.com",
-    ]
-    for url in candidates:
+    for url in _rpc_candidates():
         w3 = Web3(Web3.HTTPProvider(url))
         try:
             if w3.is_connected():
@@ -42,101 +51,74 @@ def get_w3() -> Web3:
         raise RuntimeError("No RPC reachable. Set RPC_URLS or fix defaults.")
     return _W3
 
-# ---------------------------------------------------------------------
-# Minimal ABIs / caches
-# ---------------------------------------------------------------------
-ERC20_ABI = [
-    {"name": "symbol",   "outputs":[{"type":"string"}], "inputs":[], "stateMutability":"view", "type":"function"},
-    {"name": "decimals", "outputs":[{"type":"uint8"}],  "inputs":[], "stateMutability":"view", "type":"function"},
-]
+async def get_async_w3() -> AsyncWeb3:
+    """
+    Async twin of get_w3(): same RPC candidates, but served by the shared
+    pooled backend in rpc.py so handler calls never block the event loop.
+    """
+    global _AW3
+    if _AW3 is not None:
+        return _AW3
 
-POOL_ABI = [
-    {"name":"token0","outputs":[{"type":"address"}],"inputs":[],"stateMutability":"view","type":"function"},
-    {"name":"token1","outputs":[{"type":"address"}],"inputs":[],"stateMutability":"view","type":"function"},
-    {"name":"fee",   "outputs":[{"type":"uint24"}],    "inputs":[],"stateMutability":"view","type":"function"},
-]
+    backend = get_backend()
+    for url in _rpc_candidates():
+        w3 = await backend.connect(url)
+        try:
+            if await w3.is_connected():
+                _AW3 = w3
+                break
+        except Exception:
+            pass
+    if _AW3 is None:
+        raise RuntimeError("No RPC reachable. Set RPC_URLS or fix defaults.")
+    return _AW3
 
-_TOKEN_META: Dict[str, Tuple[str,int]] = {}   # token -> (symbol, decimals)
-_POOL_TOKENS: Dict[str, Tuple[str,str,Optional[int]]] = {}  # pool -> (t0, t1, fee or None)
-_BLOCK_TS: Dict[int, datetime] = {}           # blockNumber -> aware datetime
+# ---------------------------------------------------------------------
+# Caches / buffers
+# ---------------------------------------------------------------------
+# Swap/Transfer rows are buffered here and bulk-inserted; wire WRITER.flush
+# into AsyncEVME(flush_hooks=[...]) so checkpoints only move after a flush.
+# Rollups and holder balances are updated inside each flush transaction.
+ROLLUPS = RollupEngine()
+BALANCES = BalanceLedger()
+WRITER = BatchWriter(hooks=[ROLLUPS.on_flush, BALANCES.on_flush])
 
 def _short(x: str, n=6) -> str:
     x = x.lower()
     return f"{x[:2+n]}…{x[-n:]}"
 
-def _block_ts(w3: Web3, block_number: int) -> datetime:
-    ts = _BLOCK_TS.get(block_number)
-    if ts is None:
-        b = w3.eth.get_block(block_number)
-        ts = datetime.fromtimestamp(int(b.timestamp), timezone.utc)
-        _BLOCK_TS[block_number] = ts
-        # keep cache bounded
-        if len(_BLOCK_TS) > 4096:
-            _BLOCK_TS.clear()
-    return ts
-
-def _erc20_meta(w3: Web3, addr: str) -> Tuple[str, int]:
-    addr = Web3.to_checksum_address(addr)
-    if addr in _TOKEN_META:
-        return _TOKEN_META[addr]
-    c = w3.eth.contract(address=addr, abi=ERC20_ABI)
-    sym = c.functions.symbol().call()
-    # handle weird bytes32 symbols if any
-    if isinstance(sym, (bytes, bytearray)):
-        try:
-            sym = sym.decode("utf-8").rstrip("\x00")
-        except Exception:
-            sym = sym.hex()
-    dec = int(c.functions.decimals().call())
-    _TOKEN_META[addr] = (sym, dec)
-    return sym, dec
-
-def _pool_meta(w3: Web3, pool: str) -> Tuple[str, str, Optional[int]]:
-    pool = Web3.to_checksum_address(pool)
-    if pool in _POOL_TOKENS:
-        return _POOL_TOKENS[pool]
-    c = w3.eth.contract(address=pool, abi=POOL_ABI)
-    t0 = Web3.to_checksum_address(c.functions.token0().call())
-    t1 = Web3.to_checksum_address(c.functions.token1().call())
-    fee: Optional[int] = None
-    try:
-        fee = int(c.functions.fee().call())
-    except Exception:
-        fee = None
-    _POOL_TOKENS[pool] = (t0, t1, fee)
-    return t0, t1, fee
+async def _block_ts(w3: AsyncWeb3, block_number: int) -> datetime:
+    # shared LRU (+ blocks table); usually warm thanks to prefetch_block_ts
+    return await BLOCK_TS.get(w3, block_number)
+
+async def prefetch_block_ts(events: List[Any]) -> None:
+    """
+    AsyncEVME prefetch hook: resolve the timestamps of every distinct block in
+    a chunk with batched RPC before the handlers run.
+    """
+    if events:
+        w3 = await get_async_w3()
+        await BLOCK_TS.prefetch(w3, {int(_evt_get(e, "blockNumber")) for e in events})
 
 # ---------------------------------------------------------------------
 # DB upserters (async)
 # ---------------------------------------------------------------------
-async def _get_or_create_token(w3: Web3, addr: str) -> Token:
-    addr = Web3.to_checksum_address(addr)
-    tok = await Token.get_or_none(address=addr)
-    if tok:
-        # backfill meta if missing
-        if tok.symbol is None or tok.decimals is None:
-            sym, dec = _erc20_meta(w3, addr)
-            tok.symbol, tok.decimals = sym, dec
-            await tok.save()
-        return tok
-    sym, dec = _erc20_meta(w3, addr)
-    tok = await Token.create(address=addr, symbol=sym, decimals=dec)
-    return tok
-
-async def _get_or_create_pool(w3: Web3, pool_addr: str) -> Pool:
-    pool_addr = Web3.to_checksum_address(pool_addr)
+async def _get_or_create_token(w3: AsyncWeb3, addr: str) -> Token:
+    # identity map; misses are read/created in bulk
+    return await MODELS.token(w3, addr)
 
-    # get_or_none returns instance or None; use fetch_related on instance
-    p = await Pool.get_or_none(address=pool_addr)
-    if p:
-        await p.fetch_related("token0", "token1")
-        return p
+async def _get_or_create_pool(w3: AsyncWeb3, pool_addr: str) -> Pool:
+    # identity map; comes with token0/token1 attached
+    return await MODELS.pool(w3, pool_addr)
 
-    t0_addr, t1_addr, fee = _pool_meta(w3, pool_addr)
-    t0 = await _get_or_create_token(w3, t0_addr)
-    t1 = await _get_or_create_token(w3, t1_addr)
-    p = await Pool.create(address=pool_addr, token0=t0, token1=t1, fee=fee)
-    return p
+async def prefetch_models(events: List[Any]) -> None:
+    """
+    AsyncEVME prefetch hook: create/load every pool and token a chunk touches
+    with one batched metadata read instead of a few calls per event.
+    """
+    if events:
+        w3 = await get_async_w3()
+        await MODELS.prefetch_events(w3, events)
 
 def _evt_get(e: Any, key: str, default=None):
     """
@@ -162,7 +144,7 @@ async def my_func(evt: Any, **kwargs) -> None:
     Uniswap V3 Swap event handler (async).
     Saves into DB (Pool/Token upserted automatically).
     """
-    w3 = get_w3()
+    w3 = await get_async_w3()
 
     pool_addr   = Web3.to_checksum_address(_evt_get(evt, "address"))
     block_num   = int(_evt_get(evt, "blockNumber"))
@@ -188,11 +170,11 @@ async def my_func(evt: Any, **kwargs) -> None:
     pool = await _get_or_create_pool(w3, pool_addr)
 
     # block timestamp
-    ts = _block_ts(w3, block_num)
+    ts = await _block_ts(w3, block_num)
 
-    # insert (idempotent by unique (tx_hash, log_index))
+    # buffered insert (idempotent by unique (tx_hash, log_index))
     try:
-        await Swap.create(
+        await WRITER.add(Swap(
             pool=pool,
             block_number=block_num,
             tx_hash=tx_hash_hex,
@@ -204,11 +186,12 @@ async def my_func(evt: Any, **kwargs) -> None:
             sqrt_price_x96=str(int(sqrtP)) if sqrtP is not None else "0",
             liquidity=str(int(liq)) if liq is not None else "0",
             tick=int(tick) if tick is not None else None,
+            amount0_num=amount0_i,
+            amount1_num=amount1_i,
+            sqrt_price_x96_num=int(sqrtP) if sqrtP is not None else 0,
+            liquidity_num=int(liq) if liq is not None else 0,
             ts=ts,
-        )
-    except IntegrityError:
-        # already inserted; you could update fields if you want
-        pass
+        ))
     except Exception as e:
         print(
             f"[Swap][ERROR] blk {block_num} tx {tx_hash_hex} log {log_index} "
@@ -224,7 +207,7 @@ async def handle_transfer(evt: Any, **kwargs) -> None:
     ERC-20 Transfer event handler (async).
     Saves into DB (Token upserted automatically).
     """
-    w3 = get_w3()
+    w3 = await get_async_w3()
 
     token_addr = Web3.to_checksum_address(_evt_get(evt, "address"))
     block_num  = int(_evt_get(evt, "blockNumber"))
@@ -240,10 +223,10 @@ async def handle_transfer(evt: Any, **kwargs) -> None:
     value_str = str(int(value_raw))
 
     token = await _get_or_create_token(w3, token_addr)
-    ts = _block_ts(w3, block_num)
+    ts = await _block_ts(w3, block_num)
 
     try:
-        await Transfer.create(
+        await WRITER.add(Transfer(
             token=token,
             block_number=block_num,
             tx_hash=tx_hash_hex,
@@ -251,10 +234,9 @@ async def handle_transfer(evt: Any, **kwargs) -> None:
             from_addr=Web3.to_checksum_address(from_addr),
             to_addr=Web3.to_checksum_address(to_addr),
             value_raw=value_str,
+            value_num=int(value_raw),
             ts=ts,
-        )
-    except IntegrityError:
-        pass
+        ))
     except Exception as e:
         print(
             f"[Transfer][ERROR] blk {block_num} tx {tx_hash_hex} log {log_index} "
@@ -267,7 +249,7 @@ async def handle_transfer(evt: Any, **kwargs) -> None:
 
 # Optional stub to keep your map happy if you still route "Mint"
 async def lp_mint(evt: Any, **kwargs) -> None:
-    w3 = get_w3()
+    w3 = await get_async_w3()
     pool_addr = Web3.to_checksum_address(_evt_get(evt, "address"))
     await _get_or_create_pool(w3, pool_addr)
     print(f"[Mint] blk {_evt_get(evt,'blockNumber')} | pool {_short(pool_addr)}")
@@ -0,0 +1,91 @@
+# benchmarks/bench_decode.py
+"""
+Decoded logs per second: web3 process_log / get_event_data vs decoders.py.
+
+    python -m benchmarks.bench_decode [n_logs]
+"""
+import sys
+import time
+from typing import Any, Dict, List
+
+from eth_abi import encode
+from hexbytes import HexBytes
+from web3 import Web3
+from web3._utils.events import get_event_data
+
+from abi.get_abis import ABI_FILES
+from decoders import LogDecoder, get_event_decoder
+from weirdTool.fetcher import SWAP_EVENT_ABI
+
+POOL = "0xc57e71F33C2Ce6FDcC6535F2d62e045053C10C91"
+TOKEN = "0x525d1e8Df8889A2E8d40bE24d8A21d18Ec161f7F"
+
+def _addr_topic(i: int) -> HexBytes:
+    return HexBytes(b"\x00" * 12 + i.to_bytes(20, "big"))
+
+def synthetic_logs(n: int) -> List[Dict[str, Any]]:
+    """Alternating Swap/Transfer logs, already in web3's formatted shape."""
+    swap0 = Web3.keccak(text="Swap(address,address,int256,int256,uint160,uint128,int24)")
+    transfer0 = Web3.keccak(text="Transfer(address,address,uint256)")
+    logs = []
+    for i in range(n):
+        blk = 1_000_000 + i // 4
+        if i % 2 == 0:
+            addr, topics = POOL, [swap0, _addr_topic(i % 97 + 1), _addr_topic(i % 89 + 1)]
+            data = encode(["int256", "int256", "uint160", "uint128", "int24"], [10**18 + i, -(10**17) - i, 2**96 + i, 10**20, -i % 800])
+        else:
+            addr, topics = TOKEN, [transfer0, _addr_topic(i % 97 + 1), _addr_topic(i % 89 + 1)]
+            data = encode(["uint256"], [i * 10**18])
+        logs.append({
+            "address": addr,
+            "topics": topics,
+            "data": HexBytes(data),
+            "blockNumber": blk,
+            "blockHash": HexBytes(blk.to_bytes(32, "big")),
+            "transactionHash": HexBytes(i.to_bytes(32, "big")),
+            "transactionIndex": 0,
+            "logIndex": i % 4,
+            "removed": False,
+        })
+    return logs
+
+def _rate(label: str, n: int, fn) -> float:
+    t = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t
+    print(f"{label:<34} {n / dt:>12,.0f} logs/s  ({dt * 1000:.1f} ms)")
+    return n / dt
+
+def main(n: int = 20_000) -> None:
+    logs = synthetic_logs(n)
+    w3 = Web3()
+    pool = w3.eth.contract(address=POOL, abi=ABI_FILES["lp_pair_abi"])
+    token = w3.eth.contract(address=TOKEN, abi=ABI_FILES["erc20_abi"])
+    swap_topic = logs[0]["topics"][0]
+
+    def web3_process_log():
+        for lg in logs:
+            c, name = (pool, "Swap") if lg["topics"][0] == swap_topic else (token, "Transfer")
+            c.events[name]().process_log(lg)
+
+    swaps = [lg for lg in logs if lg["topics"][0] == swap_topic]
+
+    def web3_get_event_data():
+        for lg in swaps:
+            get_event_data(w3.codec, SWAP_EVENT_ABI, lg)
+
+    decoder = LogDecoder([
+        get_event_decoder(ABI_FILES["lp_pair_abi"], "Swap"),
+        get_event_decoder(ABI_FILES["erc20_abi"], "Transfer"),
+    ])
+    swap_decoder = get_event_decoder(SWAP_EVENT_ABI)
+
+    print(f"{n:,} synthetic logs ({len(swaps):,} Swap)")
+    base = _rate("web3 process_log (AsyncEVME old)", n, web3_process_log)
+    fast = _rate("LogDecoder.decode_logs", n, lambda: decoder.decode_logs(logs))
+    base_s = _rate("get_event_data (fetcher old)", len(swaps), web3_get_event_data)
+    fast_s = _rate("EventDecoder.decode_logs", len(swaps), lambda: swap_decoder.decode_logs(swaps))
+    print(f"speedup: AsyncEVME x{fast / base:.1f}, fetcher x{fast_s / base_s:.1f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
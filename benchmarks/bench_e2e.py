@@ -0,0 +1,246 @@
+# benchmarks/bench_e2e.py
+"""
+End-to-end ingestion throughput against benchmarks.mockchain: the whole path
+from eth_getLogs to committed rows, with the real aux_funcs handlers and
+store writers.
+
+    python -m benchmarks.bench_e2e [--blocks 10000] [--density 1.0]
+        [--latency-ms 0] [--jitter-ms 0] [--error-rate 0] [--max-range 0]
+        [--db postgres://...] [--scenarios evme,evme_pipeline,weirdtool]
+        [--label text] [--no-save]
+
+The mock chain is served from this process; each scenario runs in a fresh
+interpreter (so the process-wide caches start cold and peak RSS is the
+scenario's own). Reported per scenario:
+
+- logs/s: logs handled (or swaps returned) per second of wall time
+- RPC/1k: JSON-RPC calls the mock served per 1000 logs (HTTP/1k: requests,
+  a batch is one)
+- callback p50/p99: per-event handler latency
+- peak RSS of the scenario process
+
+Each run is appended to benchmarks/results/e2e.jsonl with the git revision,
+and compared with the last stored run of the same scenario and settings.
+Without --db every scenario writes to a fresh SQLite file; a --db database
+should be a scratch one, since rows from earlier runs are skipped as
+duplicates.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, "benchmarks", "results", "e2e.jsonl")
+
+SCENARIOS = ("evme", "evme_pipeline", "weirdtool")
+
+# ---------------------------------------------------------------------
+# Scenarios (run in the child process)
+# ---------------------------------------------------------------------
+def _chain(cfg: Dict[str, Any]):
+    from benchmarks.mockchain import MockChain
+    return MockChain(**cfg["chain"])
+
+async def _evme(cfg: Dict[str, Any], **fetcher_kwargs) -> Dict[str, Any]:
+    import aux_funcs
+    from abi.get_abis import get_abi
+    from evme import AsyncEVME
+    from store.db import close_db, init_db
+
+    chain = _chain(cfg)
+    latencies: List[float] = []
+
+    def recorded(fn):
+        async def run(evt):
+            t0 = time.perf_counter()
+            await fn(evt)
+            latencies.append(time.perf_counter() - t0)
+        return run
+
+    contracts = {**{p: get_abi("lp_pair_abi") for p in chain.pools}, **{t: get_abi("erc20_abi") for t in chain.tokens}}
+    callbacks = {
+        **{p: {"Swap": recorded(aux_funcs.my_func)} for p in chain.pools},
+        **{t: {"Transfer": recorded(aux_funcs.handle_transfer)} for t in chain.tokens},
+    }
+    await init_db(cfg["db"])
+    try:
+        fetcher = AsyncEVME(
+            [cfg["url"]],
+            contracts,
+            callbacks,
+            start_from_block=1,
+            combined_requests=True,
+            flush_hooks=[aux_funcs.WRITER.flush],
+            prefetch_hooks=[aux_funcs.prefetch_models, aux_funcs.prefetch_block_ts],
+            metrics_log_every=None,
+            **fetcher_kwargs,
+        )
+        t0 = time.perf_counter()
+        await fetcher.fetch_logs(chunk_size=cfg["chunk"])
+        seconds = time.perf_counter() - t0
+        complete = fetcher.to_block is not None and fetcher.from_block > fetcher.to_block
+        await fetcher.rpc.close()
+    finally:
+        await close_db()
+    return {"logs": len(latencies), "seconds": seconds, "complete": complete, "latencies": latencies}
+
+def _weirdtool(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    from web3 import Web3
+    from weirdTool.fetcher import get_swaps_multi
+
+    chain = _chain(cfg)
+    w3 = Web3(Web3.HTTPProvider(cfg["url"]))
+    t0 = time.perf_counter()
+    swaps = get_swaps_multi(w3, chain.pools, from_block=1, to_block=chain.head, block_span=cfg["chunk"], verbose=False)
+    return {"logs": len(swaps), "seconds": time.perf_counter() - t0, "complete": True, "latencies": []}
+
+def _run_child(scenario: str, cfg: Dict[str, Any]) -> None:
+    os.environ["RPC_URLS"] = cfg["url"]  # aux_funcs' own RPC client
+    logging.basicConfig(level=logging.WARNING)
+    out = sys.stdout
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):  # handlers print every event
+        if scenario == "evme":
+            res = asyncio.run(_evme(cfg))
+        elif scenario == "evme_pipeline":
+            res = asyncio.run(_evme(cfg, handler_workers=4))
+        elif scenario == "weirdtool":
+            res = _weirdtool(cfg)
+        else:
+            raise SystemExit(f"unknown scenario {scenario}")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    res["peak_rss_mb"] = rss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+    lat = sorted(res.pop("latencies"))
+    res["cb_p50_ms"] = lat[len(lat) // 2] * 1000 if lat else None
+    res["cb_p99_ms"] = lat[min(len(lat) - 1, int(0.99 * len(lat)))] * 1000 if lat else None
+    print(json.dumps(res), file=out)
+
+
+# ---------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------
+def _git_revision() -> Dict[str, Any]:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "-uno"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+def _previous(scenario: str, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(RESULTS):
+        return None
+    last = None
+    with open(RESULTS) as f:
+        for line in f:
+            rec = json.loads(line)
+            if rec["scenario"] == scenario and rec["settings"] == settings:
+                last = rec
+    return last
+
+def run_scenario(scenario: str, chain, settings: Dict[str, Any], db: Optional[str], tmp: str) -> Dict[str, Any]:
+    cfg = {
+        "url": chain.url,
+        "chain": settings["chain"],
+        "chunk": settings["chunk"],
+        "db": db or f"sqlite://{os.path.join(tmp, scenario + '.sqlite3')}",
+    }
+    before, requests = dict(chain.calls), chain.requests
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_e2e", "--child", scenario, json.dumps(cfg)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(f"{scenario} failed:\n{proc.stderr[-2000:]}")
+    res = json.loads(proc.stdout.strip().splitlines()[-1])
+    by_method = {m: n - before.get(m, 0) for m, n in chain.calls.items() if n > before.get(m, 0)}
+    calls = sum(by_method.values())
+    res["rpc_calls"] = by_method
+    res["rpc_per_1k_logs"] = calls * 1000 / res["logs"] if res["logs"] else None
+    res["http_per_1k_logs"] = (chain.requests - requests) * 1000 / res["logs"] if res["logs"] else None
+    res["logs_per_s"] = res["logs"] / res["seconds"] if res["seconds"] else None
+    return res
+
+def _fmt(v: Optional[float], spec: str) -> str:
+    return "-" if v is None else format(v, spec)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    ap.add_argument("--blocks", type=int, default=10_000)
+    ap.add_argument("--density", type=float, default=1.0, help="logs per block")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of eth_getLogs that fail")
+    ap.add_argument("--max-range", type=int, default=0, help="eth_getLogs block limit (0: none)")
+    ap.add_argument("--chunk", type=int, default=2000, help="initial getLogs span")
+    ap.add_argument("--db", help="Tortoise DB URL (default: a fresh SQLite file per scenario)")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--label", default="", help="stored with the results")
+    ap.add_argument("--no-save", action="store_true")
+    args = ap.parse_args(argv)
+
+    if args.child:
+        return _run_child(args.child[0], json.loads(args.child[1]))
+
+    from benchmarks.mockchain import MockChain
+
+    settings = {
+        "chain": {
+            "head": args.blocks,
+            "density": args.density,
+            "latency": args.latency_ms / 1000,
+            "jitter": args.jitter_ms / 1000,
+            "error_rate": args.error_rate,
+            "max_range": args.max_range,
+        },
+        "chunk": args.chunk,
+        "db": "postgres" if args.db and args.db.startswith("postgres") else "sqlite",
+    }
+    chain = MockChain(**settings["chain"])
+    chain.warm()
+    chain.start()
+    print(f"mock chain {chain.url}: {args.blocks:,} blocks, {chain.logs_total():,} logs")
+    print(f"{'scenario':<15} {'logs':>8} {'logs/s':>9} {'RPC/1k':>8} {'HTTP/1k':>8} {'cb p50':>8} {'cb p99':>8} {'RSS MB':>7}  vs last")
+    rev = _git_revision()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for scenario in [s for s in args.scenarios.split(",") if s]:
+                prev = _previous(scenario, settings)
+                res = run_scenario(scenario, chain, settings, args.db, tmp)
+                vs = "-"
+                if prev and prev["result"].get("logs_per_s") and res["logs_per_s"]:
+                    vs = f"{100 * (res['logs_per_s'] / prev['result']['logs_per_s'] - 1):+.0f}% logs/s vs {prev['commit']}"
+                print(
+                    f"{scenario:<15} {res['logs']:>8,} {_fmt(res['logs_per_s'], ',.0f'):>9} "
+                    f"{_fmt(res['rpc_per_1k_logs'], '.1f'):>8} {_fmt(res['http_per_1k_logs'], '.1f'):>8} {_fmt(res['cb_p50_ms'], '.2f'):>8} "
+                    f"{_fmt(res['cb_p99_ms'], '.2f'):>8} {res['peak_rss_mb']:>7.0f}  {vs}"
+                    + ("" if res["complete"] else "  (incomplete)")
+                )
+                if not args.no_save:
+                    os.makedirs(os.path.dirname(RESULTS), exist_ok=True)
+                    with open(RESULTS, "a") as f:
+                        f.write(json.dumps({
+                            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                            **rev,
+                            "label": args.label,
+                            "python": platform.python_version(),
+                            "scenario": scenario,
+                            "settings": settings,
+                            "result": res,
+                        }) + "\n")
+    finally:
+        chain.stop()
+
+if __name__ == "__main__":
+    main()
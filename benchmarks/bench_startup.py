@@ -0,0 +1,66 @@
+# benchmarks/bench_startup.py
+"""
+Cold start cost of the entry points: wall time, heavy modules pulled in and
+outbound connections attempted, each measured in a fresh interpreter.
+
+    python -m benchmarks.bench_startup [repeats]
+"""
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (label, statement timed in the child)
+TARGETS = [
+    ("import reader", "import reader"),
+    ("import settings", "import settings"),
+    ("import evme_config", "import evme_config"),
+    ("import main", "import main"),
+    ("evme_config.fetcher (first use)", "import evme_config; evme_config.fetcher"),
+]
+
+HEAVY = ("web3", "aiohttp", "tortoise", "evme", "aux_funcs")
+
+# runs in the child: count socket connects, time the statement, report as JSON
+_PROBE = """
+import json, socket, sys, time
+connects = []
+_orig = socket.socket.connect
+def _connect(self, addr):
+    connects.append(str(addr))
+    return _orig(self, addr)
+socket.socket.connect = _connect
+t = time.perf_counter()
+try:
+    exec(sys.argv[1])
+    error = None
+except Exception as e:
+    error = f"{type(e).__name__}: {e}"
+dt = time.perf_counter() - t
+print(json.dumps({"seconds": dt, "connects": connects, "error": error,
+                  "heavy": [m for m in sys.argv[2].split(",") if m in sys.modules]}))
+"""
+
+def run_once(stmt: str) -> Dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE, stmt, ",".join(HEAVY)],
+        cwd=ROOT, capture_output=True, text=True, timeout=120,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main(repeats: int = 3) -> None:
+    print(f"{'target':<34} {'best':>8} {'connects':>9}  heavy modules loaded")
+    for label, stmt in TARGETS:
+        runs: List[Dict] = [run_once(stmt) for _ in range(repeats)]
+        best = min(r["seconds"] for r in runs)
+        last = runs[-1]
+        if last["error"]:
+            print(f"{label:<34} {'-':>8} {'-':>9}  failed: {last['error']}")
+            continue
+        print(f"{label:<34} {best * 1000:>6.0f}ms {len(last['connects']):>9}  {', '.join(last['heavy']) or '-'}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,127 @@
+# benchmarks/check_live.py
+"""
+Exactly-once check for AsyncEVME.run_live against benchmarks.mockchain:
+blocks are mined while the subscription is up, the WebSocket is cut
+(drop_sockets) a few times with more blocks mined while it is down, and at
+the end every watched log of the chain must have reached its callback once,
+no duplicates and no gaps.
+
+    python -m benchmarks.check_live [--blocks 200] [--density 2] [--drops 3]
+
+Exits non-zero on a mismatch.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from abi.get_abis import get_abi
+from benchmarks.mockchain import MockChain
+from evme import AsyncEVME
+
+async def _wait(cond, timeout: float, what: str) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"timed out waiting for {what}")
+        await asyncio.sleep(0.05)
+
+async def check(chain: MockChain, blocks: int, drops: int, ckpt: str) -> Tuple[Counter, Counter]:
+    seen: Counter = Counter()
+
+    async def record(evt):
+        seen[(evt.address.lower(), evt.blockNumber, evt.logIndex)] += 1
+
+    contracts = {**{p: get_abi("lp_pair_abi") for p in chain.pools}, **{t: get_abi("erc20_abi") for t in chain.tokens}}
+    callbacks = {**{p: {"Swap": record} for p in chain.pools}, **{t: {"Transfer": record} for t in chain.tokens}}
+    fetcher = AsyncEVME(
+        [chain.url],
+        contracts,
+        callbacks,
+        start_from_block=1,
+        persistence_file=ckpt,
+        combined_requests=True,
+        metrics_log_every=None,
+    )
+    done = lambda: fetcher.checkpoints and min(fetcher.checkpoints.values()) >= chain.head
+    live = asyncio.create_task(
+        fetcher.run_live(chain.ws_url, poll_interval=0.2, reconnect_delay=0.5, max_reconnect_delay=1, settle=0.2)
+    )
+    try:
+        await _wait(done, 60, "the initial backfill")
+        # rounds of: mine over the socket, cut it, mine while it is down
+        per_round = max(1, blocks // (2 * drops + 1))
+        for _ in range(drops):
+            opened = chain.subscriptions
+            for _ in range(per_round):
+                await asyncio.to_thread(chain.mine, 1)
+                await asyncio.sleep(0.02)
+            await asyncio.to_thread(chain.drop_sockets)
+            for _ in range(per_round):
+                await asyncio.to_thread(chain.mine, 1)
+                await asyncio.sleep(0.02)
+            await _wait(lambda: chain.subscriptions > opened, 30, "the subscription to come back")
+        for _ in range(per_round):
+            await asyncio.to_thread(chain.mine, 1)
+            await asyncio.sleep(0.02)
+        await _wait(done, 60, f"the checkpoint to reach block {chain.head}")
+        await asyncio.sleep(0.5)  # anything late would be a duplicate
+    finally:
+        live.cancel()
+        await asyncio.gather(live, return_exceptions=True)
+
+    watched = {a.lower() for a in chain.pools + chain.tokens}
+    expected = Counter(
+        (lg["address"], int(lg["blockNumber"], 16), int(lg["logIndex"], 16))
+        for n in range(1, chain.head + 1)
+        for lg in chain.block_logs(n)
+        if lg["address"] in watched
+    )
+    return expected, seen
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--blocks", type=int, default=200, help="blocks mined after the backfill")
+    ap.add_argument("--density", type=float, default=2.0, help="logs per block")
+    ap.add_argument("--history", type=int, default=500, help="blocks before the live phase")
+    ap.add_argument("--drops", type=int, default=3, help="forced WebSocket drops")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("AsyncEVME").setLevel(logging.WARNING)
+
+    chain = MockChain(head=args.history, density=args.density)
+    chain.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            expected, seen = asyncio.run(check(chain, args.blocks, args.drops, os.path.join(tmp, "ckpt.json")))
+    finally:
+        chain.stop()
+
+    missing = expected - seen
+    dupes = {k: n for k, n in seen.items() if n > 1}
+    extra = set(seen) - set(expected)
+    print(
+        f"head {chain.head}: {sum(expected.values())} logs expected, {sum(seen.values())} handled, "
+        f"{chain.pushed} pushed over {chain.subscriptions} subscription(s)"
+    )
+    print(f"missing {sum(missing.values())}, duplicated {len(dupes)}, unexpected {len(extra)}")
+    if chain.pushed == 0:
+        print("FAIL: nothing arrived over the subscription")
+        return 1
+    if missing or dupes or extra:
+        for k in sorted(missing)[:5]:
+            print("  missing", k)
+        for k in sorted(dupes)[:5]:
+            print("  duplicated", k, dupes[k])
+        print("FAIL")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+# benchmarks/mockchain.py
+"""
+Synthetic chain behind a local JSON-RPC server, for benchmarks that must not
+touch the public Shido RPCs.
+
+    chain = MockChain(head=20_000, density=2.0, latency=0.02, error_rate=0.01)
+    url = chain.start()          # http://127.0.0.1:<port>/ served from a thread
+    ...
+    chain.stop()
+
+The same port speaks WebSocket JSON-RPC (chain.ws_url) with
+eth_subscribe("logs"). mine() appends blocks and pushes their logs to the
+subscribers; drop_sockets() cuts every WebSocket like a network failure, for
+exercising AsyncEVME.run_live's reconnect and gap fill.
+
+Every block carries Swap logs (abi/lp_pair_abi.json) from `pools` and
+Transfer logs (abi/erc20_abi.json) from `tokens`, `density` logs per block
+on average. Logs are a pure function of the block number and seed, so any
+eth_getLogs range, in any order and any number of times, returns the same
+logs. Enough of eth_call (token0/token1/fee/symbol/decimals) and
+eth_getBlockByNumber is answered for the aux_funcs handlers to run.
+
+    python -m benchmarks.mockchain [port]    # standalone, Ctrl-C to stop
+"""
+import asyncio
+import itertools
+import json
+import random
+import sys
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+from eth_abi import encode
+from eth_utils import keccak, to_checksum_address
+
+from abi.get_abis import get_abi
+
+def _addr(i: int, space: int = 0) -> str:
+    return to_checksum_address((space << 152 | i).to_bytes(20, "big"))
+
+def _topic(addr: str) -> str:
+    return "0x" + "00" * 12 + addr[2:].lower()
+
+def _event(abi: Sequence[Dict[str, Any]], name: str) -> Dict[str, Any]:
+    return next(e for e in abi if e.get("type") == "event" and e.get("name") == name)
+
+def _topic0(event: Dict[str, Any]) -> str:
+    types = ",".join(i["type"] for i in event["inputs"])
+    return "0x" + keccak(text=f"{event['name']}({types})").hex()
+
+def _selector(sig: str) -> str:
+    return "0x" + keccak(text=sig)[:4].hex()
+
+def _value(inp: Dict[str, Any], rng: random.Random, holders: Sequence[str]) -> Any:
+    """A plausible value for one ABI input."""
+    typ, name = inp["type"], inp["name"]
+    if typ == "address":
+        return rng.choice(holders)
+    if name == "sqrtPriceX96":
+        return int(2 ** 96 * rng.uniform(0.5, 2.0))
+    if name == "tick":
+        return rng.randrange(-1000, 1000)
+    if typ == "bool":
+        return rng.random() < 0.5
+    bits = int(typ[4:] if typ.startswith("uint") else typ[3:] or 256)
+    v = min(rng.randrange(1, 10 ** 21), 2 ** (bits - 1) - 1)
+    return v * rng.choice((1, -1)) if typ.startswith("int") else v
+
+
+class MockChain:
+    """
+    A fixed-height chain and an aiohttp JSON-RPC server for it.
+
+    - latency / jitter: seconds added to every request (gauss, >= 0)
+    - error_rate: share of eth_getLogs requests answered with a JSON-RPC
+      error (the fetch loop's retry/failover path; handler calls are spared)
+    - max_range: eth_getLogs over more blocks fails with a "block range"
+      error, like public nodes do (0: no limit)
+    - calls: JSON-RPC calls served per method (batch entries count one each);
+      requests: HTTP requests; pushed: logs sent to subscribers;
+      subscriptions: eth_subscribe("logs") calls answered
+    """
+
+    def __init__(
+        self,
+        head: int = 10_000,
+        density: float = 1.0,       # logs per block, on average
+        pools: int = 4,
+        tokens: int = 4,
+        holders: int = 1000,        # distinct sender/recipient addresses
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        max_range: int = 0,
+        block_time: int = 2,
+        seed: int = 1,
+    ):
+        self.head = head
+        self.density = density
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_range = max_range
+        self.block_time = block_time
+        self.seed = seed
+        self.pools = [_addr(i + 1, 0xAA) for i in range(pools)]
+        self.tokens = [_addr(i + 1, 0xBB) for i in range(tokens)]
+        self.holders = [_addr(i + 1, 0xCC) for i in range(holders)]
+        swap = _event(get_abi("lp_pair_abi"), "Swap")
+        transfer = _event(get_abi("erc20_abi"), "Transfer")
+        # (address, event abi, topic0) per emitting contract
+        self.emitters: List[Tuple[str, Dict[str, Any], str]] = (
+            [(a, swap, _topic0(swap)) for a in self.pools] + [(a, transfer, _topic0(transfer)) for a in self.tokens]
+        )
+        # pool i trades tokens[i] against tokens[i + 1]
+        self._token_pair = {
+            p.lower(): (self.tokens[i % tokens], self.tokens[(i + 1) % tokens]) for i, p in enumerate(self.pools)
+        }
+        self._eth_call = {
+            _selector("token0()"): lambda to: encode(["address"], [self._token_pair[to][0]]),
+            _selector("token1()"): lambda to: encode(["address"], [self._token_pair[to][1]]),
+            _selector("fee()"): lambda to: encode(["uint24"], [3000]),
+            _selector("symbol()"): lambda to: encode(["string"], [f"T{int(to[-4:], 16)}"]),
+            _selector("decimals()"): lambda to: encode(["uint8"], [18]),
+        }
+        self._logs: Dict[int, List[Dict[str, Any]]] = {}
+        self.calls: Counter = Counter()
+        self.requests = 0
+        self.logs_served = 0
+        self._rng = random.Random(seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+        self.ws_url: Optional[str] = None
+        # subscription id -> (socket, log filter)
+        self._subs: Dict[str, Tuple[web.WebSocketResponse, Any]] = {}
+        self._sub_ids = itertools.count(1)
+        self._sockets: List[Tuple[web.WebSocketResponse, web.Request]] = []
+        self.pushed = 0
+        self.subscriptions = 0
+
+    # ---------------------------------------------------------------
+    # chain data
+    # ---------------------------------------------------------------
+    def block_logs(self, n: int) -> List[Dict[str, Any]]:
+        """Every log of block n, in RPC (hex) form (built once, then served from memory)."""
+        logs = self._logs.get(n)
+        if logs is None:
+            logs = self._logs[n] = self._make_logs(n)
+        return logs
+
+    def _make_logs(self, n: int) -> List[Dict[str, Any]]:
+        rng = random.Random(self.seed * 1_000_003 + n)
+        count = int(self.density) + (rng.random() < self.density % 1)
+        out = []
+        for i in range(count):
+            addr, event, topic0 = self.emitters[rng.randrange(len(self.emitters))]
+            topics, types, values = [topic0], [], []
+            for inp in event["inputs"]:
+                v = _value(inp, rng, self.holders)
+                if inp.get("indexed"):
+                    topics.append(_topic(v) if inp["type"] == "address" else "0x" + encode([inp["type"]], [v]).hex())
+                else:
+                    types.append(inp["type"])
+                    values.append(v)
+            out.append({
+                "address": addr.lower(),
+                "topics": topics,
+                "data": "0x" + encode(types, values).hex(),
+                "blockNumber": hex(n),
+                "blockHash": "0x%064x" % n,
+                "transactionHash": "0x%056x%08x" % (n, i),
+                "transactionIndex": hex(i),
+                "logIndex": hex(i),
+                "removed": False,
+            })
+        return out
+
+    def warm(self) -> None:
+        """Build every block's logs up front, so serving doesn't include generating."""
+        for n in range(self.head + 1):
+            self.block_logs(n)
+
+    def logs_total(self) -> int:
+        """Logs in blocks built so far (all of them after warm())."""
+        return sum(len(logs) for logs in self._logs.values())
+
+    def get_logs(self, flt: Dict[str, Any]) -> List[Dict[str, Any]]:
+        lo, hi = (self._block(flt.get(k, "latest")) for k in ("fromBlock", "toBlock"))
+        if self.max_range and hi - lo + 1 > self.max_range:
+            raise _RPCError(-32005, f"block range too large, limit is {self.max_range}")
+        match = _matcher(flt)
+        out = [lg for n in range(max(lo, 0), min(hi, self.head) + 1) for lg in self.block_logs(n) if match(lg)]
+        self.logs_served += len(out)
+        return out
+
+    def block(self, n: int) -> Dict[str, Any]:
+        return {
+            "number": hex(n),
+            "hash": "0x%064x" % n,
+            "parentHash": "0x%064x" % max(n - 1, 0),
+            "timestamp": hex(1_700_000_000 + n * self.block_time),
+            "transactions": [],
+        }
+
+    def _block(self, tag: Any) -> int:
+        if tag in ("latest", "safe", "finalized", "pending"):
+            return self.head
+        if tag == "earliest":
+            return 0
+        return int(tag, 16) if isinstance(tag, str) else int(tag)
+
+    # ---------------------------------------------------------------
+    # JSON-RPC
+    # ---------------------------------------------------------------
+    def dispatch(self, method: str, params: List[Any]) -> Any:
+        self.calls[method] += 1
+        if method == "eth_blockNumber":
+            return hex(self.head)
+        if method == "eth_getLogs":
+            if self.error_rate and self._rng.random() < self.error_rate:
+                raise _RPCError(-32000, "mock: internal error")
+            return self.get_logs(params[0])
+        if method == "eth_getBlockByNumber":
+            n = self._block(params[0])
+            return self.block(n) if n <= self.head else None
+        if method == "eth_call":
+            tx = params[0]
+            data, to = tx.get("data") or tx.get("input") or "0x", (tx.get("to") or "").lower()
+            fn = self._eth_call.get(data[:10])
+            try:
+                return "0x" + fn(to).hex() if fn is not None else "0x"
+            except KeyError:  # token0() etc. on something that isn't a pool
+                return "0x"
+        if method == "eth_chainId":
+            return "0x9f6"
+        if method in ("web3_clientVersion", "net_version"):
+            return "mockchain/1"
+        raise _RPCError(-32601, f"method {method} not supported")
+
+    def _answer(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return {"jsonrpc": "2.0", "id": req.get("id"), "result": self.dispatch(req["method"], req.get("params") or [])}
+        except _RPCError as e:
+            return {"jsonrpc": "2.0", "id": req.get("id"), "error": {"code": e.code, "message": e.message}}
+
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """JSON-RPC over a WebSocket, plus eth_subscribe("logs") / eth_unsubscribe."""
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._sockets.append((ws, request))
+        try:
+            async for msg in ws:
+                if msg.type != web.WSMsgType.TEXT:
+                    break
+                req = json.loads(msg.data)
+                method, params = req.get("method"), req.get("params") or []
+                if method == "eth_subscribe" and params[:1] == ["logs"]:
+                    sub_id = "0x%x" % next(self._sub_ids)
+                    self._subs[sub_id] = (ws, _matcher(params[1] if len(params) > 1 else {}))
+                    self.subscriptions += 1
+                    reply = {"jsonrpc": "2.0", "id": req.get("id"), "result": sub_id}
+                elif method == "eth_unsubscribe":
+                    found = self._subs.pop(params[0], None) is not None if params else False
+                    reply = {"jsonrpc": "2.0", "id": req.get("id"), "result": found}
+                else:
+                    reply = self._answer(req)
+                await ws.send_str(json.dumps(reply, separators=(",", ":")))
+        finally:
+            self._forget(ws)
+        return ws
+
+    def _forget(self, ws: web.WebSocketResponse) -> None:
+        self._subs = {k: v for k, v in self._subs.items() if v[0] is not ws}
+        self._sockets = [s for s in self._sockets if s[0] is not ws]
+
+    async def _mine(self, count: int) -> int:
+        for _ in range(count):
+            self.head += 1
+            logs = self.block_logs(self.head)
+            for sub_id, (ws, match) in list(self._subs.items()):
+                for lg in logs:
+                    if not match(lg):
+                        continue
+                    try:
+                        await ws.send_str(json.dumps({
+                            "jsonrpc": "2.0", "method": "eth_subscription",
+                            "params": {"subscription": sub_id, "result": lg},
+                        }, separators=(",", ":")))
+                    except ConnectionError:  # socket went away mid-push
+                        break
+                    self.pushed += 1
+        return self.head
+
+    async def _drop(self) -> int:
+        dropped = len(self._sockets)
+        for ws, request in self._sockets:
+            if request.transport is not None:
+                request.transport.abort()  # no close frame: the client sees a dead connection
+        self._subs.clear()
+        self._sockets.clear()
+        return dropped
+
+    def mine(self, count: int = 1) -> int:
+        """
+        Append `count` blocks and push their logs to matching subscriptions;
+        returns the new head. Call from any thread but the server's.
+        """
+        return self._on_server(self._mine(count))
+
+    def drop_sockets(self) -> int:
+        """Abort every WebSocket connection (subscriptions die with them); returns how many."""
+        return self._on_server(self._drop())
+
+    def _on_server(self, coro) -> Any:
+        if self._loop is None:
+            raise RuntimeError("MockChain is not running (start() it first)")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self._rng.gauss(self.latency, self.jitter)))
+        body = json.loads(await request.read())
+        if isinstance(body, list):
+            out: Any = [self._answer(r) for r in body]
+        else:
+            out = self._answer(body)
+        return web.Response(body=json.dumps(out, separators=(",", ":")), content_type="application/json")
+
+    # ---------------------------------------------------------------
+    # server
+    # ---------------------------------------------------------------
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve on the running loop; returns the URL (port 0: pick a free one)."""
+        app = web.Application(client_max_size=16 << 20)
+        app.router.add_post("/", self._handle)
+        app.router.add_get("/", self._websocket)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}/"
+        self.ws_url = f"ws://{host}:{port}/"
+        return self.url
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve from a daemon thread with its own event loop; returns the URL."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="MockChain", daemon=True)
+        self._thread.start()
+        return asyncio.run_coroutine_threadsafe(self.serve(host, port), self._loop).result()
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._drop(), self._loop).result()
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = self._thread = self._runner = None
+
+
+def _matcher(flt: Dict[str, Any]):
+    """Predicate for the address/topics part of an eth_getLogs or eth_subscribe filter."""
+    addrs = flt.get("address")
+    if isinstance(addrs, str):
+        addrs = [addrs]
+    addrs = {a.lower() for a in addrs} if addrs else None
+    topics = flt.get("topics") or []
+    wanted = [{t.lower()} if isinstance(t, str) else {x.lower() for x in t} if t else None for t in topics]
+
+    def match(lg: Dict[str, Any]) -> bool:
+        if addrs is not None and lg["address"] not in addrs:
+            return False
+        return not any(
+            w is not None and (i >= len(lg["topics"]) or lg["topics"][i] not in w) for i, w in enumerate(wanted)
+        )
+    return match
+
+
+class _RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code, self.message = code, message
+
+
+if __name__ == "__main__":
+    chain = MockChain()
+    print(f"Serving {chain.head} blocks on", chain.start(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8545))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        chain.stop()
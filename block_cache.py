@@ -0,0 +1,133 @@
+# block_cache.py
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from web3 import AsyncWeb3
+
+from metrics import watch_cache
+
+logger = logging.getLogger("BlockTimestamps")
+
+def _to_dt(ts: int) -> datetime:
+    return datetime.fromtimestamp(int(ts), timezone.utc)
+
+
+class BlockTimestamps:
+    """
+    blockNumber -> aware UTC datetime, shared by aux_funcs and store.helpers.
+
+    - true LRU eviction (OrderedDict), so a full cache drops the coldest
+      blocks one at a time instead of wiping the working set
+    - prefetch() resolves every distinct block of a chunk with JSON-RPC
+      batch requests before the handlers run
+    - with persist=True headers are also kept in the `blocks` table, so a
+      backfill never re-fetches a header it has already seen; after a DB
+      error the table is skipped for `persist_retry` seconds, then tried again
+    """
+
+    def __init__(self, maxsize: int = 65536, persist: bool = False, batch_size: int = 100, persist_retry: float = 60):
+        self.maxsize = maxsize
+        self.persist = persist
+        self.batch_size = batch_size
+        self.persist_retry = persist_retry
+        self._persist_paused_until = 0.0
+        self._cache: "OrderedDict[int, datetime]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __contains__(self, block_number: int) -> bool:
+        return block_number in self._cache
+
+    def get_cached(self, block_number: int) -> Optional[datetime]:
+        ts = self._cache.get(block_number)
+        if ts is not None:
+            self._cache.move_to_end(block_number)
+            self.hits += 1
+        return ts
+
+    def put(self, block_number: int, ts: datetime) -> None:
+        self._cache[block_number] = ts
+        self._cache.move_to_end(block_number)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    async def get(self, w3: AsyncWeb3, block_number: int) -> datetime:
+        ts = self.get_cached(block_number)
+        if ts is None:
+            await self.prefetch(w3, [block_number])
+            ts = self._cache[block_number]
+        return ts
+
+    async def prefetch(self, w3: AsyncWeb3, block_numbers: Iterable[int]) -> None:
+        """Make sure every block in block_numbers is cached."""
+        missing = sorted({int(n) for n in block_numbers if int(n) not in self._cache})
+        if not missing:
+            return
+        self.misses += len(missing)
+        persist = self.persist and time.monotonic() >= self._persist_paused_until
+        if persist:
+            missing = await self._load_persisted(missing)
+            if not missing:
+                return
+        fetched: Dict[int, int] = {}
+        for i in range(0, len(missing), self.batch_size):
+            part = missing[i:i + self.batch_size]
+            for n, b in zip(part, await self._fetch_headers(w3, part)):
+                fetched[n] = int(b["timestamp"])
+        for n, ts in fetched.items():
+            self.put(n, _to_dt(ts))
+        if persist:
+            await self._store(fetched)
+
+    async def _fetch_headers(self, w3: AsyncWeb3, numbers: List[int]) -> List[Any]:
+        if len(numbers) > 1 and hasattr(w3, "batch_requests"):
+            try:
+                async with w3.batch_requests() as batch:
+                    for n in numbers:
+                        batch.add(w3.eth.get_block(n))
+                    return await batch.async_execute()
+            except Exception as e:
+                logger.debug(f"Batch get_block failed ({e}); falling back to single calls")
+        return await asyncio.gather(*(w3.eth.get_block(n) for n in numbers))
+
+    async def _load_persisted(self, numbers: List[int]) -> List[int]:
+        from store.models import Block
+        try:
+            rows = await Block.filter(number__in=numbers).values_list("number", "timestamp")
+        except Exception as e:
+            self._pause_persist(f"Block table unavailable: {e}")
+            return numbers
+        for n, ts in rows:
+            self.put(n, _to_dt(ts))
+        return [n for n in numbers if n not in self._cache]
+
+    async def _store(self, fetched: Dict[int, int]) -> None:
+        from store.models import Block
+        if not fetched:
+            return
+        try:
+            await Block.bulk_create(
+                [Block(number=n, timestamp=ts) for n, ts in fetched.items()],
+                ignore_conflicts=True,
+            )
+        except Exception as e:
+            self._pause_persist(f"Could not persist {len(fetched)} block header(s): {e}")
+
+    def _pause_persist(self, msg: str) -> None:
+        self._persist_paused_until = time.monotonic() + self.persist_retry
+        logger.warning(f"{msg}; retrying the table in {self.persist_retry:.0f}s")
+
+
+# Process-wide instance used by the handlers; PERSIST_BLOCKS=1 also keeps
+# headers in the `blocks` table (needs init_db before the first prefetch)
+BLOCK_TS = BlockTimestamps(persist=os.environ.get("PERSIST_BLOCKS", "0").lower() not in ("0", "false", "no", ""))
+watch_cache("block_ts", BLOCK_TS)
@@ -0,0 +1,71 @@
+# checkpoint.py
+from __future__ import annotations
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("Checkpoint")
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """
+    Write JSON so a crash leaves either the old or the new file:
+    temp file in the same dir -> fsync -> rename -> fsync dir.
+    """
+    payload = json.dumps(data, indent=2)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".ckpt-", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    # make the rename itself durable
+    try:
+        dfd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dfd)
+    except OSError:
+        pass
+    finally:
+        os.close(dfd)
+
+
+class Checkpoint:
+    """
+    Per-contract "last fully processed block" stored as JSON.
+    Writes are atomic: temp file in the same dir -> fsync -> rename -> fsync dir,
+    so a crash leaves either the old or the new checkpoint, never a torn one.
+    """
+
+    def __init__(self, path: str, lock: Optional[threading.Lock] = None):
+        self.path = path
+        self.lock = lock or threading.Lock()
+
+    def load(self) -> Dict[str, int]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return {}
+        return {addr: int(blk) for addr, blk in data.get("contracts", {}).items()}
+
+    def save(self, contracts: Dict[str, int]) -> None:
+        with self.lock:
+            write_json_atomic(self.path, {"contracts": contracts, "updated_at": int(time.time())})
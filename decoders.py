@@ -0,0 +1,165 @@
+# decoders.py
+from __future__ import annotations
+import json
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from eth_abi.abi import default_codec
+from eth_abi.decoding import ContextFramesBytesIO, TupleDecoder
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+# ---------------------------------------------------------------------
+# Precompiled event decoders
+#   web3's contract.events[name]().process_log / get_event_data re-walk the
+#   ABI and rebuild decoders on every log; these compile that work once.
+# ---------------------------------------------------------------------
+_REGISTRY = default_codec._registry
+
+@lru_cache(maxsize=65536)
+def checksum(addr: str) -> str:
+    """Cached Web3.to_checksum_address (the same traders/pools repeat a lot)."""
+    return Web3.to_checksum_address(addr)
+
+def _is_dynamic(type_str: str) -> bool:
+    return type_str in ("string", "bytes") or type_str.endswith("]") or type_str.startswith("(")
+
+def _tuple_decoder(types: Sequence[str]):
+    try:
+        return _REGISTRY.get_tuple_decoder(*types, strict=False)
+    except (AttributeError, TypeError):  # older eth-abi
+        return TupleDecoder(decoders=[_REGISTRY.get_decoder(t) for t in types])
+
+def _normalizer(type_str: str):
+    if type_str == "address":
+        return checksum
+    if type_str == "address[]":
+        return lambda v: [checksum(a) for a in v]
+    return None
+
+
+class EventDecoder:
+    """
+    Decoder for one event ABI entry. Indexed/non-indexed type lists, the
+    eth-abi tuple decoder and per-argument normalizers are built once.
+    """
+
+    def __init__(self, event_abi: Mapping[str, Any]):
+        self.name: str = event_abi["name"]
+        self.anonymous = bool(event_abi.get("anonymous", False))
+        inputs = event_abi.get("inputs", [])
+        types = ",".join(i["type"] for i in inputs)
+        self.signature = f"{self.name}({types})"
+        self.topic0: bytes = bytes(Web3.keccak(text=self.signature))
+
+        indexed = [i for i in inputs if i.get("indexed")]
+        plain = [i for i in inputs if not i.get("indexed")]
+        # dynamic indexed args only carry their keccak hash in the topic
+        self._indexed = [
+            (
+                i["name"],
+                _REGISTRY.get_decoder("bytes32" if _is_dynamic(i["type"]) else i["type"]),
+                None if _is_dynamic(i["type"]) else _normalizer(i["type"]),
+            )
+            for i in indexed
+        ]
+        self._plain_names = [i["name"] for i in plain]
+        self._plain_norm = [_normalizer(i["type"]) for i in plain]
+        self._data_decoder = _tuple_decoder([i["type"] for i in plain]) if plain else None
+        self._order = [i["name"] for i in inputs]
+        self._first_topic = 0 if self.anonymous else 1
+        # topics a matching log carries; tells e.g. ERC-20 and ERC-721 Transfer apart
+        self.topic_count = self._first_topic + len(indexed)
+
+    def decode_args(self, topics: Sequence[bytes], data: bytes) -> Dict[str, Any]:
+        args: Dict[str, Any] = {}
+        t = self._first_topic
+        for name, dec, norm in self._indexed:
+            v = dec(ContextFramesBytesIO(bytes(topics[t])))
+            args[name] = norm(v) if norm else v
+            t += 1
+        if self._data_decoder is not None:
+            values = self._data_decoder(ContextFramesBytesIO(bytes(data)))
+            for name, norm, v in zip(self._plain_names, self._plain_norm, values):
+                args[name] = norm(v) if norm else v
+        # keep ABI argument order, like web3 does
+        return {k: args[k] for k in self._order}
+
+    def decode(self, log: Mapping[str, Any]) -> AttributeDict:
+        """Same shape as web3's process_log output."""
+        return AttributeDict({
+            "args": AttributeDict(self.decode_args(log["topics"], log["data"])),
+            "event": self.name,
+            "logIndex": log["logIndex"],
+            "transactionIndex": log["transactionIndex"],
+            "transactionHash": log["transactionHash"],
+            "address": log["address"],
+            "blockHash": log["blockHash"],
+            "blockNumber": log["blockNumber"],
+        })
+
+    def decode_logs(self, logs: Iterable[Mapping[str, Any]]) -> List[AttributeDict]:
+        decode = self.decode
+        return [decode(lg) for lg in logs]
+
+
+class LogDecoder:
+    """
+    Routes mixed logs to EventDecoders by (raw topic0, number of topics):
+    events sharing a signature but not the indexed layout (ERC-20 vs ERC-721
+    Transfer) each get their own decoder.
+    decode_logs() handles a whole getLogs chunk in one pass.
+    """
+
+    def __init__(self, decoders: Iterable[EventDecoder] = ()):
+        self.by_topic0: Dict[Tuple[bytes, int], EventDecoder] = {}
+        for d in decoders:
+            self.add(d)
+
+    def add(self, decoder: EventDecoder) -> EventDecoder:
+        key = (decoder.topic0, decoder.topic_count)
+        self.by_topic0.setdefault(key, decoder)
+        return self.by_topic0[key]
+
+    def decode_logs(self, logs: Sequence[Mapping[str, Any]]) -> List[Optional[AttributeDict]]:
+        """
+        Decoded log per input log, same order. None where no decoder matches
+        or the log doesn't decode (malformed data): one bad log must not fail
+        the whole chunk.
+        """
+        get = self.by_topic0.get
+        out: List[Optional[AttributeDict]] = []
+        append = out.append
+        for lg in logs:
+            topics = lg["topics"]
+            d = get((topics[0], len(topics))) if topics else None
+            if d is None:
+                append(None)
+                continue
+            try:
+                append(d.decode(lg))
+            except Exception:
+                append(None)
+        return out
+
+
+_DECODERS: Dict[Tuple[str, str], EventDecoder] = {}
+
+def get_event_decoder(abi: Sequence[Mapping[str, Any]] | Mapping[str, Any], event_name: Optional[str] = None) -> EventDecoder:
+    """
+    Cached EventDecoder for (ABI, event). Accepts a full contract ABI plus an
+    event name, or a single event ABI dict.
+    """
+    if isinstance(abi, Mapping):
+        item = abi
+    else:
+        for item in abi:
+            if item.get("type") == "event" and item.get("name") == event_name:
+                break
+        else:
+            raise ValueError(f"Event {event_name} not found in ABI.")
+    key = (item["name"], json.dumps(item.get("inputs", []), sort_keys=True))
+    dec = _DECODERS.get(key)
+    if dec is None:
+        dec = _DECODERS[key] = EventDecoder(item)
+    return dec
@@ -1,10 +1,21 @@
 import asyncio
 import logging
-import json
 import threading
-import random
+from collections import deque
 from web3 import Web3
-from typing import Callable, Dict, List
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from rpc import AsyncRPCBackend, RPCPool, get_backend
+from adaptive_range import AdaptiveRange, is_range_error
+from decoders import LogDecoder, get_event_decoder
+from checkpoint import Checkpoint
+from log_cache import LogCache, filter_key
+from subscription import LogSubscription
+from pipeline import Pipeline
+from metrics import (
+    BLOCK_LAG, CALLBACK_ERRORS, CALLBACK_SECONDS, CHECKPOINT_BLOCK, GETLOGS_RESULTS, HEAD_BLOCK, LOGS_DECODED,
+    Exporter, timed, watch_cache,
+)
 
 def attrdict_to_dict(value):
     """
@@ -23,133 +34,503 @@ def attrdict_to_dict(value):
 class AsyncEVME:
     def __init__(
         self,
-        rpc_urls: List[str],  # List of RPC URLs for auto-switching
+        rpc_urls: List[str],  # RPC URLs; each call goes to the best healthy one
         contracts: Dict[str, list],  # {contract_address: contract_abi}
         event_callbacks: Dict[str, Dict[str, Callable]],  # {contract_address: {event_name: async_callback}}
         start_blocks_ago: int = 9999,
         start_from_block: int = 0,
         persistence_file: str = None,
+        rpc_backend: Optional[AsyncRPCBackend] = None,
+        max_in_flight: int = 8,  # concurrent eth_getLogs requests
+        requests_per_second: float = 10,  # per-RPC request budget
+        combined_requests: bool = False,  # one eth_getLogs per range for all contracts
+        range_controller: Optional[AdaptiveRange] = None,  # adaptive getLogs span per contract
+        flush_hooks: Optional[List[Callable[[], Awaitable]]] = None,  # e.g. [BatchWriter.flush], run before each checkpoint
+        prefetch_hooks: Optional[List[Callable[[list], Awaitable]]] = None,  # get a range's decoded events before its callbacks
+        log_cache: Optional[LogCache] = None,  # read-through on-disk cache of finalized getLogs ranges
+        archive_urls: Optional[List[str]] = None,  # endpoints that serve deep history (see RPCPool.recent_blocks)
+        rpc_pool: Optional[RPCPool] = None,  # latency-scored routing, hedging and circuit breakers
+        handler_workers: int = 0,  # >0: fetch_logs runs as a staged Pipeline with this many handler tasks
+        decode_processes: int = 0,  # pipeline only: decode in a process pool of this size
+        metrics_port: Optional[int] = None,  # serve Prometheus metrics on 127.0.0.1:<port>/metrics while running
+        metrics_log_every: Optional[float] = 60,  # seconds between summary log lines (None: off)
     ):
         self.logger = logging.getLogger("AsyncEVME")
         logging.basicConfig(level=logging.INFO)
 
         self.rpc_urls = rpc_urls
-        self.current_rpc = 0
-        self.web3 = None
-        self.init_web3()
-
-        self.contracts = {
-            Web3.to_checksum_address(addr): {
-                "abi": abi,
-                "contract": self.web3.eth.contract(address=Web3.to_checksum_address(addr), abi=abi),
-            }
-            for addr, abi in contracts.items()
-        }
+        self.rpc = rpc_backend or get_backend()
+        # a passed-in backend is the caller's to close; the shared one is reference-counted
+        self._shared_rpc = rpc_backend is None
+        self.pool = rpc_pool or RPCPool(rpc_urls, archive=archive_urls or (), backend=self.rpc, rate=requests_per_second)
+        # AsyncWeb3 client for local work (keccak, contract objects) and
+        # ad-hoc calls; RPC traffic of the fetch loop goes through self.pool.
+        self.web3 = self.rpc.client(self.rpc_urls[0])
+        self.connected = False
+        self.max_in_flight = max_in_flight
+        self.requests_per_second = requests_per_second
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self.combined_requests = combined_requests
+        self.ranges = range_controller or AdaptiveRange()
+        self.flush_hooks = list(flush_hooks or [])
+        self.prefetch_hooks = list(prefetch_hooks or [])
+        self.log_cache = log_cache
+        if log_cache is not None:
+            watch_cache("logs", log_cache, hits="hit_blocks", misses="miss_blocks")
+        self.exporter = Exporter(metrics_port, log_every=metrics_log_every)
+
+        # web3 contract objects are only built if someone asks (see contract())
+        self.contracts = {Web3.to_checksum_address(addr): {"abi": abi} for addr, abi in contracts.items()}
         self.event_callbacks = event_callbacks
         self.persistence_file = persistence_file
         self.lock = threading.Lock()
-        
-        current_block = self.web3.eth.block_number
-        self.from_block = (
-            start_from_block
-            if start_from_block
-            else max(current_block - start_blocks_ago, 0)
-        )
-        self.to_block = current_block
+
+        # head-relative start is resolved on the first fetch (needs the network)
+        self.start_blocks_ago = start_blocks_ago
+        self.from_block = start_from_block if start_from_block else None
+        self.to_block = None
 
         self.event_signatures = self._get_event_signatures()
+        self.dispatch_table = self._build_dispatch_table()
+        self.pipeline = (
+            Pipeline(self, handler_workers, decode_processes=decode_processes) if handler_workers else None
+        )
+
+        # {contract_address: last block whose callbacks all completed}
+        self.checkpoint = Checkpoint(persistence_file, self.lock) if persistence_file else None
+        self.checkpoints: Dict[str, int] = {}
+        if self.checkpoint:
+            self._resume()
         self.logger.info("Initialized EventFetcher for multiple contracts")
-        self.logger.info(f"Starting from block: {self.from_block}, Current block: {self.to_block}")
-        print("LFG", self.event_signatures)
+        self.logger.info(f"Starting from block: {self.from_block or f'head - {start_blocks_ago}'}")
+        self.logger.debug("Watching %s", self.event_signatures)
+
+    def _resume(self):
+        """Pick up from the persisted per-contract checkpoints."""
+        saved = self.checkpoint.load()
+        self.checkpoints = {
+            Web3.to_checksum_address(addr): blk
+            for addr, blk in saved.items()
+            if Web3.to_checksum_address(addr) in self.event_signatures
+        }
+        if self.checkpoints and len(self.checkpoints) == len(self.event_signatures):
+            self.from_block = min(self.checkpoints.values()) + 1
+            self.logger.info(f"Resuming from checkpoint {self.persistence_file}: block {self.from_block}")
+        elif self.checkpoints:
+            # new contracts start from the configured block; checkpointed ones skip what they've seen
+            self.logger.info(f"Partial checkpoint for {len(self.checkpoints)} contract(s); starting from configured block")
 
-    def init_web3(self):
-        """Initialize or reinitialize Web3 connection."""
+    async def _save_checkpoint(self, block):
+        for contract_address in self.event_signatures:
+            if self.checkpoints.get(contract_address, -1) < block:
+                self.checkpoints[contract_address] = block
+        self._track_head(block, block)
+        if not self.checkpoint:
+            return
         try:
-            self.web3 = Web3(Web3.HTTPProvider(self.rpc_urls[self.current_rpc], request_kwargs={"timeout": 10}))
-            if self.web3.is_connected():
-                self.logger.info(f"Connected to RPC: {self.rpc_urls[self.current_rpc]}")
-            else:
-                self.logger.warning(f"Failed to connect to RPC: {self.rpc_urls[self.current_rpc]}")
-                self.switch_rpc()
+            await asyncio.to_thread(self.checkpoint.save, dict(self.checkpoints))
         except Exception as e:
+            self.logger.warning(f"Failed to write checkpoint {self.persistence_file}: {e}")
+
+    def _track_head(self, head, done):
+        """Head / checkpoint / lag gauges; live logs can be ahead of the last polled head."""
+        head = max(head, self.to_block or 0)
+        HEAD_BLOCK.set(head)
+        CHECKPOINT_BLOCK.set(done)
+        BLOCK_LAG.set(max(0, head - done))
+
+    async def init_web3(self):
+        """
+        Check that some endpoint answers and point self.web3 at the best one.
+        Failover is the pool's job: this neither recurses nor rebuilds providers.
+        """
+        try:
+            self.to_block = await self.pool.call(lambda w3: w3.eth.block_number, method="eth_blockNumber")
+            self.pool.head = self.to_block
+            self.web3 = await self.pool.client()
+            self.connected = True
+            self.logger.info(f"Connected to RPC: {self.web3.provider.endpoint_uri}")
+        except Exception as e:
+            self.connected = False
             self.logger.error(f"Error initializing Web3: {e}")
-            self.switch_rpc()
-
-    def switch_rpc(self):
-        """Switch to the next RPC in case of failure."""
-        self.current_rpc = (self.current_rpc + 1) % len(self.rpc_urls)
-        self.logger.warning(f"Switching to next RPC: {self.rpc_urls[self.current_rpc]}")
-        self.init_web3()
-        
+
+    def contract(self, address):
+        """web3 contract object for a watched address, built on first use."""
+        entry = self.contracts[Web3.to_checksum_address(address)]
+        if "contract" not in entry:
+            entry["contract"] = self.web3.eth.contract(address=Web3.to_checksum_address(address), abi=entry["abi"])
+        return entry["contract"]
+
     def _get_event_signatures(self) -> Dict[str, Dict[str, str]]:
-        print("Signature")
+        """{contract_address: {event_name: "0x" + topic0 hex}} for every watched event."""
         signatures = {}
         for contract_address, contract_data in self.contracts.items():
-            #print(contract_address)
-            
             contract_signatures = {}
             for event_name in self.event_callbacks.get(contract_address, {}):
-                #print(event_name)
                 for item in contract_data["abi"]:
                     if item.get("type") == "event" and item.get("name") == event_name:
                         inputs = item.get("inputs", [])
                         types = ",".join(inp["type"] for inp in inputs)
                         signature_str = f"{event_name}({types})"
                         contract_signatures[event_name] = "0x" + self.web3.keccak(text=signature_str).hex()
-                        #print(contract_signatures[event_name])
                         break
                 else:
                     raise ValueError(f"Event {event_name} not found in contract {contract_address} ABI.")
             signatures[contract_address] = contract_signatures
         return signatures
 
-    async def fetch_logs(self, chunk_size=10000, max_retries=3):
-        """Fetch logs while ensuring connection stability."""
-        self.to_block = self.web3.eth.block_number
-        while self.from_block <= self.to_block:
-            end_block = min(self.from_block + chunk_size - 1, self.to_block)
-            #print(json.dumps(self.event_signatures, indent=4))
-            for contract_address, event_data in self.event_signatures.items():
-                filter_options = {
-                    "fromBlock": self.from_block,
-                    "toBlock": end_block,
+    def _build_dispatch_table(self) -> Dict[tuple, tuple]:
+        """
+        (contract_address, raw topic0 bytes) -> (event_name, decoder, callback).
+        Decoders are compiled once per (ABI, event) and shared, so handling a
+        log is a single dict lookup. Callbacks are wrapped to time each call
+        into evme_callback_seconds{contract, event}.
+        """
+        table = {}
+        self.decoder = LogDecoder()
+        for contract_address, event_data in self.event_signatures.items():
+            abi = self.contracts[contract_address]["abi"]
+            for event_name, signature in event_data.items():
+                decoder = get_event_decoder(abi, event_name)
+                self.decoder.add(decoder)
+                table[(contract_address, bytes.fromhex(signature[2:]))] = (
+                    event_name,
+                    decoder,
+                    timed(
+                        self.event_callbacks[contract_address][event_name],
+                        CALLBACK_SECONDS.labels(contract_address, event_name),
+                    ),
+                )
+        return table
+
+    async def _get_logs(self, filter_options, max_retries=3, can_split=False):
+        """
+        One eth_getLogs under the in-flight cap, routed by the RPC pool (rate
+        budget, hedging, failover; old ranges only to archive endpoints).
+        Raises once max_retries is exhausted.
+        With can_split, range-size errors are raised at once so the caller can
+        retry a smaller span instead of failing over. Without it (a span at the
+        controller's floor) a timeout is the endpoint's fault: it fails over
+        and counts towards that endpoint's circuit breaker.
+        """
+        async with self._in_flight:
+            return await self.pool.call(
+                lambda w3: w3.eth.get_logs(filter_options),
+                block=filter_options["fromBlock"],
+                attempts=max_retries + 1,
+                passthrough=is_range_error if can_split else None,
+                method="eth_getLogs",
+            )
+
+    async def _sweep(self, key, filter_options, from_block, to_block, max_retries=3):
+        """
+        Cover [from_block, to_block] for one filter in sub-ranges sized by the
+        adaptive range controller under `key`. With a log_cache, only the
+        sub-ranges it doesn't hold go to the RPC, and finalized ones are stored.
+        """
+        logs, gaps, fkey = [], [(from_block, to_block)], None
+        if self.log_cache is not None:
+            fkey = filter_key(filter_options.get("address"), filter_options.get("topics"))
+            logs, gaps = await asyncio.to_thread(self.log_cache.lookup, fkey, from_block, to_block)
+            final = self.to_block - self.log_cache.finalized_depth
+        for gap_lo, gap_hi in gaps:
+            lo = gap_lo
+            while lo <= gap_hi:
+                span = self.ranges.span(key)
+                hi = min(lo + span - 1, gap_hi)
+                try:
+                    got = await self._get_logs(
+                        {**filter_options, "fromBlock": lo, "toBlock": hi},
+                        max_retries,
+                        can_split=hi - lo + 1 > self.ranges.min_span,
+                    )
+                except Exception as e:
+                    if hi - lo + 1 > self.ranges.min_span and self.ranges.on_error(key, hi - lo + 1, e):
+                        self.logger.info(f"Shrinking getLogs span for {key} to {self.ranges.span(key)}: {e}")
+                        continue
+                    raise
+                self.ranges.on_success(key, hi - lo + 1, len(got))
+                GETLOGS_RESULTS.observe(len(got))
+                if fkey is not None and lo <= final:
+                    await asyncio.to_thread(self.log_cache.store, fkey, lo, hi, got, self.to_block)
+                logs.extend(got)
+                lo = hi + 1
+        return logs
+
+    def _range_keys(self):
+        return ["combined"] if self.combined_requests else list(self.event_signatures)
+
+    async def _fetch_range(self, from_block, to_block, max_retries=3):
+        """
+        Fetch every watched contract for [from_block, to_block] concurrently.
+        Returns [(callback, decoded_event)] in (blockNumber, logIndex) order.
+        """
+        return await self._prefetch(self._decode_range(await self._fetch_raw(from_block, to_block, max_retries)))
+
+    async def _fetch_raw(self, from_block, to_block, max_retries=3):
+        """Undecoded [(contract_address, log)] for the range, in (blockNumber, logIndex) order."""
+        if self.combined_requests:
+            return await self._fetch_range_combined(from_block, to_block, max_retries)
+        # contracts already checkpointed past this range need no request
+        addresses = [a for a in self.event_signatures if self.checkpoints.get(a, -1) < to_block]
+        results = await asyncio.gather(*(
+            self._sweep(
+                contract_address,
+                {
                     "address": contract_address,
-                    "topics": [list(event_data.values())],
-                }
-                #print(filter_options)
-                retries = 0
-                while retries <= max_retries:
-                    try:
-                        logs = self.web3.eth.get_logs(filter_options)
-                        if not logs:
-                            self.logger.info(f"No logs found in blocks {self.from_block} - {end_block}")
-                            break
-                        for log in logs:
-                            print(log)
-                            #print(event_data)
-                            for event_name, signature in event_data.items():
-                                print("0x" + log["topics"][0].hex().lower(), str(signature.lower()), str("0x"+ log["topics"][0].hex().lower()) == str(signature.lower()))
-                                if str("0x"+log["topics"][0].hex())== str(signature.lower()):
-                                    decoded = self.contracts[contract_address]["contract"].events[event_name]().process_log(log)
-                                    if decoded:
-                                        await self.event_callbacks[contract_address][event_name](decoded)
-                                    else:
-                                        print(f"Unable to decode: {json.dumps(log, indent=4)}")
-                                
-                        break
+                    "topics": [list(self.event_signatures[contract_address].values())],
+                },
+                from_block,
+                to_block,
+                max_retries,
+            )
+            for contract_address in addresses
+        ))
+        tagged = [(addr, log) for addr, logs in zip(addresses, results) for log in logs]
+        tagged.sort(key=lambda t: (t[1]["blockNumber"], t[1]["logIndex"]))
+        return tagged
 
-                    except Exception as e:
-                        retries += 1
-                        self.logger.warning(f"RPC failed, switching... {e}")
-                        self.switch_rpc()
-                        await asyncio.sleep(2 ** retries)
+    async def _handle(self, callback, evt) -> None:
+        """
+        Run one event callback. An exception is logged and counted in
+        evme_callback_errors_total{contract, event} and the event is skipped:
+        one bad log must not stop the sweep (and with it run_polling/run_live)
+        or hold back the checkpoint of every other contract.
+        """
+        try:
+            await callback(evt)
+        except Exception as e:
+            CALLBACK_ERRORS.labels(evt["address"], evt["event"]).inc()
+            self.logger.error(
+                f"{evt['event']} callback failed at blk {evt['blockNumber']} #{evt['logIndex']} "
+                f"from {evt['address']}, skipped: {e!r}",
+                exc_info=True,
+            )
+
+    async def _prefetch(self, events):
+        """
+        Run prefetch hooks (block timestamps, metadata, ...) on a decoded range.
+        This happens inside the fetch task, overlapping earlier ranges' callbacks.
+        """
+        if events and self.prefetch_hooks:
+            decoded = [evt for _, evt in events]
+            for hook in self.prefetch_hooks:
+                try:
+                    await hook(decoded)
+                except Exception as e:
+                    self.logger.warning(f"Prefetch hook {getattr(hook, '__name__', hook)} failed: {e}")
+        return events
+
+    async def _fetch_range_combined(self, from_block, to_block, max_retries=3):
+        """
+        Single eth_getLogs for every watched contract and the union of their
+        topic0s; logs are routed back through dispatch_table.
+        """
+        logs = await self._sweep("combined", self._combined_filter(), from_block, to_block, max_retries)
+        return self._tag(logs)
+
+    def _combined_filter(self):
+        """Every watched contract and the union of their topic0s, in one filter."""
+        topics = sorted({sig for event_data in self.event_signatures.values() for sig in event_data.values()})
+        return {"address": list(self.event_signatures), "topics": [topics]}
+
+    def _tag(self, logs):
+        """[(contract_address, log)] in (blockNumber, logIndex) order."""
+        tagged = []
+        for log in logs:
+            # the topic union can match an event a contract isn't watched for
+            if (log["address"], log["topics"][0]) in self.dispatch_table:
+                tagged.append((log["address"], log))
+        tagged.sort(key=lambda t: (t[1]["blockNumber"], t[1]["logIndex"]))
+        return tagged
+
+    def _decode_range(self, tagged, decoded=None):
+        """
+        Batch-decode a range's [(contract_address, log)] into [(callback, decoded)].
+        `decoded` lets the caller pass in decode_logs() output computed elsewhere
+        (e.g. in a worker process).
+        """
+        if decoded is None:
+            decoded = self.decoder.decode_logs([log for _, log in tagged])
+        out = []
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        checkpoints = self.checkpoints
+        for (contract_address, log), evt in zip(tagged, decoded):
+            if log["blockNumber"] <= checkpoints.get(contract_address, -1):
+                continue  # already handled before a restart
+            entry = self.dispatch_table.get((contract_address, log["topics"][0])) if evt is not None else None
+            if entry is None or entry[1].topic_count != len(log["topics"]):
+                # undecodable, or decoded as a same-signature event this contract's ABI doesn't have
+                self.logger.warning(f"Unable to decode log at blk {log['blockNumber']} #{log['logIndex']} from {contract_address}")
+                continue
+            if debug:
+                self.logger.debug("%s %s blk %s #%s", contract_address, entry[0], log["blockNumber"], log["logIndex"])
+            out.append((entry[2], evt))
+        LOGS_DECODED.inc(len(out))
+        return out
+
+    async def fetch_logs(self, chunk_size=10000, max_retries=3):
+        """
+        Fetch logs up to head with up to max_in_flight requests outstanding.
+        Ranges are fetched ahead concurrently but handed to callbacks strictly
+        in order; from_block only moves past ranges whose callbacks all ran.
+        chunk_size seeds the adaptive span; each range is as wide as the
+        widest contract span and narrower contracts sweep it in sub-ranges.
+        With handler_workers set, the sweep runs as a Pipeline instead (see
+        pipeline.py): callbacks keep their order per contract only.
+        """
+        if not self.connected:
+            await self.init_web3()
+            if not self.connected:
+                return
+        else:
+            try:
+                self.to_block = await self.pool.call(lambda w3: w3.eth.block_number, method="eth_blockNumber")
+            except Exception as e:
+                self.logger.error(f"No RPC endpoint returned the head block: {e}")
+                return
+            self.pool.head = self.to_block
+        if self.from_block is None:
+            self.from_block = max(self.to_block - self.start_blocks_ago, 0)
+            self.logger.info(f"Starting from block: {self.from_block}, Current block: {self.to_block}")
+        self._track_head(self.to_block, self.from_block - 1)
+
+        if self.pipeline is not None:
+            return await self.pipeline.run(chunk_size, max_retries)
+
+        # enough ranges in the window to keep the in-flight cap saturated
+        per_range = 1 if self.combined_requests else max(1, len(self.event_signatures))
+        lookahead = max(2, -(-self.max_in_flight // per_range) + 1)
+        next_start = self.from_block
+        pending = deque()
+        try:
+            while pending or next_start <= self.to_block:
+                while next_start <= self.to_block and len(pending) < lookahead:
+                    span = max(self.ranges.span(key, chunk_size) for key in self._range_keys())
+                    end_block = min(next_start + span - 1, self.to_block)
+                    task = asyncio.create_task(self._fetch_range(next_start, end_block, max_retries))
+                    pending.append((next_start, end_block, task))
+                    next_start = end_block + 1
 
-            self.from_block = end_block + 1
-            self.logger.info(f"Updated to block: {self.from_block}")
-            await asyncio.sleep(random.uniform(4, 10))
+                start_block, end_block, task = pending.popleft()
+                try:
+                    events = await task
+                except Exception as e:
+                    self.logger.error(f"Giving up on blocks {start_block} - {end_block} for now: {e}")
+                    return
+                if not events:
+                    self.logger.info(f"No logs found in blocks {start_block} - {end_block}")
+                for callback, decoded in events:
+                    await self._handle(callback, decoded)
+                try:
+                    for flush in self.flush_hooks:
+                        await flush()
+                except Exception as e:
+                    self.logger.error(f"Flush failed after blocks {start_block} - {end_block}, not advancing: {e}")
+                    return
+
+                # callbacks and their buffered DB writes are committed: safe to persist
+                await self._save_checkpoint(end_block)
+                self.from_block = end_block + 1
+                self.logger.info(f"Updated to block: {self.from_block}")
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+            await asyncio.gather(*(t for _, _, t in pending), return_exceptions=True)
+
+    async def _dispatch_live(self, logs):
+        """Run callbacks for complete blocks of subscription logs, flush, checkpoint."""
+        events = await self._prefetch(self._decode_range(self._tag(logs)))
+        for callback, decoded in events:
+            await self._handle(callback, decoded)
+        for flush in self.flush_hooks:
+            await flush()
+        last = max(log["blockNumber"] for log in logs)
+        await self._save_checkpoint(last)
+        self.from_block = max(self.from_block, last + 1)
+        self.logger.info(f"Live: {len(events)} event(s) up to block {last}")
+
+    async def _consume(self, sub, settle):
+        """
+        Dispatch subscription logs block by block. Logs of one block arrive
+        in a burst, so a block is complete once a later block shows up or
+        nothing arrived for `settle` seconds.
+        """
+        pending = []
+        while True:
+            try:
+                log = await asyncio.wait_for(sub.get(), settle) if pending else await sub.get()
+            except asyncio.TimeoutError:
+                await self._dispatch_live(pending)
+                pending = []
+                continue
+            if log.get("removed"):
+                self.logger.warning(f"Reorg: log at blk {log['blockNumber']} #{log['logIndex']} was removed (not rolled back)")
+                continue
+            if pending and log["blockNumber"] > pending[-1]["blockNumber"]:
+                await self._dispatch_live(pending)
+                pending = []
+            pending.append(log)
+
+    def _hold_rpc(self):
+        if self._shared_rpc:
+            self.rpc.retain()
+
+    async def _drop_rpc(self):
+        """Release the shared backend; other holders (another fetcher, aux_funcs' calls) keep their sessions."""
+        if self._shared_rpc:
+            await self.rpc.release()
+
+    async def run_live(self, ws_url, chunk_size=2000, poll_interval=5, reconnect_delay=5, max_reconnect_delay=60, settle=1.0):
+        """
+        Push-based live mode: eth_subscribe("logs") for every watched
+        address/topic0 over ws_url, dispatched to the same callbacks.
+
+        Each (re)connect subscribes first and then gap-fills from the
+        checkpoint with fetch_logs, so nothing between the last handled block
+        and the subscription is lost (overlap is skipped by the checkpoint).
+        While the socket is down the poller takes over, retrying the socket
+        with exponential backoff.
+        """
+        self.logger.info(f"Starting live subscription on {ws_url}...")
+        delay = reconnect_delay
+        self._hold_rpc()
+        await self.exporter.start()
+        try:
+            while True:
+                try:
+                    async with LogSubscription(ws_url, self._combined_filter()) as sub:
+                        await self.fetch_logs(chunk_size=chunk_size)
+                        if not self.connected or self.to_block is None or self.from_block <= self.to_block:
+                            raise RuntimeError(f"gap fill stopped at block {self.from_block}")
+                        delay = reconnect_delay
+                        await self._consume(sub, settle)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"Live subscription down ({e}); polling every {poll_interval}s, "
+                                        f"retrying the socket in {delay:.0f}s")
+                # poller fallback until the next reconnect attempt
+                deadline = asyncio.get_running_loop().time() + delay
+                while True:
+                    await self.fetch_logs(chunk_size=chunk_size)
+                    left = deadline - asyncio.get_running_loop().time()
+                    if left <= 0:
+                        break
+                    await asyncio.sleep(min(poll_interval, left))
+                delay = min(delay * 2, max_reconnect_delay)
+        except asyncio.CancelledError:
+            self.logger.info("Live subscription canceled.")
+        finally:
+            if self.pipeline is not None:
+                self.pipeline.close()
+            await self.exporter.stop()
+            await self._drop_rpc()
 
     async def run_polling(self, sleep_time=5, chunk_size=2000):
         self.logger.info("Starting event polling...")
+        self._hold_rpc()
+        await self.exporter.start()
         try:
             while True:
                 await self.fetch_logs(chunk_size=chunk_size)
@@ -158,4 +539,9 @@ class AsyncEVME:
             self.logger.info("Polling canceled.")
         except KeyboardInterrupt:
             self.logger.info("Polling stopped by user.")
-            exit()
\ No newline at end of file
+            exit()
+        finally:
+            if self.pipeline is not None:
+                self.pipeline.close()
+            await self.exporter.stop()
+            await self._drop_rpc()
@@ -2,8 +2,8 @@
 
 from settings import *
 # main (excerpt)
-from aux_funcs import my_func as handle_swap, handle_transfer, lp_mint
-from evme import AsyncEVME
+# Nothing heavy happens at import: the fetcher (and with it aux_funcs, web3,
+# the ABIs) is built on first access of evme_config.fetcher.
 
 kensei = "0xfB889425B72c97C5b4484cF148AE2404AB7A13e7"
 kensei_lp = "0x2f4Cdf4ad2203D5bcA9CCB5485727D89603e2E39"
@@ -27,39 +27,77 @@ monkey_lp = "0xc57e71F33C2Ce6FDcC6535F2d62e045053C10C91"
 
 shibo ="0x10808137849E3Ed8860Da01CAD376B03889684Ef"
 shibo_lp ="0xa4A708B96A513113d30C4a09F410E28F10bdB147"
-CONTRACT_ABI_MAP = {
-    #KIDDO_LP: ABI_FILES["lp_pair_abi"],
-    msmoon_lp: ABI_FILES["lp_pair_abi"], #21073537
-    msmoon: ABI_FILES["erc20_abi"],
-    moonshot_lp: ABI_FILES["lp_pair_abi"], #  last 21075290
-    moonshot: ABI_FILES["erc20_abi"],
-    sscl_lp: ABI_FILES["lp_pair_abi"], # start at 20885477 / last 21075616
-    sscl: ABI_FILES["erc20_abi"],
-    sds_lp: ABI_FILES["lp_pair_abi"], #21073537
-    sds: ABI_FILES["erc20_abi"],
-    monkey: ABI_FILES["erc20_abi"], # starts 19903684 / last 20643684
-    monkey_lp: ABI_FILES["lp_pair_abi"], 
-    shibo: ABI_FILES["erc20_abi"], # starts 19903684
-    shibo_lp: ABI_FILES["lp_pair_abi"], 
+def contract_abi_map():
+    return {
+        #KIDDO_LP: ABI_FILES["lp_pair_abi"],
+        msmoon_lp: ABI_FILES["lp_pair_abi"], #21073537
+        msmoon: ABI_FILES["erc20_abi"],
+        moonshot_lp: ABI_FILES["lp_pair_abi"], #  last 21075290
+        moonshot: ABI_FILES["erc20_abi"],
+        sscl_lp: ABI_FILES["lp_pair_abi"], # start at 20885477 / last 21075616
+        sscl: ABI_FILES["erc20_abi"],
+        sds_lp: ABI_FILES["lp_pair_abi"], #21073537
+        sds: ABI_FILES["erc20_abi"],
+        monkey: ABI_FILES["erc20_abi"], # starts 19903684 / last 20643684
+        monkey_lp: ABI_FILES["lp_pair_abi"],
+        shibo: ABI_FILES["erc20_abi"], # starts 19903684
+        shibo_lp: ABI_FILES["lp_pair_abi"],
+    }
 
-}
+def contract_event_map():
+    from aux_funcs import my_func as handle_swap, handle_transfer, lp_mint
+    return {
+        monkey_lp: {
+            "Swap": handle_swap,
+            #"Mint": lp_mint,
+        },
+        monkey: {
+            "Transfer": handle_transfer,
+        },
+    }
 
-CONTRACT_EVENT_MAP = {
-    monkey_lp: {
-        "Swap": handle_swap,
-        #"Mint": lp_mint,
-    },
-    monkey: {
-        "Transfer": handle_transfer,
-    },
-}
+def build_fetcher():
+    from aux_funcs import prefetch_block_ts, prefetch_models, WRITER
+    from evme import AsyncEVME
+    from log_cache import LogCache
+
+    if CANDLES:
+        # candles are folded in inside each WRITER flush transaction (numpy only loaded here)
+        from store.candles import CandleEngine
+        try:
+            WRITER.hooks.append(CandleEngine().on_flush)
+        except RuntimeError as e:
+            raise RuntimeError(f"{e}; or set CANDLES=0 to run without candles") from None
 
-fetcher = AsyncEVME(
-    rpc_urls=[RPC2, RPC],
-    contracts=CONTRACT_ABI_MAP,
-    event_callbacks=CONTRACT_EVENT_MAP,
-    start_blocks_ago=1000,
-    start_from_block=19903684,
-    persistence_file="/mnt/usb/RPI4/KIDDO/last_block.json"
-)
+    return AsyncEVME(
+        rpc_urls=[RPC2, RPC, RPC_URL],
+        archive_urls=[RPC],  # Zeeve archive node: the only one asked for deep history
+        contracts=contract_abi_map(),
+        event_callbacks=contract_event_map(),
+        start_blocks_ago=1000,
+        start_from_block=19903684,
+        persistence_file="/mnt/usb/RPI4/KIDDO/last_block.json",
+        combined_requests=COMBINED_REQUESTS,
+        flush_hooks=[WRITER.flush],
+        prefetch_hooks=[prefetch_models, prefetch_block_ts],
+        # raw finalized getLogs results, so re-syncs/backfills don't hit the RPC
+        log_cache=LogCache(LOG_CACHE_PATH) if LOG_CACHE_PATH else None,
+        # fetch/decode/handle/persist as separate stages; handlers keep per-contract order
+        handler_workers=HANDLER_WORKERS,
+        # counters/histograms of the ingestion loop; a summary line is logged every minute
+        metrics_port=METRICS_PORT,
+    )
+
+_LAZY = {
+    "fetcher": build_fetcher,
+    "CONTRACT_ABI_MAP": contract_abi_map,
+    "CONTRACT_EVENT_MAP": contract_event_map,
+}
 
+def __getattr__(name):
+    """evme_config.fetcher / CONTRACT_*_MAP: built on first access, then cached."""
+    build = _LAZY.get(name)
+    if build is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = build()
+    return value
@@ -0,0 +1,190 @@
+# log_cache.py
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+logger = logging.getLogger("LogCache")
+
+_HEX_FIELDS = ("blockHash", "transactionHash", "data")
+
+def _norm_topic(t: Any) -> Any:
+    if t is None:
+        return None
+    if isinstance(t, (list, tuple)):
+        return sorted(_norm_topic(x) for x in t)
+    if isinstance(t, (bytes, bytearray)):
+        return "0x" + bytes(t).hex()
+    return str(t).lower()
+
+def filter_key(address: Any, topics: Optional[Sequence[Any]]) -> str:
+    """Content address of an (address, topics) filter, independent of block range."""
+    addrs = sorted(a.lower() for a in ([address] if isinstance(address, str) else (address or [])))
+    topics = [_norm_topic(t) for t in (topics or [])]
+    while topics and topics[-1] is None:
+        topics.pop()  # [t0, None, None] matches the same logs as [t0]
+    raw = json.dumps({"address": addrs, "topics": topics}, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def _pack(log: Any) -> Dict[str, Any]:
+    out = {}
+    for k, v in dict(log).items():
+        if k == "topics":
+            out[k] = ["0x" + bytes(HexBytes(t)).hex() for t in v]
+        elif isinstance(v, (bytes, bytearray)):
+            out[k] = "0x" + bytes(v).hex()
+        else:
+            out[k] = v
+    return out
+
+def _unpack(d: Dict[str, Any]) -> AttributeDict:
+    d = dict(d)
+    d["topics"] = [HexBytes(t) for t in d.get("topics", [])]
+    for k in _HEX_FIELDS:
+        if isinstance(d.get(k), str):
+            d[k] = HexBytes(d[k])
+    return AttributeDict(d)
+
+
+class LogCache:
+    """
+    On-disk cache of raw eth_getLogs results (one SQLite file per chain).
+
+    Entries are zlib-compressed JSON segments keyed by filter_key(address,
+    topics) and a block interval. lookup() returns the cached logs for a
+    range plus the sub-ranges still missing, so overlapping requests only
+    fetch the gaps. Only blocks at least `finalized_depth` below head are
+    stored (reorg-safe, never revalidated); the least recently used
+    segments are evicted once the file holds more than max_bytes.
+    """
+
+    def __init__(self, path: str = "logcache.sqlite3", max_bytes: int = 512 << 20, finalized_depth: int = 64):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.finalized_depth = finalized_depth
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._size = 0
+        self.hit_blocks = 0
+        self.miss_blocks = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        """Open (and create) the file on first use; callers hold self._lock."""
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                " id INTEGER PRIMARY KEY, fkey TEXT NOT NULL, lo INTEGER NOT NULL, hi INTEGER NOT NULL,"
+                " n INTEGER NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL, data BLOB NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS segments_fkey_lo ON segments (fkey, lo)")
+            db.execute("CREATE INDEX IF NOT EXISTS segments_used ON segments (used)")
+            self._size = db.execute("SELECT COALESCE(SUM(size), 0) FROM segments").fetchone()[0]
+            self._db = db
+        return self._db
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---------------------------------------------------------------
+    # read
+    # ---------------------------------------------------------------
+    def lookup(self, key: str, lo: int, hi: int) -> Tuple[List[AttributeDict], List[Tuple[int, int]]]:
+        """(cached logs in [lo, hi] in block order, missing [(lo, hi)] sub-ranges)."""
+        with self._lock:
+            db = self._conn()
+            rows = db.execute(
+                "SELECT id, lo, hi FROM segments WHERE fkey = ? AND hi >= ? AND lo <= ? ORDER BY lo, hi DESC",
+                (key, lo, hi),
+            ).fetchall()
+            missing: List[Tuple[int, int]] = []
+            parts: List[Tuple[int, int, int]] = []  # (segment id, take_lo, take_hi)
+            cursor = lo
+            for seg_id, s_lo, s_hi in rows:
+                if s_hi < cursor:
+                    continue  # already covered by an earlier segment
+                if s_lo > cursor:
+                    missing.append((cursor, s_lo - 1))
+                take_hi = min(s_hi, hi)
+                parts.append((seg_id, max(s_lo, cursor), take_hi))
+                cursor = take_hi + 1
+                if cursor > hi:
+                    break
+            if cursor <= hi:
+                missing.append((cursor, hi))
+
+            logs: List[AttributeDict] = []
+            if parts:
+                now = time.time()
+                db.executemany("UPDATE segments SET used = ? WHERE id = ?", [(now, p[0]) for p in parts])
+                for seg_id, t_lo, t_hi in parts:
+                    (blob,) = db.execute("SELECT data FROM segments WHERE id = ?", (seg_id,)).fetchone()
+                    for d in json.loads(zlib.decompress(blob)):
+                        if t_lo <= d["blockNumber"] <= t_hi:
+                            logs.append(_unpack(d))
+        covered = (hi - lo + 1) - sum(m_hi - m_lo + 1 for m_lo, m_hi in missing)
+        self.hit_blocks += covered
+        self.miss_blocks += hi - lo + 1 - covered
+        return logs, missing
+
+    # ---------------------------------------------------------------
+    # write
+    # ---------------------------------------------------------------
+    def store(self, key: str, lo: int, hi: int, logs: Sequence[Any], head: int) -> bool:
+        """
+        Remember the complete result of eth_getLogs over [lo, hi]. The part
+        above head - finalized_depth is dropped. Returns True if stored.
+        """
+        final = head - self.finalized_depth
+        hi = min(hi, final)
+        if lo > hi:
+            return False
+        packed = [_pack(lg) for lg in logs if lg["blockNumber"] <= hi]
+        blob = zlib.compress(json.dumps(packed, separators=(",", ":")).encode(), 6)
+        with self._lock:
+            self._conn().execute(
+                "INSERT INTO segments (fkey, lo, hi, n, size, used, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, lo, hi, len(packed), len(blob), time.time(), blob),
+            )
+            self._size += len(blob)
+            if self._size > self.max_bytes:
+                self._evict()
+        return True
+
+    def _evict(self) -> None:
+        target = int(self.max_bytes * 0.9)
+        freed, ids = 0, []
+        for seg_id, size in self._db.execute("SELECT id, size FROM segments ORDER BY used"):
+            if self._size - freed <= target:
+                break
+            ids.append((seg_id,))
+            freed += size
+        self._db.executemany("DELETE FROM segments WHERE id = ?", ids)
+        self._size -= freed
+        logger.info(f"Evicted {len(ids)} segment(s), {freed / 1e6:.1f} MB")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self._conn().execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        total = self.hit_blocks + self.miss_blocks
+        return {
+            "segments": n,
+            "bytes": self._size,
+            "hit_blocks": self.hit_blocks,
+            "miss_blocks": self.miss_blocks,
+            "hit_rate": self.hit_blocks / total if total else 0.0,
+        }
@@ -1,21 +1,27 @@
 import asyncio as asy
 from store.models import Swap, Token, Pool, Transfer
-from evme_config import fetcher
+from evme_config import WS_URL
 
 from abi.get_abis import ABI_FILES
 from store.db import init_db, close_db
 
 async def main():
+    from evme_config import fetcher  # built here, not at import
     await init_db()           # uses DB_URL env or sqlite://events.sqlite3
     a = await Swap.filter()
     print(len(a))
     try:
-        await fetcher.run_polling(30, 10_000)
+        if WS_URL:
+            # logs are pushed as blocks land; the poller only covers socket outages
+            await fetcher.run_live(WS_URL, chunk_size=10_000, poll_interval=5)
+        else:
+            await fetcher.run_polling(30, 10_000)
     finally:
         await close_db()
 
 
 async def main2():
+    from evme_config import fetcher
 
     """await Comp.create(
         spots = 5,
@@ -0,0 +1,341 @@
+# metrics.py
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("Metrics")
+
+# ---------------------------------------------------------------------
+# Metric types
+#   Everything is updated from the event loop thread (LogCache counters are
+#   only read), so there are no locks: a hot-path update is a dict lookup
+#   plus a few float ops.
+# ---------------------------------------------------------------------
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (0, 1, 10, 100, 500, 1000, 5000, 10000, 50000)
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, n: float = 1) -> None:
+        self.value += n
+
+    def set(self, v: float) -> None:
+        self.value = v
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        if not self.label_names:
+            self._default = self.labels()
+
+    @abstractmethod
+    def _new(self):
+        """Value holder for one label combination (_Value, _Buckets, ...)."""
+
+    def labels(self, *values: Any):
+        """Child for one label combination (created on first use; keep it around on hot paths)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} takes labels {self.label_names}, got {values}")
+            child = self._children[values] = self._new()
+        return child
+
+    def _label_str(self, values: Tuple[Any, ...], extra: str = "") -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, values)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}{self._label_str(values)} {_fmt(child.value)}")
+        return lines
+
+    def total(self) -> float:
+        return sum(c.value for c in list(self._children.values()))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new(self):
+        return _Value()
+
+    def inc(self, n: float = 1) -> None:
+        self._default.value += n
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, v: float) -> None:
+        self._default.value = v
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels)
+
+    def _new(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, v: float) -> None:
+        self._default.observe(v)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), child.counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{_fmt(bound)}"'
+                lines.append(f"{self.name}_bucket{self._label_str(values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_str(values)} {_fmt(child.sum)}")
+            lines.append(f"{self.name}_count{self._label_str(values)} {child.count}")
+        return lines
+
+    def merged(self) -> Tuple[List[int], float, int]:
+        """(bucket counts, sum, count) over every label combination."""
+        counts, s, n = [0] * (len(self.buckets) + 1), 0.0, 0
+        for child in list(self._children.values()):
+            counts = [a + b for a, b in zip(counts, child.counts)]
+            s += child.sum
+            n += child.count
+        return counts, s, n
+
+    def quantile(self, q: float, counts: Sequence[int]) -> float:
+        """Estimate from bucket counts, interpolating inside the bucket (like histogram_quantile)."""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank, seen = q * total, 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lo = self.buckets[i - 1] if i else 0.0
+                return lo + (self.buckets[i] - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+# ---------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------
+class Registry:
+    """
+    Named metrics plus collectors: functions run right before a scrape or a
+    summary, for values that are cheaper to read than to count (cache hits
+    the caches already keep, ...).
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def _add(self, metric: _Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def collect(self) -> None:
+        for fn in self.collectors:
+            try:
+                fn()
+            except Exception as e:
+                logger.debug(f"Collector {getattr(fn, '__name__', fn)} failed: {e}")
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        self.collect()
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry; the ingestion loop's metrics are defined here so
+# the whole surface can be read in one place.
+METRICS = Registry()
+
+RPC_SECONDS = METRICS.histogram("evme_rpc_request_seconds", "RPC call latency", ("endpoint", "method"))
+RPC_ERRORS = METRICS.counter("evme_rpc_errors_total", "Failed RPC calls (range-too-large included)", ("endpoint", "method"))
+RPC_FAILOVERS = METRICS.counter("evme_rpc_failovers_total", "Calls retried on another endpoint")
+RPC_HEDGED = METRICS.counter("evme_rpc_hedged_total", "Calls hedged to a second endpoint")
+RPC_HEDGE_WINS = METRICS.counter("evme_rpc_hedge_wins_total", "Hedged calls answered first by the backup")
+GETLOGS_RESULTS = METRICS.histogram("evme_getlogs_results", "Logs returned per eth_getLogs", buckets=SIZE_BUCKETS)
+LOGS_DECODED = METRICS.counter("evme_logs_decoded_total", "Logs decoded and dispatched to callbacks")
+CALLBACK_SECONDS = METRICS.histogram("evme_callback_seconds", "Event callback latency", ("contract", "event"))
+CALLBACK_ERRORS = METRICS.counter("evme_callback_errors_total", "Event callbacks that raised (logged and skipped)", ("contract", "event"))
+DB_FLUSH_SECONDS = METRICS.histogram("evme_db_flush_seconds", "BatchWriter flush transaction latency")
+DB_FLUSH_ROWS = METRICS.histogram("evme_db_flush_rows", "Rows written per BatchWriter flush", buckets=SIZE_BUCKETS)
+HEAD_BLOCK = METRICS.gauge("evme_head_block", "Latest head block seen")
+CHECKPOINT_BLOCK = METRICS.gauge("evme_checkpoint_block", "Last block whose callbacks and writes are committed")
+BLOCK_LAG = METRICS.gauge("evme_block_lag", "Blocks between head and the checkpoint")
+CACHE_HITS = METRICS.counter("evme_cache_hits_total", "Cache hits", ("cache",))
+CACHE_MISSES = METRICS.counter("evme_cache_misses_total", "Cache misses", ("cache",))
+
+def watch_cache(name: str, cache: Any, hits: str = "hits", misses: str = "misses") -> None:
+    """Export a cache's own hit/miss attributes as evme_cache_*_total{cache=name}."""
+    h, m = CACHE_HITS.labels(name), CACHE_MISSES.labels(name)
+
+    def _collect() -> None:
+        h.value, m.value = getattr(cache, hits), getattr(cache, misses)
+    METRICS.collectors.append(_collect)
+
+def timed(callback: Callable, hist: Any) -> Callable:
+    """Wrap an async callback so each call is observed in `hist` (a Histogram child)."""
+    async def run(evt):
+        t0 = time.perf_counter()
+        try:
+            return await callback(evt)
+        finally:
+            hist.observe(time.perf_counter() - t0)
+    run.__name__ = getattr(callback, "__name__", "callback")
+    return run
+
+
+# ---------------------------------------------------------------------
+# Exposure: /metrics over HTTP + a periodic summary log line
+# ---------------------------------------------------------------------
+class Exporter:
+    """
+    Serves METRICS.render() at http://host:port/metrics (if port is set) and
+    logs a one-line summary every `log_every` seconds (if set).
+    """
+
+    def __init__(self, port: Optional[int] = None, host: str = "127.0.0.1", log_every: Optional[float] = 60,
+                 registry: Registry = METRICS):
+        self.port = port
+        self.host = host
+        self.log_every = log_every
+        self.registry = registry
+        self._runner = None
+        self._task: Optional[asyncio.Task] = None
+        self._last: Optional[Dict[str, Any]] = None
+
+    async def start(self) -> None:
+        if self.port and self._runner is None:
+            from aiohttp import web
+
+            async def handle(request):
+                return web.Response(text=self.registry.render(), content_type="text/plain",
+                                    headers={"X-Prometheus-Format": "0.0.4"})
+            app = web.Application()
+            app.router.add_get("/metrics", handle)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, self.host, self.port).start()
+            logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+        if self.log_every and self._task is None:
+            self._last = self._sample()
+            self._task = asyncio.create_task(self._log_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _sample(self) -> Dict[str, Any]:
+        METRICS.collect()
+        return {
+            "t": time.monotonic(),
+            "decoded": LOGS_DECODED.total(),
+            "rpc": RPC_SECONDS.merged(),
+            "rpc_errors": RPC_ERRORS.total(),
+            "failovers": RPC_FAILOVERS.total(),
+            "getlogs": GETLOGS_RESULTS.merged(),
+            "callbacks": CALLBACK_SECONDS.merged(),
+            "flush": DB_FLUSH_SECONDS.merged(),
+            "rows": DB_FLUSH_ROWS.merged(),
+            "hits": {k[0]: c.value for k, c in CACHE_HITS._children.items()},
+            "misses": {k[0]: c.value for k, c in CACHE_MISSES._children.items()},
+        }
+
+    def summary(self) -> str:
+        """Rates and latencies since the previous summary."""
+        now, prev = self._sample(), self._last
+        self._last = now
+        dt = max(1e-9, now["t"] - prev["t"])
+
+        def delta(key):
+            (c1, s1, n1), (c0, s0, n0) = now[key], prev[key]
+            return [a - b for a, b in zip(c1, c0)], s1 - s0, n1 - n0
+
+        rpc, cb, fl = delta("rpc"), delta("callbacks"), delta("flush")
+        gl, rows = delta("getlogs"), delta("rows")
+        ms = lambda h, d, q: h.quantile(q, d[0]) * 1000
+        caches = []
+        for name, hits in now["hits"].items():
+            h = hits - prev["hits"].get(name, 0)
+            m = now["misses"].get(name, 0) - prev["misses"].get(name, 0)
+            caches.append(f"{name} {100 * h / (h + m):.0f}%" if h + m else f"{name} -")
+        return (
+            f"{(now['decoded'] - prev['decoded']) / dt:.0f} logs/s decoded, "
+            f"callbacks {cb[2]} (p50 {ms(CALLBACK_SECONDS, cb, 0.5):.1f}ms p99 {ms(CALLBACK_SECONDS, cb, 0.99):.1f}ms), "
+            f"rpc {rpc[2]} calls (p50 {ms(RPC_SECONDS, rpc, 0.5):.0f}ms p99 {ms(RPC_SECONDS, rpc, 0.99):.0f}ms, "
+            f"{now['rpc_errors'] - prev['rpc_errors']:.0f} errors, {now['failovers'] - prev['failovers']:.0f} failovers), "
+            f"getLogs avg {gl[1] / gl[2] if gl[2] else 0:.0f} logs, "
+            f"db {fl[2]} flushes (avg {rows[1] / rows[2] if rows[2] else 0:.0f} rows, p99 {ms(DB_FLUSH_SECONDS, fl, 0.99):.0f}ms), "
+            f"lag {BLOCK_LAG.total():.0f} blocks, "
+            f"cache hits {', '.join(caches) or '-'}"
+        )
+
+    async def _log_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.log_every)
+            logger.info(self.summary())
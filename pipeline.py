@@ -0,0 +1,249 @@
+# pipeline.py
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from decoders import LogDecoder, get_event_decoder
+
+# ---------------------------------------------------------------------
+# Decoding in worker processes
+#   EventDecoders hold eth-abi objects and lambdas that don't pickle, so
+#   each worker builds its own LogDecoder from the (abi, event) pairs once.
+# ---------------------------------------------------------------------
+_WORKER_DECODER: Optional[LogDecoder] = None
+
+def _init_worker(specs: Sequence[Tuple[list, str]]) -> None:
+    global _WORKER_DECODER
+    _WORKER_DECODER = LogDecoder(get_event_decoder(abi, name) for abi, name in specs)
+
+def _decode_in_worker(logs: List[Any]) -> List[Any]:
+    return _WORKER_DECODER.decode_logs(logs)
+
+
+class _Range:
+    """One block range on its way through the stages."""
+
+    __slots__ = ("lo", "hi", "events", "pending", "done")
+
+    def __init__(self, lo: int, hi: int, events: int, workers: int):
+        self.lo, self.hi, self.events = lo, hi, events
+        self.pending = workers  # handler workers that haven't passed the range's end marker
+        self.done = asyncio.get_running_loop().create_future()
+
+
+class Pipeline:
+    """
+    AsyncEVME.fetch_logs as a staged pipeline connected by bounded queues:
+
+        fetch ──► decode (+ prefetch hooks) ──► handler workers ──► persist
+
+    - fetch: up to `lookahead` ranges in flight (same as the inline loop),
+      handed on strictly in block order
+    - decode: decode_logs() in-process, or in a process pool of
+      `decode_processes` for CPU-heavy ranges; prefetch hooks run here
+    - handlers: `handler_workers` tasks; each contract is pinned to one
+      worker, so one contract's callbacks run in (block, logIndex) order
+      while different contracts proceed independently. A callback that
+      raises is logged and counted (AsyncEVME._handle), not fatal
+    - persist: once every worker is past a range, flush hooks run and the
+      checkpoint moves to the range's last block
+
+    Backpressure: at most `max_unflushed` ranges sit between decode and
+    persist, and every queue is bounded, so a slow DB flush stalls decoding
+    and then fetching instead of piling up events in memory.
+    """
+
+    def __init__(
+        self,
+        fetcher,
+        handler_workers: int = 4,
+        queue_size: int = 4,           # ranges waiting for decode
+        handler_queue_size: int = 10_000,  # events waiting per handler worker
+        max_unflushed: int = 4,        # decoded ranges not yet persisted
+        decode_processes: int = 0,
+        report_every: float = 30,
+    ):
+        self.f = fetcher
+        self.logger = logging.getLogger("Pipeline")
+        self.workers = max(1, handler_workers)
+        self.queue_size = queue_size
+        self.handler_queue_size = handler_queue_size
+        self.max_unflushed = max_unflushed
+        self.decode_processes = decode_processes
+        self.report_every = report_every
+        # contracts pinned round-robin; stable for the life of the fetcher
+        self.partition: Dict[str, int] = {a: i % self.workers for i, a in enumerate(sorted(fetcher.event_signatures))}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._decode_q: Optional[asyncio.Queue] = None
+        self._worker_qs: List[asyncio.Queue] = []
+        self._persist_q: Optional[asyncio.Queue] = None
+        self.handled = 0
+
+    # ---------------------------------------------------------------
+    # introspection
+    # ---------------------------------------------------------------
+    def depths(self) -> Dict[str, Any]:
+        """Current queue depths: ranges for decode/persist, events per handler worker."""
+        if self._decode_q is None:
+            return {}
+        return {
+            "decode": self._decode_q.qsize(),
+            "handlers": [q.qsize() for q in self._worker_qs],
+            "persist": self._persist_q.qsize(),
+        }
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    # ---------------------------------------------------------------
+    # stages
+    # ---------------------------------------------------------------
+    async def _fetch(self, chunk_size: int, max_retries: int) -> None:
+        f = self.f
+        per_range = 1 if f.combined_requests else max(1, len(f.event_signatures))
+        lookahead = max(2, -(-f.max_in_flight // per_range) + 1)
+        next_start = f.from_block
+        pending = deque()
+        try:
+            while pending or next_start <= f.to_block:
+                while next_start <= f.to_block and len(pending) < lookahead:
+                    span = max(f.ranges.span(key, chunk_size) for key in f._range_keys())
+                    end_block = min(next_start + span - 1, f.to_block)
+                    task = asyncio.create_task(f._fetch_raw(next_start, end_block, max_retries))
+                    pending.append((next_start, end_block, task))
+                    next_start = end_block + 1
+                lo, hi, task = pending.popleft()
+                try:
+                    tagged = await task
+                except Exception as e:
+                    self.f.logger.error(f"Giving up on blocks {lo} - {hi} for now: {e}")
+                    break
+                await self._decode_q.put((lo, hi, tagged))  # blocks while decode is behind
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+            await asyncio.gather(*(t for _, _, t in pending), return_exceptions=True)
+        await self._decode_q.put(None)
+
+    async def _decode(self) -> None:
+        f = self.f
+        unflushed = self._unflushed
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._decode_q.get()
+            if item is None:
+                break
+            lo, hi, tagged = item
+            decoded = None
+            if self._pool is not None and tagged:
+                decoded = await loop.run_in_executor(self._pool, _decode_in_worker, [log for _, log in tagged])
+            events = await f._prefetch(f._decode_range(tagged, decoded))
+            if not events:
+                f.logger.info(f"No logs found in blocks {lo} - {hi}")
+            await unflushed.acquire()  # released by persist: the DB sets the pace
+            rng = _Range(lo, hi, len(events), self.workers)
+            for callback, evt in events:
+                await self._worker_qs[self.partition.get(evt["address"], 0)].put((callback, evt))
+            for q in self._worker_qs:
+                await q.put(rng)  # end-of-range marker
+            await self._persist_q.put(rng)
+        for q in self._worker_qs:
+            await q.put(None)
+        await self._persist_q.put(None)
+
+    async def _handle(self, q: asyncio.Queue) -> None:
+        while True:
+            item = await q.get()
+            if item is None:
+                return
+            if isinstance(item, _Range):
+                item.pending -= 1
+                if not item.pending and not item.done.done():
+                    item.done.set_result(None)
+                continue
+            callback, evt = item
+            await self.f._handle(callback, evt)  # logs, counts and skips a failing callback
+            self.handled += 1
+
+    async def _persist(self) -> None:
+        f = self.f
+        while True:
+            rng = await self._unless_aborted(self._persist_q.get())
+            if rng is None:
+                return
+            await self._unless_aborted(rng.done)
+            try:
+                for flush in f.flush_hooks:
+                    await flush()
+            except Exception as e:
+                f.logger.error(f"Flush failed after blocks {rng.lo} - {rng.hi}, not advancing: {e}")
+                return
+            # callbacks and their buffered DB writes are committed: safe to persist
+            await f._save_checkpoint(rng.hi)
+            f.from_block = rng.hi + 1
+            self._unflushed.release()
+            f.logger.info(f"Updated to block: {f.from_block}")
+
+    async def _unless_aborted(self, aw):
+        """await aw, or raise the error of whichever stage failed first."""
+        fut = asyncio.ensure_future(aw)
+        await asyncio.wait({fut, self._abort}, return_when=asyncio.FIRST_COMPLETED)
+        if self._abort.done():
+            fut.cancel()
+            raise self._abort.exception()
+        return fut.result()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        task.add_done_callback(self._on_stage_done)
+        return task
+
+    def _on_stage_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None and not self._abort.done():
+            self._abort.set_exception(task.exception())
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_every)
+            self.logger.info(f"Queue depths {self.depths()}, {self.handled} events handled, at block {self.f.from_block}")
+
+    # ---------------------------------------------------------------
+    # run
+    # ---------------------------------------------------------------
+    async def run(self, chunk_size: int = 10000, max_retries: int = 3) -> None:
+        """One sweep from fetcher.from_block to fetcher.to_block."""
+        if self.decode_processes and self._pool is None:
+            specs = [
+                (self.f.contracts[addr]["abi"], name)
+                for addr, events in self.f.event_signatures.items()
+                for name in events
+            ]
+            self._pool = ProcessPoolExecutor(self.decode_processes, initializer=_init_worker, initargs=(specs,))
+        self._decode_q = asyncio.Queue(self.queue_size)
+        self._worker_qs = [asyncio.Queue(self.handler_queue_size) for _ in range(self.workers)]
+        self._persist_q = asyncio.Queue()
+        self._unflushed = asyncio.Semaphore(self.max_unflushed)
+        self._abort = asyncio.get_running_loop().create_future()
+
+        tasks = [self._spawn(self._handle(q)) for q in self._worker_qs]
+        tasks += [
+            self._spawn(self._fetch(chunk_size, max_retries)),
+            self._spawn(self._decode()),
+            asyncio.create_task(self._report()),
+        ]
+        t0 = time.monotonic()
+        try:
+            await self._persist()
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self._abort.done():
+                self._abort.exception()  # retrieved (raised above or superseded)
+        self.logger.debug(f"Sweep done in {time.monotonic() - t0:.1f}s, {self.handled} events handled")
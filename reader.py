@@ -1,13 +1,16 @@
 import asyncio as asy
-from store.models import Swap, Token, Pool, Transfer
-from evme_config import fetcher
+from typing import AsyncIterator, Iterable, List, Optional, Tuple, Type
+
+from tortoise.expressions import Q
+from tortoise.models import Model
 
-from abi.get_abis import ABI_FILES
+from store.models import Swap, Token, Pool, Transfer
+from store.cache import MODELS
 from store.db import init_db, close_db
 
-def format_amount(raw: str, decimals: int = 18) -> str:
+def format_amount(raw, decimals: int = 18) -> str:
     """
-    Convert raw uint256 string into a human-readable number with commas.
+    Convert raw uint256 (int or decimal string) into a human-readable number with commas.
     Example: "1000000000000000000" -> "1.0"
              "900000000000000000000000000" -> "900,000,000.0"
     """
@@ -17,29 +20,138 @@ def format_amount(raw: str, decimals: int = 18) -> str:
     return f"{human:,.1f}"
 
 
-async def summarize_transfers_from(address: str):
-    transfers = (
-        await Transfer.filter(from_addr=address)
-        .prefetch_related("token")
-        .order_by("block_number", "log_index")
-    )
+DEAD = "0x000000000000000000000000000000000000dEaD"
 
-    if not transfers:
-        print(f"No transfers found from {address}")
-        return
-
-    print(f"Transfers from {address}:")
-    for t in transfers:
-        if t.to_addr in ["0x000000000000000000000000000000000000dEaD"]:
-            continue
-        token_symbol = getattr(t.token, "symbol", "?")
-        decimals = getattr(t.token, "decimals", 18)  # default to 18
-        formatted_value = format_amount(t.value_raw, decimals)
+# ---------------------------------------------------------------------
+# Account history: async generators, keyset-paginated on
+# (block_number, log_index) so memory stays constant whatever the history
+# size. Exclusions go into the WHERE clause; token/pool metadata comes from
+# the MODELS identity map instead of a join per page.
+# ---------------------------------------------------------------------
+def _after(cursor: Optional[Tuple[int, int]]) -> Q:
+    if cursor is None:
+        return Q()
+    b, li = cursor
+    return Q(block_number__gt=b) | Q(block_number=b, log_index__gt=li)
+
+def _before(cursor: Optional[Tuple[int, int]]) -> Q:
+    if cursor is None:
+        return Q()
+    b, li = cursor
+    return Q(block_number__lt=b) | Q(block_number=b, log_index__lt=li)
+
+def _block_range(from_block: Optional[int], to_block: Optional[int]) -> Q:
+    q = Q()
+    if from_block is not None:
+        q &= Q(block_number__gte=from_block)
+    if to_block is not None:
+        q &= Q(block_number__lte=to_block)
+    return q
+
+async def _pages(
+    model: Type[Model],
+    where: Q,
+    page_size: int,
+    newest_first: bool,
+) -> AsyncIterator[List[Model]]:
+    cursor: Optional[Tuple[int, int]] = None
+    order = ("-block_number", "-log_index") if newest_first else ("block_number", "log_index")
+    step = _before if newest_first else _after
+    while True:
+        page = await model.filter(where, step(cursor)).order_by(*order).limit(page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        cursor = (page[-1].block_number, page[-1].log_index)
+
+async def iter_transfers(
+    address: str,
+    direction: str = "from",
+    token: Optional[str] = None,
+    exclude: Iterable[str] = (DEAD,),
+    from_block: Optional[int] = None,
+    to_block: Optional[int] = None,
+    page_size: int = 1000,
+    newest_first: bool = False,
+) -> AsyncIterator[Transfer]:
+    """
+    Transfers sent ("from"), received ("to") or both ("any") by address,
+    with .token set from the cache. Counterparties in `exclude` are dropped
+    by the query itself.
+    """
+    exclude = list(exclude)
+    if direction == "from":
+        where = Q(from_addr=address)
+        if exclude:
+            where &= ~Q(to_addr__in=exclude)
+    elif direction == "to":
+        where = Q(to_addr=address)
+        if exclude:
+            where &= ~Q(from_addr__in=exclude)
+    elif direction == "any":
+        where = Q(from_addr=address) | Q(to_addr=address)
+        if exclude:
+            where &= ~Q(from_addr__in=exclude) & ~Q(to_addr__in=exclude)
+    else:
+        raise ValueError(f"direction must be 'from', 'to' or 'any', got {direction!r}")
+    if token is not None:
+        tok = MODELS.get_token(token) or await Token.get(address=token)
+        where &= Q(token_id=tok.id)
+    where &= _block_range(from_block, to_block)
+
+    async for page in _pages(Transfer, where, page_size, newest_first):
+        for t in page:
+            t.token = await MODELS.token_by_id(t.token_id)
+            yield t
+
+async def iter_swaps(
+    address: str,
+    role: str = "any",
+    pool: Optional[str] = None,
+    from_block: Optional[int] = None,
+    to_block: Optional[int] = None,
+    page_size: int = 1000,
+    newest_first: bool = False,
+) -> AsyncIterator[Swap]:
+    """Swaps where address is the sender, the recipient or either ("any"), with .pool from the cache."""
+    if role == "sender":
+        where = Q(sender=address)
+    elif role == "recipient":
+        where = Q(recipient=address)
+    elif role == "any":
+        where = Q(sender=address) | Q(recipient=address)
+    else:
+        raise ValueError(f"role must be 'sender', 'recipient' or 'any', got {role!r}")
+    if pool is not None:
+        p = MODELS.get_pool(pool) or await Pool.get(address=pool)
+        where &= Q(pool_id=p.id)
+    where &= _block_range(from_block, to_block)
+
+    async for page in _pages(Swap, where, page_size, newest_first):
+        for s in page:
+            s.pool = await MODELS.pool_by_id(s.pool_id)
+            yield s
+
+
+async def summarize_transfers_from(address: str):
+    n = 0
+    async for t in iter_transfers(address, direction="from", exclude=[DEAD]):
+        if not n:
+            print(f"Transfers from {address}:")
+        n += 1
+        token_symbol = getattr(t.token, "symbol", None) or "?"
+        decimals = getattr(t.token, "decimals", None) or 18  # default to 18
+        formatted_value = format_amount(t.value, decimals)
         print(
             f" • Sent {formatted_value} {token_symbol} → {t.to_addr} "
             f"(tx: {t.tx_hash})"
         )
 
+    if not n:
+        print(f"No transfers found from {address}")
+
 
 
 async def main():
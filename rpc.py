@@ -0,0 +1,418 @@
+# rpc.py
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Sequence
+
+import aiohttp
+from web3 import AsyncWeb3, AsyncHTTPProvider
+
+from metrics import RPC_ERRORS, RPC_FAILOVERS, RPC_HEDGED, RPC_HEDGE_WINS, RPC_SECONDS
+
+# ---------------------------------------------------------------------
+# Per-RPC request budget
+# ---------------------------------------------------------------------
+class RateLimiter:
+    """
+    Token bucket: at most `rate` requests/second on average, bursts up to `burst`.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, int(rate)))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# ---------------------------------------------------------------------
+# Async transport: one AsyncWeb3 + one keep-alive aiohttp pool per RPC URL
+# ---------------------------------------------------------------------
+class AsyncRPCBackend:
+    """
+    Hands out AsyncWeb3 clients that share a persistent aiohttp session
+    (and therefore a keep-alive TCP pool) per RPC URL.
+    Clients are cheap to build; sessions are attached on first connect().
+    Long-running users of a shared backend retain() it and release() it when
+    done; the sessions are closed when the last one lets go.
+    """
+
+    def __init__(self, timeout: float = 10, pool_size: int = 32, keepalive: float = 60):
+        self.logger = logging.getLogger("AsyncRPCBackend")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self._clients: Dict[str, AsyncWeb3] = {}
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = asyncio.Lock()
+        self._users = 0
+
+    def client(self, url: str) -> AsyncWeb3:
+        """Return the (memoized) AsyncWeb3 for url. No network I/O."""
+        w3 = self._clients.get(url)
+        if w3 is None:
+            provider = AsyncHTTPProvider(url, request_kwargs={"timeout": aiohttp.ClientTimeout(total=self.timeout)})
+            w3 = AsyncWeb3(provider)
+            self._clients[url] = w3
+        return w3
+
+    def limiter(self, url: str, rate: float = 10) -> RateLimiter:
+        """Shared request budget for url (created with `rate` on first use)."""
+        lim = self._limiters.get(url)
+        if lim is None:
+            lim = RateLimiter(rate)
+            self._limiters[url] = lim
+        return lim
+
+    async def connect(self, url: str) -> AsyncWeb3:
+        """Return the AsyncWeb3 for url with its pooled session attached."""
+        w3 = self.client(url)
+        session = self._sessions.get(url)
+        if session is None or session.closed:
+            async with self._lock:
+                session = self._sessions.get(url)
+                if session is None or session.closed:
+                    connector = aiohttp.TCPConnector(
+                        limit=self.pool_size,
+                        keepalive_timeout=self.keepalive,
+                        ttl_dns_cache=300,
+                    )
+                    session = aiohttp.ClientSession(
+                        connector=connector,
+                        timeout=aiohttp.ClientTimeout(total=self.timeout),
+                    )
+                    await w3.provider.cache_async_session(session)
+                    self._sessions[url] = session
+                    self.logger.debug(f"Opened session pool for {url}")
+        return w3
+
+    def retain(self) -> None:
+        self._users += 1
+
+    async def release(self) -> None:
+        """Undo one retain(); closes the sessions once nobody holds the backend."""
+        self._users = max(0, self._users - 1)
+        if not self._users:
+            await self.close()
+
+    async def close(self) -> None:
+        for url, session in list(self._sessions.items()):
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
+        self._clients.clear()
+
+
+_BACKEND: Optional[AsyncRPCBackend] = None
+
+def get_backend() -> AsyncRPCBackend:
+    """Process-wide backend shared by AsyncEVME and aux_funcs."""
+    global _BACKEND
+    if _BACKEND is None:
+        _BACKEND = AsyncRPCBackend()
+    return _BACKEND
+
+
+# ---------------------------------------------------------------------
+# Endpoint health + routing
+# ---------------------------------------------------------------------
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+def _discard(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()  # retrieved, so asyncio doesn't log it
+
+class Endpoint:
+    """
+    Rolling health of one RPC URL.
+
+    - latency: last `window` successful call durations (percentiles)
+    - error_rate: EWMA of failures (0 .. 1)
+    - circuit breaker: `fail_threshold` consecutive failures open it for
+      `cooldown` seconds (doubling per re-open, up to max_cooldown); the
+      first call after that is a half-open probe that closes or re-opens it
+    """
+
+    def __init__(
+        self,
+        url: str,
+        archive: bool = False,
+        window: int = 50,
+        fail_threshold: int = 3,
+        cooldown: float = 15,
+        max_cooldown: float = 300,
+    ):
+        self.url = url
+        self.archive = archive
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.error_rate = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.fail_threshold = fail_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.probing = False
+
+    def percentile(self, q: float, default: float = 0.5) -> float:
+        if not self.latencies:
+            return default
+        s = sorted(self.latencies)
+        return s[min(len(s) - 1, int(q * len(s)))]
+
+    def score(self) -> float:
+        """Lower is better: median latency inflated by the recent error rate."""
+        return self.percentile(0.5) * (1 + 4 * self.error_rate)
+
+    def available(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now >= self.open_until:
+            self.state = HALF_OPEN
+        return self.state == HALF_OPEN and not self.probing
+
+    def on_success(self, latency: float) -> None:
+        self.calls += 1
+        self.latencies.append(latency)
+        self.error_rate *= 0.9
+        self.consecutive = 0
+        if self.state != CLOSED:
+            self.state, self.cooldown = CLOSED, self.base_cooldown
+        self.probing = False
+
+    def on_failure(self) -> bool:
+        """Record a failure; True if this opened the breaker."""
+        self.calls += 1
+        self.failures += 1
+        self.error_rate += 0.1 * (1 - self.error_rate)
+        self.consecutive += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.consecutive >= self.fail_threshold:
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self.state = OPEN
+            self.open_until = time.monotonic() + self.cooldown
+            return True
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "archive": self.archive,
+            "p50_ms": round(self.percentile(0.5) * 1000, 1),
+            "p95_ms": round(self.percentile(0.95) * 1000, 1),
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "failures": self.failures,
+        }
+
+
+class RPCPool:
+    """
+    Routes each call to the best healthy endpoint instead of a fixed one.
+
+    - endpoints are ranked by Endpoint.score(); open breakers are skipped
+    - a call still running after the primary's `hedge_quantile` latency
+      is hedged to the runner-up, and the first answer wins
+    - a failed call moves straight on to the next endpoint; backoff only
+      starts once every eligible endpoint failed in a row
+    - calls tagged with a block older than head - recent_blocks only go
+      to archive endpoints (non-archive nodes prune old logs/state)
+
+    All traffic still goes through the pooled sessions and per-URL rate
+    limiters of the backend.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        archive: Iterable[str] = (),
+        backend: Optional[AsyncRPCBackend] = None,
+        rate: float = 10,
+        recent_blocks: int = 100_000,
+        hedge: bool = True,
+        hedge_quantile: float = 0.9,
+        hedge_after: float = 1.0,  # until an endpoint has latency samples
+        min_hedge: float = 0.05,
+        max_backoff: float = 10,
+        **endpoint_kwargs,
+    ):
+        if not urls:
+            raise ValueError("RPCPool needs at least one URL")
+        self.logger = logging.getLogger("RPCPool")
+        archive = set(archive)
+        # archive-only URLs are part of the pool too
+        self.endpoints = [Endpoint(u, u in archive, **endpoint_kwargs) for u in dict.fromkeys([*urls, *archive])]
+        self.backend = backend or get_backend()
+        self.rate = rate
+        self.recent_blocks = recent_blocks
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_after = hedge_after
+        self.min_hedge = min_hedge
+        self.max_backoff = max_backoff
+        self.head: Optional[int] = None  # set by the caller, used for archive routing
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def _eligible(self, block: Optional[int]) -> List[Endpoint]:
+        if block is None or self.head is None or self.head - block <= self.recent_blocks:
+            return self.endpoints
+        archive = [e for e in self.endpoints if e.archive]
+        return archive or self.endpoints
+
+    def ranked(self, block: Optional[int] = None, exclude: Iterable[Endpoint] = ()) -> List[Endpoint]:
+        """Available endpoints for `block`, best first (half-open probes last)."""
+        now = time.monotonic()
+        skip = set(map(id, exclude))
+        eps = [e for e in self._eligible(block) if id(e) not in skip and e.available(now)]
+        return sorted(eps, key=lambda e: (e.state != CLOSED, e.score()))
+
+    async def _wait_available(self, block: Optional[int]) -> List[Endpoint]:
+        """Every eligible breaker is open: sleep until the first one may be probed."""
+        while True:
+            eps = self.ranked(block)
+            if eps:
+                return eps
+            wake = min(e.open_until for e in self._eligible(block))
+            delay = max(0.05, wake - time.monotonic())
+            self.logger.warning(f"All RPC endpoints are failing, next probe in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def client(self, block: Optional[int] = None) -> AsyncWeb3:
+        """AsyncWeb3 of the current best endpoint (for calls outside call())."""
+        return await self.backend.connect((await self._wait_available(block))[0].url)
+
+    async def _one(self, ep: Endpoint, fn: Callable[[AsyncWeb3], Awaitable[Any]],
+                   passthrough: Optional[Callable[[BaseException], bool]], method: str = "other") -> Any:
+        if ep.state == HALF_OPEN:
+            ep.probing = True
+        await self.backend.limiter(ep.url, self.rate).acquire()
+        t0 = time.monotonic()
+        try:
+            w3 = await self.backend.connect(ep.url)
+            result = await fn(w3)
+        except asyncio.CancelledError:
+            ep.probing = False
+            raise
+        except Exception as e:
+            RPC_SECONDS.labels(ep.url, method).observe(time.monotonic() - t0)
+            RPC_ERRORS.labels(ep.url, method).inc()
+            if passthrough and passthrough(e):
+                # the request's fault (e.g. range too heavy), not the endpoint's;
+                # the time it took still counts, so a node that times out ranks lower
+                ep.probing = False
+                ep.latencies.append(time.monotonic() - t0)
+            elif ep.on_failure():
+                self.logger.warning(f"Circuit open for {ep.url} ({ep.cooldown:.0f}s): {e}")
+            raise
+        dt = time.monotonic() - t0
+        ep.on_success(dt)
+        RPC_SECONDS.labels(ep.url, method).observe(dt)
+        return result
+
+    async def _hedged(self, fn, primary: Endpoint, backup: Optional[Endpoint], passthrough, method: str = "other",
+                      failed: Optional[List[Endpoint]] = None) -> Any:
+        """First answer of primary and (after the hedge delay) backup; endpoints that failed go to `failed`."""
+        first = asyncio.create_task(self._one(primary, fn, passthrough, method))
+        tasks = {first}
+        endpoint = {first: primary}
+        try:
+            if backup is not None:
+                delay = primary.percentile(self.hedge_quantile, self.hedge_after)
+                done, _ = await asyncio.wait(tasks, timeout=max(self.min_hedge, delay))
+                if not done:
+                    self.hedged += 1
+                    RPC_HEDGED.inc()
+                    second = asyncio.create_task(self._one(backup, fn, passthrough, method))
+                    tasks.add(second)
+                    endpoint[second] = backup
+            errors: List[BaseException] = []
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is not first:
+                            self.hedge_wins += 1
+                            RPC_HEDGE_WINS.inc()
+                        return t.result()
+                    errors.append(t.exception())
+                    if failed is not None:
+                        failed.append(endpoint[t])
+            # prefer an error the caller wants back (e.g. range too heavy)
+            raise next((e for e in errors if passthrough and passthrough(e)), errors[0])
+        finally:
+            # the losing request is left to finish (it still feeds the latency
+            # stats): cancelling a web3 call mid-request can leak the provider's
+            # session lock and wedge every later request
+            for t in tasks:
+                t.add_done_callback(_discard)
+
+    async def call(
+        self,
+        fn: Callable[[AsyncWeb3], Awaitable[Any]],
+        block: Optional[int] = None,
+        attempts: Optional[int] = None,
+        hedge: Optional[bool] = None,
+        passthrough: Optional[Callable[[BaseException], bool]] = None,
+        method: str = "other",
+    ) -> Any:
+        """
+        await fn(w3) on the best endpoint for `block`, with hedging and
+        failover. Errors for which passthrough(e) is true are raised at once.
+        `method` only labels the latency metrics (e.g. "eth_getLogs").
+        Raises the last error after `attempts` tries (default: one per
+        endpoint, plus one).
+        """
+        attempts = attempts or len(self.endpoints) + 1
+        hedge = self.hedge if hedge is None else hedge
+        tried: List[Endpoint] = []
+        rounds = 0
+        for attempt in range(attempts):
+            eps = self.ranked(block, exclude=tried)
+            if not eps:
+                if tried:
+                    # every eligible endpoint failed once: back off, then start over
+                    rounds += 1
+                    await asyncio.sleep(min(self.max_backoff, 0.25 * 2 ** rounds))
+                    tried = []
+                eps = await self._wait_available(block)
+            primary = eps[0]
+            backup = eps[1] if hedge and len(eps) > 1 else None
+            failed: List[Endpoint] = []
+            try:
+                return await self._hedged(fn, primary, backup, passthrough, method, failed)
+            except Exception as e:
+                if passthrough and passthrough(e):
+                    raise
+                if attempt + 1 >= attempts:
+                    raise
+                # a hedged backup that failed too is not retried before the rest
+                failed = failed or [primary]
+                tried.extend(failed)
+                self.failovers += 1
+                RPC_FAILOVERS.inc()
+                self.logger.warning(f"RPC call failed on {', '.join(ep.url for ep in failed)}, failing over: {e}")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {e.url: e.snapshot() for e in self.endpoints}
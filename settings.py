@@ -1,5 +1,4 @@
 
-from web3 import Web3
 import os
 from dotenv import load_dotenv
 from abi.get_abis import RPI, ABI_FILES
@@ -9,9 +8,32 @@ RPC_URL = "https://rpc-nodes.shidoscan.com"
 
 RPC2="https://evm.shidoscan.net/"
 RPC = "https://shido-mainnet-archive-lb-nw5es9.zeeve.net/USjg7xqUmCZ4wCsqEOOE/rpc"
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
+# WebSocket JSON-RPC endpoint for push-based live mode (AsyncEVME.run_live); polling if unset
+WS_URL = os.environ.get("WS_URL")
+# Prometheus text endpoint on 127.0.0.1:<port>/metrics while the fetcher runs; off if unset
+METRICS_PORT = int(os.environ.get("METRICS_PORT") or 0) or None
+# OHLCV candles folded in on every DB flush (store.candles, needs numpy); CANDLES=0 turns them off
+CANDLES = os.environ.get("CANDLES", "1").lower() not in ("0", "false", "no")
+# One eth_getLogs per range for all contracts (logs in chain order across contracts); off by default
+COMBINED_REQUESTS = os.environ.get("COMBINED_REQUESTS", "0").lower() not in ("0", "false", "no", "")
+# Handler tasks of the staged fetch/decode/handle/persist pipeline (per-contract order only); 0 = inline, the default
+HANDLER_WORKERS = int(os.environ.get("HANDLER_WORKERS") or 0)
+# SQLite file for the on-disk cache of finalized eth_getLogs ranges (log_cache.LogCache); off if unset
+LOG_CACHE_PATH = os.environ.get("LOG_CACHE_PATH")
 
-w32 = Web3(Web3.HTTPProvider("https://rpc-testnet-nodes.shidoscan.com"))
+TESTNET_RPC = "https://rpc-testnet-nodes.shidoscan.com"
+
+# w3 / w32 (sync Web3 on mainnet / testnet) are built on first access, so
+# importing settings costs no web3 import and no provider setup.
+_LAZY_CLIENTS = {"w3": RPC_URL, "w32": TESTNET_RPC}
+
+def __getattr__(name):
+    url = _LAZY_CLIENTS.get(name)
+    if url is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from web3 import Web3
+    client = globals()[name] = Web3(Web3.HTTPProvider(url))
+    return client
 
 seed_round = "0xdD75c1a25C3bc4874C00f33C8639316dc819F34c"
 stash = "0x5B73743d6e99E911e6C412C0BcA9a702475F0595"
@@ -0,0 +1,113 @@
+# store/aggregates.py
+from __future__ import annotations
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from tortoise import Tortoise
+
+from store.fields import encode_u256, sqlite_sum_sql, sqlite_sum_value
+
+# ---------------------------------------------------------------------
+# Server-side aggregates over the *_num columns (see store.fields).
+# Postgres uses native NUMERIC SUM; SQLite sums 9-digit limbs of the
+# encoded strings in SQL (sqlite_sum_sql) and recombines them exactly.
+# ---------------------------------------------------------------------
+def _conn():
+    return Tortoise.get_connection("default")
+
+def _is_pg() -> bool:
+    return _conn().capabilities.dialect == "postgres"
+
+def _sum(expr: str, alias: str) -> str:
+    """SELECT-list fragment for SUM(expr) AS alias; read it back with _total()."""
+    return f"SUM({expr}) AS {alias}" if _is_pg() else sqlite_sum_sql(expr, alias)
+
+def _total(row: Mapping[str, Any], alias: str) -> int:
+    if _is_pg():
+        v = row[alias]
+        return int(v) if v is not None else 0
+    return sqlite_sum_value(row, alias) or 0
+
+def _zero() -> str:
+    """SQL literal 0 in the column's storage format."""
+    return "0" if _is_pg() else f"'{encode_u256(0)}'"
+
+class _Params:
+    """Collects query parameters with the right placeholder style."""
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.pg = _is_pg()
+
+    def __call__(self, value: Any) -> str:
+        self.values.append(value)
+        return f"${len(self.values)}" if self.pg else "?"
+
+def _where(p: _Params, clauses: List[str], from_block: Optional[int], to_block: Optional[int]) -> str:
+    if from_block is not None:
+        clauses.append(f"block_number >= {p(from_block)}")
+    if to_block is not None:
+        clauses.append(f"block_number <= {p(to_block)}")
+    return f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+async def pool_volume(
+    pool_id: Optional[int] = None,
+    from_block: Optional[int] = None,
+    to_block: Optional[int] = None,
+) -> Dict[int, Tuple[int, int, int]]:
+    """
+    {pool_id: (volume0, volume1, swap_count)}, volume = amounts flowing into
+    the pool (positive side of amount0/amount1), summed in SQL.
+    """
+    p = _Params()
+    where = _where(p, [f"pool_id = {p(pool_id)}"] if pool_id is not None else [], from_block, to_block)
+    zero = _zero()
+    _, rows = await _conn().execute_query(
+        f"SELECT pool_id, "
+        f"{_sum(f'CASE WHEN amount0_num > {zero} THEN amount0_num END', 'v0')}, "
+        f"{_sum(f'CASE WHEN amount1_num > {zero} THEN amount1_num END', 'v1')}, "
+        f"COUNT(*) AS n FROM swaps {where} GROUP BY pool_id",
+        p.values,
+    )
+    return {r["pool_id"]: (_total(r, "v0"), _total(r, "v1"), int(r["n"])) for r in rows}
+
+async def holder_totals(
+    token_id: int,
+    address: str,
+    from_block: Optional[int] = None,
+    to_block: Optional[int] = None,
+) -> Tuple[int, int]:
+    """(total received, total sent) by address for a token, summed in SQL."""
+    out = []
+    for col in ("to_addr", "from_addr"):
+        p = _Params()
+        where = _where(p, [f"token_id = {p(token_id)}", f"{col} = {p(address)}"], from_block, to_block)
+        _, rows = await _conn().execute_query(f"SELECT {_sum('value_num', 'total')} FROM transfers {where}", p.values)
+        out.append(_total(rows[0], "total") if rows else 0)
+    return out[0], out[1]
+
+async def top_receivers(
+    token_id: int,
+    limit: int = 20,
+    exclude: Tuple[str, ...] = (),
+    from_block: Optional[int] = None,
+    to_block: Optional[int] = None,
+) -> List[Tuple[str, int]]:
+    """
+    [(address, total received)] largest first. Postgres orders and limits
+    on the aggregate in SQL; on SQLite the per-address sums come from SQL
+    and the ranking is done here.
+    """
+    p = _Params()
+    clauses = [f"token_id = {p(token_id)}"]
+    if exclude:
+        clauses.append(f"to_addr NOT IN ({', '.join(p(a) for a in exclude)})")
+    where = _where(p, clauses, from_block, to_block)
+    order = f"ORDER BY total DESC LIMIT {int(limit)}" if _is_pg() else ""
+    _, rows = await _conn().execute_query(
+        f"SELECT to_addr, {_sum('value_num', 'total')} FROM transfers {where} GROUP BY to_addr {order}",
+        p.values,
+    )
+    totals = [(r["to_addr"], _total(r, "total")) for r in rows]
+    if not _is_pg():
+        totals = sorted(totals, key=lambda t: t[1], reverse=True)[:int(limit)]
+    return totals
@@ -0,0 +1,215 @@
+# store/balances.py
+from __future__ import annotations
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from tortoise.expressions import Q
+from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from .models import Balance, BalanceSnapshot, Token, Transfer
+from .rollups import ZERO
+
+logger = logging.getLogger("Balances")
+
+# (block, log_index, from, to, value)
+TransferRow = Tuple[int, int, str, str, Union[int, str]]
+
+
+class BalanceLedger:
+    """
+    Holder balances derived from Transfer events.
+
+    - on_flush (BatchWriter hook) nets every flush into one delta per
+      (token, address) and applies them with a bulk update/insert
+    - every `snapshot_every` blocks, the balances that changed since the
+      previous boundary are copied to balance_snapshots, so a historical
+      balance is one snapshot read plus at most one interval of transfers
+    - a (last_block, last_log_index) watermark per token skips replayed rows
+    """
+
+    def __init__(self, snapshot_every: int = 10_000, batch_size: int = 20_000):
+        self.snapshot_every = snapshot_every
+        self.batch_size = batch_size
+
+    def boundary(self, block: int) -> int:
+        """Snapshot block covering `block` (the interval's last block)."""
+        n = self.snapshot_every
+        return -(-block // n) * n
+
+    async def _watermark(self, token_id: int, conn=None) -> Tuple[int, int]:
+        last = await (
+            Balance.filter(token_id=token_id)
+            .using_db(conn)
+            .order_by("-last_block", "-last_log_index")
+            .first()
+            .values_list("last_block", "last_log_index")
+        )
+        return tuple(last) if last else (-1, -1)
+
+    # ---------------------------------------------------------------
+    # BatchWriter hook
+    # ---------------------------------------------------------------
+    async def on_flush(self, conn, rows: Dict[type, List[Model]]) -> None:
+        by_token: Dict[int, List[TransferRow]] = {}
+        for t in rows.get(Transfer, []):
+            by_token.setdefault(t.token_id, []).append(
+                (t.block_number, t.log_index, t.from_addr, t.to_addr, t.value_raw)
+            )
+        for token_id, items in by_token.items():
+            await self.apply(conn, token_id, sorted(items, key=lambda r: (r[0], r[1])))
+
+    async def apply(self, conn, token_id: int, rows: Sequence[TransferRow]) -> int:
+        """
+        Apply transfers of one token, in (block, log_index) order. Rows at or
+        before the watermark are skipped. Returns rows applied.
+        """
+        wm = await self._watermark(token_id, conn)
+        rows = [r for r in rows if (r[0], r[1]) > wm]
+        if not rows:
+            return 0
+        last_block = wm[0]
+        # one segment per snapshot interval; a boundary is written once a
+        # later block shows its interval is complete
+        segment: List[TransferRow] = []
+        for r in rows:
+            if segment and self.boundary(r[0]) != self.boundary(segment[0][0]):
+                await self._apply_deltas(conn, token_id, segment)
+                last_block = segment[-1][0]
+                segment = []
+            if last_block >= 0 and self.boundary(r[0]) > self.boundary(last_block) and not segment:
+                await self._snapshot(conn, token_id, self.boundary(last_block))
+            segment.append(r)
+        await self._apply_deltas(conn, token_id, segment)
+        return len(rows)
+
+    async def _apply_deltas(self, conn, token_id: int, rows: Sequence[TransferRow]) -> None:
+        delta: Dict[str, int] = {}
+        for _b, _l, frm, to, value in rows:
+            v = int(value)
+            delta[frm] = delta.get(frm, 0) - v
+            delta[to] = delta.get(to, 0) + v
+        last_block, last_log = rows[-1][0], rows[-1][1]
+        existing = {
+            b.address: b
+            for b in await Balance.filter(token_id=token_id, address__in=list(delta)).using_db(conn)
+        }
+        changed, new = [], []
+        for addr, d in delta.items():
+            b = existing.get(addr)
+            if b is None:
+                new.append(Balance(token_id=token_id, address=addr, balance=d,
+                                   last_block=last_block, last_log_index=last_log))
+            else:
+                b.balance += d
+                b.last_block, b.last_log_index = last_block, last_log
+                changed.append(b)
+        if changed:
+            await Balance.bulk_update(changed, fields=["balance", "last_block", "last_log_index"],
+                                      batch_size=self.batch_size, using_db=conn)
+        if new:
+            await Balance.bulk_create(new, batch_size=self.batch_size, using_db=conn)
+
+    async def _snapshot(self, conn, token_id: int, block: int) -> None:
+        changed = await Balance.filter(
+            token_id=token_id, last_block__gt=block - self.snapshot_every, last_block__lte=block
+        ).using_db(conn).values_list("address", "balance")
+        if changed:
+            await BalanceSnapshot.bulk_create(
+                [BalanceSnapshot(token_id=token_id, address=a, block=block, balance=v) for a, v in changed],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+                using_db=conn,
+            )
+
+    # ---------------------------------------------------------------
+    # rebuild
+    # ---------------------------------------------------------------
+    async def rebuild(self, token_id: Optional[int] = None) -> int:
+        """Drop and replay balances/snapshots from the transfers table."""
+        token_ids = [token_id] if token_id is not None else await Token.all().values_list("id", flat=True)
+        total = 0
+        for tid in token_ids:
+            await BalanceSnapshot.filter(token_id=tid).delete()
+            await Balance.filter(token_id=tid).delete()
+            wm = (-1, -1)
+            while True:
+                page = await (
+                    Transfer.filter(token_id=tid)
+                    .filter(Q(block_number__gt=wm[0]) | Q(block_number=wm[0], log_index__gt=wm[1]))
+                    .order_by("block_number", "log_index")
+                    .limit(self.batch_size)
+                    .values_list("block_number", "log_index", "from_addr", "to_addr", "value_raw")
+                )
+                if not page:
+                    break
+                async with in_transaction() as conn:
+                    await self.apply(conn, tid, page)
+                wm = (page[-1][0], page[-1][1])
+                total += len(page)
+            logger.info(f"Rebuilt balances for token {tid} up to {wm}")
+        return total
+
+
+# ---------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------
+async def _token_id(token: Union[int, str]) -> int:
+    return token if isinstance(token, int) else (await Token.get(address=token)).id
+
+async def balance_of(token: Union[int, str], address: str) -> int:
+    tid = await _token_id(token)
+    b = await Balance.get_or_none(token_id=tid, address=address).values_list("balance", flat=True)
+    return b or 0
+
+async def balance_at(token: Union[int, str], address: str, block: int) -> int:
+    """
+    Balance at the end of `block`: latest snapshot at or before it, plus the
+    transfers after that snapshot.
+    """
+    tid = await _token_id(token)
+    snap = await (
+        BalanceSnapshot.filter(token_id=tid, address=address, block__lte=block)
+        .order_by("-block")
+        .first()
+        .values_list("block", "balance")
+    )
+    since, bal = snap if snap else (-1, 0)
+    replay = await (
+        Transfer.filter(token_id=tid, block_number__gt=since, block_number__lte=block)
+        .filter(Q(from_addr=address) | Q(to_addr=address))
+        .values_list("from_addr", "to_addr", "value_raw")
+    )
+    for frm, to, value in replay:
+        v = int(value)
+        if to == address:
+            bal += v
+        if frm == address:
+            bal -= v
+    return bal
+
+async def top_holders(
+    token: Union[int, str],
+    limit: int = 20,
+    exclude: Iterable[str] = (ZERO,),
+) -> List[Tuple[str, int]]:
+    """[(address, balance)] largest first, from the (token, balance) index."""
+    tid = await _token_id(token)
+    q = Balance.filter(token_id=tid, balance__gt=0)
+    exclude = list(exclude)
+    if exclude:
+        q = q.exclude(address__in=exclude)
+    return list(await q.order_by("-balance").limit(limit).values_list("address", "balance"))
+
+# python -m store.balances [token_id]   full replay (uses DB_URL like store.db)
+if __name__ == "__main__":
+    import sys
+    from tortoise import run_async
+    from store.db import init_db, close_db
+
+    async def _main():
+        await init_db()
+        n = await BalanceLedger().rebuild(int(sys.argv[1]) if len(sys.argv) > 1 else None)
+        print(f"[balances] replayed {n} transfers")
+        await close_db()
+    run_async(_main())
@@ -0,0 +1,290 @@
+# store/cache.py
+from __future__ import annotations
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from eth_abi import decode, encode
+from hexbytes import HexBytes
+from eth_utils import keccak, to_checksum_address
+
+if TYPE_CHECKING:  # web3 itself is only needed by the caller that passes w3
+    from web3 import AsyncWeb3
+
+from metrics import watch_cache
+from .models import Token, Pool
+
+logger = logging.getLogger("ModelCache")
+
+def _selector(sig: str) -> bytes:
+    return bytes(keccak(text=sig)[:4])
+
+SYMBOL = _selector("symbol()")
+DECIMALS = _selector("decimals()")
+TOKEN0 = _selector("token0()")
+TOKEN1 = _selector("token1()")
+FEE = _selector("fee()")
+AGGREGATE3 = _selector("aggregate3((address,bool,bytes)[])")
+
+POOL_EVENTS = {"Swap", "Mint", "Burn", "Collect", "Flash"}
+TOKEN_EVENTS = {"Transfer", "Approval"}
+
+def _decode_symbol(raw: Optional[bytes]) -> Optional[str]:
+    if not raw:
+        return None
+    try:
+        return decode(["string"], raw)[0]
+    except Exception:
+        pass
+    # some old tokens return bytes32
+    try:
+        return bytes(raw[:32]).rstrip(b"\x00").decode("utf-8") or None
+    except Exception:
+        return HexBytes(raw[:32]).hex()
+
+def _decode_one(typ: str, raw: Optional[bytes]) -> Any:
+    if not raw:
+        return None
+    try:
+        return decode([typ], raw)[0]
+    except Exception:
+        return None
+
+
+class ModelCache:
+    """
+    In-process identity map of Token / Pool model instances.
+
+    Token and pool rows never change once created, so after warm() every hit
+    is a dict lookup (pools come with token0/token1 attached). Misses are
+    resolved in bulk: the symbol/decimals/token0/token1/fee reads for a
+    whole chunk go out as one aggregate eth_call (Multicall3, when
+    multicall_address is set) or one JSON-RPC batch of eth_calls.
+    """
+
+    def __init__(self, multicall_address: Optional[str] = None, batch_size: int = 200):
+        addr = multicall_address or os.environ.get("MULTICALL3_ADDRESS")
+        self.multicall_address = to_checksum_address(addr) if addr else None
+        self.batch_size = batch_size
+        self.tokens: Dict[str, Token] = {}
+        self.pools: Dict[str, Pool] = {}
+        self._tokens_by_id: Dict[int, Token] = {}
+        self._pools_by_id: Dict[int, Pool] = {}
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+        self._lock = asyncio.Lock()
+
+    # ---------------------------------------------------------------
+    # identity map
+    # ---------------------------------------------------------------
+    async def warm(self) -> None:
+        """Load every known Token and Pool once (call after init_db)."""
+        for tok in await Token.all():
+            self._put_token(tok)
+        for p in await Pool.all():
+            self._attach(p)
+        self.warmed = True
+        logger.info(f"Warmed {len(self.tokens)} tokens, {len(self.pools)} pools")
+
+    def add_token(self, tok: Token) -> Token:
+        return self.tokens.get(tok.address) or self._put_token(tok)
+
+    def _put_token(self, tok: Token) -> Token:
+        self.tokens[tok.address] = tok
+        self._tokens_by_id[tok.id] = tok
+        return tok
+
+    def add_pool(self, p: Pool) -> Pool:
+        return self._attach(p)
+
+    def _attach(self, p: Pool) -> Pool:
+        t0, t1 = self._tokens_by_id.get(p.token0_id), self._tokens_by_id.get(p.token1_id)
+        if t0 is not None and t1 is not None:
+            p.token0, p.token1 = t0, t1
+        self.pools[p.address] = p
+        self._pools_by_id[p.id] = p
+        return p
+
+    def get_token(self, addr: str) -> Optional[Token]:
+        tok = self.tokens.get(addr)
+        if tok is not None:
+            self.hits += 1
+        return tok
+
+    def get_pool(self, addr: str) -> Optional[Pool]:
+        p = self.pools.get(addr)
+        if p is not None:
+            self.hits += 1
+        return p
+
+    async def token_by_id(self, token_id: int) -> Optional[Token]:
+        """Cached Token by primary key; a miss is loaded once (no RPC)."""
+        tok = self._tokens_by_id.get(token_id)
+        if tok is not None:
+            self.hits += 1
+            return tok
+        self.misses += 1
+        tok = await Token.get_or_none(id=token_id)
+        return self._put_token(tok) if tok is not None else None
+
+    async def pool_by_id(self, pool_id: int) -> Optional[Pool]:
+        """Cached Pool (with tokens attached) by primary key; a miss is loaded once."""
+        p = self._pools_by_id.get(pool_id)
+        if p is not None:
+            self.hits += 1
+            return p
+        self.misses += 1
+        p = await Pool.get_or_none(id=pool_id)
+        if p is None:
+            return None
+        for t in (p.token0_id, p.token1_id):
+            await self.token_by_id(t)
+        return self._attach(p)
+
+    async def token(self, w3: AsyncWeb3, addr: str) -> Token:
+        addr = to_checksum_address(addr)
+        tok = self.get_token(addr)
+        if tok is None:
+            await self.resolve(w3, tokens=[addr])
+            tok = self.tokens[addr]
+        return tok
+
+    async def pool(self, w3: AsyncWeb3, addr: str) -> Pool:
+        addr = to_checksum_address(addr)
+        p = self.get_pool(addr)
+        if p is None:
+            await self.resolve(w3, pools=[addr])
+            p = self.pools[addr]
+        return p
+
+    # ---------------------------------------------------------------
+    # bulk miss resolution
+    # ---------------------------------------------------------------
+    async def resolve(self, w3: AsyncWeb3, tokens: Iterable[str] = (), pools: Iterable[str] = ()) -> None:
+        """Make sure all given tokens and pools (and the pools' tokens) are cached."""
+        async with self._lock:
+            if not self.warmed:
+                await self.warm()
+            pools = sorted({to_checksum_address(a) for a in pools} - self.pools.keys())
+            tokens = {to_checksum_address(a) for a in tokens}
+
+            pool_meta: Dict[str, Tuple[str, str, Optional[int]]] = {}
+            if pools:
+                self.misses += len(pools)
+                # a pool may already be in the DB even if it wasn't at warm()
+                for p in await Pool.filter(address__in=pools):
+                    for t in await Token.filter(id__in=[p.token0_id, p.token1_id]):
+                        self._put_token(t)
+                    self._attach(p)
+                pools = [a for a in pools if a not in self.pools]
+                res = await self._call_many(w3, [(a, sel) for a in pools for sel in (TOKEN0, TOKEN1, FEE)])
+                for i, a in enumerate(pools):
+                    t0, t1, fee = res[3 * i: 3 * i + 3]
+                    t0, t1 = _decode_one("address", t0), _decode_one("address", t1)
+                    if t0 is None or t1 is None:
+                        raise RuntimeError(f"Could not read token0/token1 of pool {a}")
+                    fee = _decode_one("uint24", fee)
+                    pool_meta[a] = (to_checksum_address(t0), to_checksum_address(t1), fee)
+                    tokens.update(pool_meta[a][:2])
+
+            missing_tokens = sorted(tokens - self.tokens.keys())
+            if missing_tokens:
+                self.misses += len(missing_tokens)
+                for tok in await Token.filter(address__in=missing_tokens):
+                    self._put_token(tok)
+                # rows created elsewhere without metadata get it backfilled
+                backfill = [
+                    self.tokens[a] for a in missing_tokens
+                    if a in self.tokens and (self.tokens[a].symbol is None or self.tokens[a].decimals is None)
+                ]
+                absent = [a for a in missing_tokens if a not in self.tokens]
+                need = absent + [t.address for t in backfill]
+                res = await self._call_many(w3, [(a, sel) for a in need for sel in (SYMBOL, DECIMALS)])
+                meta = {}
+                for i, a in enumerate(need):
+                    dec = _decode_one("uint8", res[2 * i + 1])
+                    meta[a] = (_decode_symbol(res[2 * i]), int(dec) if dec is not None else None)
+                for tok in backfill:
+                    tok.symbol, tok.decimals = meta[tok.address]
+                if backfill:
+                    await Token.bulk_update(backfill, fields=["symbol", "decimals"])
+                if absent:
+                    await Token.bulk_create(
+                        [Token(address=a, symbol=meta[a][0], decimals=meta[a][1]) for a in absent],
+                        ignore_conflicts=True,
+                    )
+                    for tok in await Token.filter(address__in=absent):
+                        self._put_token(tok)
+
+            if pool_meta:
+                await Pool.bulk_create(
+                    [
+                        Pool(address=a, token0=self.tokens[t0], token1=self.tokens[t1], fee=fee)
+                        for a, (t0, t1, fee) in pool_meta.items()
+                    ],
+                    ignore_conflicts=True,
+                )
+                for p in await Pool.filter(address__in=list(pool_meta)):
+                    self._attach(p)
+
+    async def _call_many(self, w3: AsyncWeb3, calls: Sequence[Tuple[str, bytes]]) -> List[Optional[bytes]]:
+        """Return data per (to, calldata); None where the call reverted."""
+        out: List[Optional[bytes]] = []
+        for i in range(0, len(calls), self.batch_size):
+            part = calls[i:i + self.batch_size]
+            if self.multicall_address:
+                out.extend(await self._multicall(w3, part))
+            else:
+                out.extend(await self._json_rpc_batch(w3, part))
+        return out
+
+    async def _multicall(self, w3: AsyncWeb3, calls: Sequence[Tuple[str, bytes]]) -> List[Optional[bytes]]:
+        data = AGGREGATE3 + encode(["(address,bool,bytes)[]"], [[(to, True, cd) for to, cd in calls]])
+        raw = await w3.eth.call({"to": self.multicall_address, "data": HexBytes(data)})
+        results = decode(["(bool,bytes)[]"], bytes(raw))[0]
+        return [bytes(ret) if ok and ret else None for ok, ret in results]
+
+    async def _json_rpc_batch(self, w3: AsyncWeb3, calls: Sequence[Tuple[str, bytes]]) -> List[Optional[bytes]]:
+        provider = w3.provider
+        if hasattr(provider, "make_batch_request"):
+            try:
+                resp = await provider.make_batch_request([
+                    ("eth_call", [{"to": to, "data": "0x" + cd.hex()}, "latest"]) for to, cd in calls
+                ])
+                if isinstance(resp, list):
+                    return [
+                        bytes(HexBytes(r["result"])) if r.get("result") not in (None, "0x") else None
+                        for r in resp
+                    ]
+                logger.debug(f"Batch eth_call rejected: {resp}")
+            except Exception as e:
+                logger.debug(f"Batch eth_call failed ({e}); falling back to single calls")
+
+        async def one(to: str, cd: bytes) -> Optional[bytes]:
+            try:
+                return bytes(await w3.eth.call({"to": to, "data": HexBytes(cd)})) or None
+            except Exception:
+                return None
+        return list(await asyncio.gather(*(one(to, cd) for to, cd in calls)))
+
+    # ---------------------------------------------------------------
+    # AsyncEVME prefetch hook
+    # ---------------------------------------------------------------
+    async def prefetch_events(self, w3: AsyncWeb3, events: Sequence[Any]) -> None:
+        """Resolve every pool (Swap/Mint) and token (Transfer) seen in a chunk at once."""
+        pools, tokens = set(), set()
+        for e in events:
+            name, addr = e["event"], e["address"]
+            if name in TOKEN_EVENTS and addr not in self.tokens:
+                tokens.add(addr)
+            elif name in POOL_EVENTS and addr not in self.pools:
+                pools.add(addr)
+        if pools or tokens or not self.warmed:
+            await self.resolve(w3, tokens=tokens, pools=pools)
+
+
+# Process-wide identity map used by aux_funcs / store.helpers
+MODELS = ModelCache()
+watch_cache("models", MODELS)
@@ -0,0 +1,302 @@
+# store/candles.py
+from __future__ import annotations
+import logging
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from tortoise.expressions import Q
+from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from .models import Candle, Pool, Swap
+
+try:  # optional: pip install numpy
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+logger = logging.getLogger("Candles")
+
+INTERVALS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+Q96 = float(1 << 96)
+DEFAULT_DECIMALS = 18
+
+# ---------------------------------------------------------------------
+# Vectorized math
+#   price = (sqrtPriceX96 / 2**96)**2 * 10**(dec0 - dec1)  (token1 per token0)
+# sqrtPriceX96 is a uint160; int -> float64 is correctly rounded, so after
+# one float() per value the price keeps ~15 significant digits (plenty for
+# charting) and the rest of the batch is plain NumPy array math. The decimals
+# scale is applied to sqrt(price) before squaring, so the intermediate stays
+# in range; prices that still land outside float64's normal range (extreme
+# ratios and decimals) are recomputed exactly from the integers.
+# ---------------------------------------------------------------------
+def exact_price(sqrt_price_x96: Union[int, str], dec0: int, dec1: int) -> float:
+    """One price from integer math, rounded once (inf past float64's range)."""
+    num, den = int(sqrt_price_x96) ** 2, 1 << 192
+    if dec0 >= dec1:
+        num *= 10 ** (dec0 - dec1)
+    else:
+        den *= 10 ** (dec1 - dec0)
+    try:
+        return num / den  # int / int is correctly rounded, subnormals included
+    except OverflowError:
+        return math.inf
+
+def prices(sqrt_price_x96: Sequence[Union[int, str]], dec0: int, dec1: int):
+    raw = [int(v) for v in sqrt_price_x96]
+    s = np.asarray([float(v) for v in raw], dtype=np.float64) / Q96 * (10.0 ** ((dec0 - dec1) / 2))
+    with np.errstate(over="ignore", under="ignore"):
+        p = s * s
+    tiny = np.finfo(np.float64).tiny
+    lost = 0
+    for i in np.flatnonzero(~np.isfinite(p) | (p < tiny)):
+        p[i] = exact_price(raw[i], dec0, dec1)
+        lost += bool(raw[i]) and not tiny <= p[i] < math.inf
+    if lost:
+        logger.warning(f"{lost} price(s) outside float64's normal range (decimals {dec0}/{dec1}), stored as inf/0/subnormal")
+    return p
+
+def volumes(amounts: Sequence[Union[int, str]], decimals: int):
+    return np.abs(np.asarray([float(v) for v in amounts], dtype=np.float64)) * (10.0 ** -decimals)
+
+def bars(ts, price, vol0, vol1, interval: int) -> Dict[str, Any]:
+    """
+    OHLCV for rows already in (block_number, log_index) order.
+    Returns parallel arrays; `last` is the index of each bar's last row.
+    """
+    bucket = ts - ts % interval
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)]
+    return {
+        "bucket": bucket[starts],
+        "open": price[starts],
+        "high": np.maximum.reduceat(price, starts),
+        "low": np.minimum.reduceat(price, starts),
+        "close": price[ends - 1],
+        "volume0": np.add.reduceat(vol0, starts),
+        "volume1": np.add.reduceat(vol1, starts),
+        "swaps": ends - starts,
+        "last": ends - 1,
+    }
+
+
+class CandleEngine:
+    """
+    Keeps the `candles` table up to date.
+
+    - on_flush is a BatchWriter hook: the swaps of each flush are folded
+      into the open bars in the same transaction that inserts them, inside
+      a savepoint, so a candle failure never rolls back the swaps
+    - rebuild() recomputes a pool (or everything) from the swaps table,
+      reading it in keyset-paginated columnar batches
+    """
+
+    def __init__(self, intervals: Sequence[int] = tuple(INTERVALS.values()), batch_size: int = 50_000):
+        if np is None:
+            raise RuntimeError("Candles need numpy (pip install numpy)")
+        self.intervals = sorted(intervals)
+        self.batch_size = batch_size
+        self._decimals: Dict[int, Tuple[int, int]] = {}
+        # pools whose fold failed: caught up from the swaps table next flush
+        self._stale: Set[int] = set()
+
+    async def _pool_decimals(self, pool_ids: Sequence[int], conn=None) -> None:
+        missing = [p for p in pool_ids if p not in self._decimals]
+        if not missing:
+            return
+        rows = await Pool.filter(id__in=missing).using_db(conn).values_list(
+            "id", "token0__decimals", "token1__decimals"
+        )
+        for pid, d0, d1 in rows:
+            # decimals unknown yet -> don't cache, retry next time
+            if d0 is not None and d1 is not None:
+                self._decimals[pid] = (d0, d1)
+
+    def decimals(self, pool_id: int) -> Tuple[int, int]:
+        return self._decimals.get(pool_id, (DEFAULT_DECIMALS, DEFAULT_DECIMALS))
+
+    async def _watermark(self, pool_id: int, conn=None) -> Tuple[int, int]:
+        last = await (
+            Candle.filter(pool_id=pool_id, interval=self.intervals[0])
+            .using_db(conn)
+            .order_by("-bucket")
+            .first()
+            .values_list("last_block", "last_log_index")
+        )
+        return tuple(last) if last else (-1, -1)
+
+    def _swaps_after(self, pool_id: int, wm: Tuple[int, int], conn=None):
+        """Next batch_size swaps of a pool past `wm`, as apply() rows."""
+        return (
+            Swap.filter(pool_id=pool_id, ts__isnull=False)
+            .filter(Q(block_number__gt=wm[0]) | Q(block_number=wm[0], log_index__gt=wm[1]))
+            .order_by("block_number", "log_index")
+            .limit(self.batch_size)
+            .using_db(conn)
+            .values_list("block_number", "log_index", "ts", "sqrt_price_x96", "amount0_raw", "amount1_raw")
+        )
+
+    # ---------------------------------------------------------------
+    # incremental
+    # ---------------------------------------------------------------
+    async def on_flush(self, conn, rows: Dict[type, List[Model]]) -> None:
+        """
+        BatchWriter hook. Errors are logged, not raised: the savepoint drops
+        this flush's candle writes only, and the pools involved catch up from
+        the swaps table on a later flush.
+        """
+        by_pool: Dict[int, List[Swap]] = {}
+        for s in rows.get(Swap, []):
+            if s.ts is not None:
+                by_pool.setdefault(s.pool_id, []).append(s)
+        pools = set(by_pool) | self._stale
+        if not pools:
+            return
+        try:
+            async with in_transaction() as savepoint:  # nested in the flush transaction
+                await self._fold(savepoint, by_pool)
+        except Exception as e:
+            self._stale |= pools
+            logger.error(f"Candles not updated for pool(s) {sorted(pools)}, retrying next flush: {e}")
+            return
+        self._stale.clear()
+
+    async def _fold(self, conn, by_pool: Dict[int, List[Swap]]) -> None:
+        await self._pool_decimals(list(set(by_pool) | self._stale), conn)
+        for pool_id in self._stale:
+            # swaps of failed flushes (and this one's) are in the table by now
+            wm = await self._watermark(pool_id, conn)
+            while True:
+                batch = await self._swaps_after(pool_id, wm, conn)
+                if not batch:
+                    break
+                await self.apply(conn, pool_id, batch)
+                wm = (batch[-1][0], batch[-1][1])
+        for pool_id, items in by_pool.items():
+            if pool_id in self._stale:
+                continue
+            wm = await self._watermark(pool_id, conn)
+            items = sorted(
+                (s for s in items if (s.block_number, s.log_index) > wm),
+                key=lambda s: (s.block_number, s.log_index),
+            )
+            if items:
+                await self.apply(conn, pool_id, [
+                    (s.block_number, s.log_index, s.ts, s.sqrt_price_x96, s.amount0_raw, s.amount1_raw)
+                    for s in items
+                ])
+
+    async def apply(self, conn, pool_id: int, rows: List[Tuple]) -> int:
+        """
+        Fold (block, log_index, ts, sqrtPriceX96, amount0, amount1) rows, in
+        order and all past the pool's watermark, into its bars.
+        """
+        blocks, logs, ts, sqrt_p, a0, a1 = zip(*rows)
+        ts = np.asarray([int(t.timestamp()) if isinstance(t, datetime) else int(t) for t in ts], dtype=np.int64)
+        dec0, dec1 = self.decimals(pool_id)
+        price = prices(sqrt_p, dec0, dec1)
+        v0, v1 = volumes(a0, dec0), volumes(a1, dec1)
+        written = 0
+        for interval in self.intervals:
+            b = bars(ts, price, v0, v1, interval)
+            new: List[Candle] = []
+            for i in range(len(b["bucket"])):
+                last = b["last"][i]
+                new.append(Candle(
+                    pool_id=pool_id,
+                    interval=interval,
+                    bucket=int(b["bucket"][i]),
+                    open=float(b["open"][i]),
+                    high=float(b["high"][i]),
+                    low=float(b["low"][i]),
+                    close=float(b["close"][i]),
+                    volume0=float(b["volume0"][i]),
+                    volume1=float(b["volume1"][i]),
+                    swaps=int(b["swaps"][i]),
+                    last_block=int(blocks[last]),
+                    last_log_index=int(logs[last]),
+                ))
+            # only the first bar can already exist (rows are past the watermark)
+            head = await Candle.get_or_none(
+                pool_id=pool_id, interval=interval, bucket=new[0].bucket, using_db=conn
+            )
+            if head is not None:
+                first = new.pop(0)
+                head.high = max(head.high, first.high)
+                head.low = min(head.low, first.low)
+                head.close = first.close
+                head.volume0 += first.volume0
+                head.volume1 += first.volume1
+                head.swaps += first.swaps
+                head.last_block, head.last_log_index = first.last_block, first.last_log_index
+                await head.save(using_db=conn)
+            if new:
+                await Candle.bulk_create(new, using_db=conn)
+            written += len(new) + (head is not None)
+        return written
+
+    # ---------------------------------------------------------------
+    # full rebuild
+    # ---------------------------------------------------------------
+    async def rebuild(self, pool_id: Optional[int] = None) -> int:
+        """Recompute candles from the swaps table (one pool or all). Returns swaps read."""
+        pool_ids = [pool_id] if pool_id is not None else await Pool.all().values_list("id", flat=True)
+        await self._pool_decimals(pool_ids)
+        total = 0
+        for pid in pool_ids:
+            await Candle.filter(pool_id=pid).delete()
+            wm = (-1, -1)
+            while True:
+                rows = await self._swaps_after(pid, wm)
+                if not rows:
+                    break
+                async with in_transaction() as conn:
+                    await self.apply(conn, pid, rows)
+                wm = (rows[-1][0], rows[-1][1])
+                total += len(rows)
+            logger.info(f"Rebuilt candles for pool {pid} up to {wm}")
+        return total
+
+
+async def get_candles(
+    pool: Union[int, str],
+    interval: Union[int, str] = "1h",
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    invert: bool = False,
+) -> Dict[str, Any]:
+    """
+    Bars of a pool (id or address) as NumPy arrays, oldest first.
+    start/end are unix seconds; invert=True gives token0 per token1.
+    """
+    if isinstance(pool, str):
+        pool = (await Pool.get(address=pool)).id
+    interval = INTERVALS.get(interval, interval)
+    q = Candle.filter(pool_id=pool, interval=interval)
+    if start is not None:
+        q = q.filter(bucket__gte=start - start % interval)
+    if end is not None:
+        q = q.filter(bucket__lte=end)
+    cols = ("bucket", "open", "high", "low", "close", "volume0", "volume1", "swaps")
+    rows = await q.order_by("bucket").values_list(*cols)
+    out = {c: np.asarray(v) for c, v in zip(cols, zip(*rows))} if rows else {c: np.asarray([]) for c in cols}
+    if invert and rows:
+        out["open"], out["close"] = 1 / out["open"], 1 / out["close"]
+        out["high"], out["low"] = 1 / out["low"], 1 / out["high"]
+        out["volume0"], out["volume1"] = out["volume1"], out["volume0"]
+    return out
+
+# python -m store.candles [pool_id]   full rebuild (uses DB_URL like store.db)
+if __name__ == "__main__":
+    import sys
+    from tortoise import run_async
+    from store.db import init_db, close_db
+
+    async def _main():
+        await init_db()
+        n = await CandleEngine().rebuild(int(sys.argv[1]) if len(sys.argv) > 1 else None)
+        print(f"[candles] rebuilt from {n} swaps")
+        await close_db()
+    run_async(_main())
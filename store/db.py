@@ -3,6 +3,8 @@ import os
 from typing import Optional
 from tortoise import Tortoise, run_async
 
+from store.migrate import add_missing_columns
+
 DEFAULT_DB_URL = os.environ.get("DB_URL", "sqlite://events.sqlite3")
 # Examples:
 #   SQLite file:  DB_URL="sqlite://events.sqlite3"
@@ -18,6 +20,8 @@ async def init_db(db_url: Optional[str] = None, generate_schemas: bool = True) -
     url = db_url or DEFAULT_DB_URL
     await Tortoise.init(db_url=url, modules=MODELS_MODULES)
     if generate_schemas:
+        # older DBs: add the numeric columns first (backfill with `python -m store.migrate`)
+        await add_missing_columns()
         await Tortoise.generate_schemas(safe=True)
     # Optional: print connection info
     print(f"[db] Connected: {url}")
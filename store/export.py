@@ -0,0 +1,310 @@
+# store/export.py
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from tortoise import Tortoise, run_async
+
+from checkpoint import write_json_atomic
+
+try:  # optional: pip install pyarrow
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+logger = logging.getLogger("Export")
+
+# ---------------------------------------------------------------------
+# Columnar export (Parquet / Arrow IPC) for analytics
+#
+#   out_dir/
+#     tokens.parquet, pools.parquet           small dimension tables, rewritten
+#     swaps/part_<first id>.parquet           one file per batch of new rows
+#     transfers/part_<first id>.parquet
+#     _state.json                             export cursor per table (ExportState)
+#
+# Rows are read with plain SQL (no model objects). The incremental cursor is
+# the row id, not the block height: ids only grow as rows are inserted (one
+# BatchWriter transaction at a time), so rows a backfill adds below the
+# exported height are still picked up. Each file holds a run of ids, sorted
+# by (block_number, log_index) inside; filter on block_number across files.
+# ---------------------------------------------------------------------
+DECIMAL_DIGITS = 76  # decimal256 max precision; larger values fail the export
+LIMBS = 4            # hilo: 64-bit limbs per value, least significant first
+LIMB_MASK = (1 << 64) - 1
+
+EVENT_TABLES: Dict[str, Dict[str, Any]] = {
+    "swaps": {
+        "columns": ["block_number", "log_index", "tx_hash", "pool_id", "sender", "recipient",
+                    "amount0_raw", "amount1_raw", "sqrt_price_x96", "liquidity", "tick", "ts"],
+        "big": {"amount0_raw": "amount0", "amount1_raw": "amount1",
+                "sqrt_price_x96": "sqrt_price_x96", "liquidity": "liquidity"},
+        "signed": {"amount0", "amount1"},  # int256; the rest are unsigned
+        "addresses": ["sender", "recipient"],
+        "ref": ("pool_id", "pool"),
+    },
+    "transfers": {
+        "columns": ["block_number", "log_index", "tx_hash", "token_id", "from_addr", "to_addr",
+                    "value_raw", "ts"],
+        "big": {"value_raw": "value"},
+        "signed": set(),
+        "addresses": ["from_addr", "to_addr"],
+        "ref": ("token_id", "token"),
+    },
+}
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("Columnar export needs pyarrow (pip install pyarrow)")
+
+def _conn():
+    return Tortoise.get_connection("default")
+
+def _ph(conn, i: int) -> str:
+    return f"${i}" if conn.capabilities.dialect == "postgres" else "?"
+
+def _to_int(v: Any) -> Optional[int]:
+    if v is None or v == "":
+        return None
+    return int(v)
+
+def _to_ts(v: Any) -> Optional[datetime]:
+    if v is None or isinstance(v, datetime):
+        return v
+    dt = datetime.fromisoformat(str(v))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def _big_columns(name: str, values: List[Optional[int]], mode: str, signed: bool = False) -> List[Tuple[str, Any]]:
+    """
+    256-bit ints as typed columns:
+      hilo    -> <name>_limb0 .. <name>_limb3, 64 bits each, least significant
+                 first: value = limb3 << 192 | limb2 << 128 | limb1 << 64 | limb0.
+                 limb3 is int64 for signed (int256) columns, else uint64, so
+                 every int256 / uint256 round-trips.
+      decimal -> decimal256(76, 0); easier to query, but cannot hold the top
+                 of the uint256 range.
+    A value the column cannot hold raises ValueError instead of being nulled.
+    """
+    if mode == "decimal":
+        limit = 10 ** DECIMAL_DIGITS
+        over = sum(1 for v in values if v is not None and not -limit < v < limit)
+        if over:
+            raise ValueError(
+                f"{over} {name} value(s) exceed {DECIMAL_DIGITS} digits and do not fit decimal256; "
+                f"export with big_ints='hilo'"
+            )
+        return [(name, pa.array([None if v is None else Decimal(v) for v in values],
+                                type=pa.decimal256(DECIMAL_DIGITS, 0)))]
+    if mode == "hilo":
+        bits = 64 * LIMBS
+        lo_bound, hi_bound = (-(1 << bits - 1), 1 << bits - 1) if signed else (0, 1 << bits)
+        over = sum(1 for v in values if v is not None and not lo_bound <= v < hi_bound)
+        if over:
+            kind = "int256" if signed else "uint256"
+            raise ValueError(f"{over} {name} value(s) outside {kind}")
+        limbs: List[List[Optional[int]]] = [[] for _ in range(LIMBS)]
+        for v in values:
+            if v is None:
+                for limb in limbs:
+                    limb.append(None)
+                continue
+            for i, limb in enumerate(limbs[:-1]):
+                limb.append(v >> 64 * i & LIMB_MASK)
+            limbs[-1].append(v >> 64 * (LIMBS - 1))  # arithmetic shift: keeps the sign
+        return [
+            (f"{name}_limb{i}", pa.array(limb, type=pa.int64() if signed and i == LIMBS - 1 else pa.uint64()))
+            for i, limb in enumerate(limbs)
+        ]
+    raise ValueError(f"Unknown big_ints mode: {mode}")
+
+def _addresses(values: Sequence[Optional[str]]):
+    return pa.array(values, type=pa.string()).dictionary_encode()
+
+class ExportState:
+    """
+    out_dir/_state.json, written atomically:
+        {"version": 1, "tables": {"swaps": {"last_id": 123}, ...}, "updated_at": <unix>}
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Dict[str, Dict[str, int]]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if data.get("version") != self.VERSION:
+            raise ValueError(f"{self.path}: unsupported export state version {data.get('version')!r}")
+        return data["tables"]
+
+    def save(self, tables: Dict[str, Dict[str, int]]) -> None:
+        write_json_atomic(self.path, {"version": self.VERSION, "tables": tables, "updated_at": int(time.time())})
+
+def _write(table, path: str, fmt: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        pq.write_table(table, tmp, compression="zstd")
+    else:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as w:
+            w.write_table(table)
+    os.replace(tmp, path)
+
+
+class Exporter:
+    """
+    Streams swaps/transfers out of the DB in block-range batches into
+    partitioned Parquet (or Arrow IPC) files, plus tokens/pools snapshots.
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        fmt: str = "parquet",
+        big_ints: str = "hilo",
+        batch_rows: int = 200_000,
+    ):
+        _require_pyarrow()
+        if fmt not in ("parquet", "arrow"):
+            raise ValueError(f"Unknown format: {fmt}")
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.ext = "parquet" if fmt == "parquet" else "arrow"
+        self.big_ints = big_ints
+        self.batch_rows = batch_rows
+        self.state = ExportState(os.path.join(out_dir, "_state.json"))
+
+    # ---------------------------------------------------------------
+    # dimension tables
+    # ---------------------------------------------------------------
+    async def export_dimensions(self) -> Tuple[Dict[int, str], Dict[int, str]]:
+        """Rewrite tokens/pools; returns id -> address maps for the event tables."""
+        conn = _conn()
+        _, tokens = await conn.execute_query("SELECT id, address, symbol, decimals FROM tokens ORDER BY id")
+        _, pools = await conn.execute_query(
+            "SELECT id, address, token0_id, token1_id, fee FROM pools ORDER BY id"
+        )
+        token_addr = {r["id"]: r["address"] for r in tokens}
+        pool_addr = {r["id"]: r["address"] for r in pools}
+        _write(pa.table({
+            "id": pa.array([r["id"] for r in tokens], type=pa.int32()),
+            "address": pa.array([r["address"] for r in tokens], type=pa.string()),
+            "symbol": pa.array([r["symbol"] for r in tokens], type=pa.string()),
+            "decimals": pa.array([r["decimals"] for r in tokens], type=pa.int16()),
+        }), os.path.join(self.out_dir, f"tokens.{self.ext}"), self.fmt)
+        _write(pa.table({
+            "id": pa.array([r["id"] for r in pools], type=pa.int32()),
+            "address": pa.array([r["address"] for r in pools], type=pa.string()),
+            "token0_id": pa.array([r["token0_id"] for r in pools], type=pa.int32()),
+            "token1_id": pa.array([r["token1_id"] for r in pools], type=pa.int32()),
+            "token0": _addresses([token_addr.get(r["token0_id"]) for r in pools]),
+            "token1": _addresses([token_addr.get(r["token1_id"]) for r in pools]),
+            "fee": pa.array([r["fee"] for r in pools], type=pa.int32()),
+        }), os.path.join(self.out_dir, f"pools.{self.ext}"), self.fmt)
+        return token_addr, pool_addr
+
+    # ---------------------------------------------------------------
+    # event tables
+    # ---------------------------------------------------------------
+    async def _batches(self, table: str, after_id: int) -> AsyncIterator[List[Any]]:
+        """Rows with id > after_id, batch_rows at a time, in id order (keyset pagination)."""
+        conn = _conn()
+        cols = ", ".join(EVENT_TABLES[table]["columns"])
+        while True:
+            _, rows = await conn.execute_query(
+                f"SELECT id, {cols} FROM {table} WHERE id > {_ph(conn, 1)} ORDER BY id LIMIT {int(self.batch_rows)}",
+                [after_id],
+            )
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.batch_rows:
+                return
+            after_id = rows[-1]["id"]
+
+    def _to_arrow(self, table: str, rows: List[Any], refs: Dict[int, str]):
+        spec = EVENT_TABLES[table]
+        ref_col, ref_name = spec["ref"]
+        cols: List[Tuple[str, Any]] = [
+            ("block_number", pa.array([r["block_number"] for r in rows], type=pa.int64())),
+            ("log_index", pa.array([r["log_index"] for r in rows], type=pa.int32())),
+            ("tx_hash", pa.array([r["tx_hash"] for r in rows], type=pa.string())),
+            (ref_col, pa.array([r[ref_col] for r in rows], type=pa.int32())),
+            (ref_name, _addresses([refs.get(r[ref_col]) for r in rows])),
+        ]
+        for c in spec["addresses"]:
+            cols.append((c, _addresses([r[c] for r in rows])))
+        for src, name in spec["big"].items():
+            cols.extend(_big_columns(name, [_to_int(r[src]) for r in rows], self.big_ints, name in spec["signed"]))
+        if "tick" in spec["columns"]:
+            cols.append(("tick", pa.array([r["tick"] for r in rows], type=pa.int32())))
+        cols.append(("ts", pa.array([_to_ts(r["ts"]) for r in rows], type=pa.timestamp("us", tz="UTC"))))
+        return pa.table(dict(cols))
+
+    async def export_table(self, table: str, refs: Dict[int, str]) -> int:
+        """Write every row of `table` added since the last run; returns rows written."""
+        state = self.state.load()
+        last_id = state.get(table, {}).get("last_id", 0)
+        written = 0
+        async for batch in self._batches(table, last_id):
+            first, last_id = batch[0]["id"], batch[-1]["id"]
+            batch.sort(key=lambda r: (r["block_number"], r["log_index"]))
+            # named after its first id only: if a crash hits before the state
+            # is saved, the next run rewrites this same file (never a second copy)
+            path = os.path.join(self.out_dir, table, f"part_{first:012d}.{self.ext}")
+            _write(self._to_arrow(table, batch, refs), path, self.fmt)
+            written += len(batch)
+            logger.info(f"{table}: ids {first}-{last_id} (blocks {batch[0]['block_number']}-{batch[-1]['block_number']}) -> {len(batch)} rows")
+            state[table] = {"last_id": last_id}
+            self.state.save(state)
+        return written
+
+    async def run(self, tables: Sequence[str] = ("swaps", "transfers")) -> Dict[str, int]:
+        token_addr, pool_addr = await self.export_dimensions()
+        refs = {"swaps": pool_addr, "transfers": token_addr}
+        return {t: await self.export_table(t, refs[t]) for t in tables}
+
+
+async def export(
+    out_dir: str,
+    fmt: str = "parquet",
+    big_ints: str = "hilo",
+    batch_rows: int = 200_000,
+    tables: Sequence[str] = ("swaps", "transfers"),
+) -> Dict[str, int]:
+    """Incremental export of the current DB (call after init_db)."""
+    return await Exporter(out_dir, fmt, big_ints, batch_rows).run(tables)
+
+# python -m store.export exports/ [--format arrow] [--big-ints decimal] [--batch-rows N]   (uses DB_URL like store.db)
+if __name__ == "__main__":
+    from store.db import init_db, close_db
+
+    ap = argparse.ArgumentParser(description="Export swaps/transfers/pools/tokens to Parquet or Arrow")
+    ap.add_argument("out_dir")
+    ap.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    ap.add_argument(
+        "--big-ints", choices=["hilo", "decimal"], default="hilo",
+        help="hilo: four 64-bit limb columns <name>_limb0..3 (least significant first), lossless for int256/uint256; "
+             "decimal: decimal256(76, 0), the export fails on a value over 76 digits",
+    )
+    ap.add_argument("--batch-rows", type=int, default=200_000, help="rows per output file")
+    args = ap.parse_args()
+
+    async def _main():
+        await init_db()
+        res = await export(args.out_dir, args.format, args.big_ints, args.batch_rows)
+        print(f"[export] rows written: {res}")
+        await close_db()
+    logging.basicConfig(level=logging.INFO)
+    run_async(_main())
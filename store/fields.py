@@ -0,0 +1,98 @@
+# store/fields.py
+from __future__ import annotations
+from decimal import Decimal
+from typing import Any, List, Mapping, Optional, Tuple
+
+from tortoise import fields
+
+# ---------------------------------------------------------------------
+# 256-bit integer column
+#   Postgres: NUMERIC(78,0) -> exact, SUM/MIN/MAX/ORDER BY all native.
+#   SQLite has no 256-bit type, so values are stored offset by 2**256 as a
+#   fixed-width 79-digit string: lossless for every uint256 and int256, and
+#   lexicographic order == numeric order, so comparisons, MIN/MAX, ORDER BY
+#   and indexes work in SQL as-is.
+#   SUM: see sqlite_sum_sql() below.
+# ---------------------------------------------------------------------
+OFFSET = 1 << 256
+WIDTH = 79
+
+def encode_u256(value: int) -> str:
+    """int in [-2**256, 10**79 - 2**256) -> sortable 79-digit string (SQLite storage)."""
+    v = int(value) + OFFSET
+    if not 0 <= v < 10 ** WIDTH:
+        raise ValueError(f"{value} does not fit in a {WIDTH}-digit U256Field")
+    return str(v).zfill(WIDTH)
+
+def decode_u256(raw: str) -> int:
+    return int(raw) - OFFSET
+
+def _dialect(instance: Any) -> str:
+    try:
+        return instance._meta.db.capabilities.dialect
+    except Exception:
+        return "sqlite"
+
+
+class U256Field(fields.Field[int], int):
+    """
+    Signed/unsigned EVM integer (up to 256 bits) stored natively where the DB
+    can, losslessly elsewhere. Always a Python int on the model.
+    """
+
+    SQL_TYPE = f"VARCHAR({WIDTH})"
+
+    class _db_postgres:
+        SQL_TYPE = "NUMERIC(78,0)"
+
+    def to_db_value(self, value: Any, instance: Any) -> Any:
+        if value is None:
+            return None
+        if _dialect(instance) == "postgres":
+            return Decimal(int(value))
+        return encode_u256(value)
+
+    def to_python_value(self, value: Any) -> Optional[int]:
+        if value is None or isinstance(value, int):
+            return value
+        if isinstance(value, str) and len(value) == WIDTH:
+            return decode_u256(value)
+        return int(value)
+
+
+# ---------------------------------------------------------------------
+# SUM on SQLite
+#   No custom aggregate (that needs the driver's raw connection): the
+#   79-digit string is cut into 9-digit limbs, each limb is summed as a
+#   plain INTEGER in SQL (exact for up to ~9e9 rows) and the limb sums are
+#   recombined in Python.
+# ---------------------------------------------------------------------
+LIMB_DIGITS = 9
+
+def _limbs() -> List[Tuple[int, int, int]]:
+    """(substr start, length, weight) per limb, least significant first."""
+    out, end = [], WIDTH
+    while end > 0:
+        start = max(1, end - LIMB_DIGITS + 1)
+        out.append((start, end - start + 1, 10 ** (WIDTH - end)))
+        end = start - 1
+    return out
+
+_LIMBS = _limbs()
+
+def sqlite_sum_sql(expr: str, alias: str) -> str:
+    """SELECT-list fragment summing an encoded U256 expression: <alias>_n plus one <alias>_<i> per limb."""
+    parts = [f"COUNT({expr}) AS {alias}_n"]
+    parts += [
+        f"SUM(CAST(substr({expr}, {start}, {length}) AS INTEGER)) AS {alias}_{i}"
+        for i, (start, length, _) in enumerate(_LIMBS)
+    ]
+    return ", ".join(parts)
+
+def sqlite_sum_value(row: Mapping[str, Any], alias: str) -> Optional[int]:
+    """Exact SUM from a row selected with sqlite_sum_sql(); None if no non-null value."""
+    n = row[f"{alias}_n"]
+    if not n:
+        return None
+    total = sum(int(row[f"{alias}_{i}"]) * weight for i, (_, _, weight) in enumerate(_LIMBS))
+    return total - n * OFFSET
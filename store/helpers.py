@@ -1,66 +1,23 @@
 # store/helpers.py
 from __future__ import annotations
-from datetime import datetime, timezone
-from typing import Any, Dict, Tuple
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
 from tortoise.exceptions import IntegrityError
-from web3 import Web3
+from web3 import AsyncWeb3, Web3
 from .models import Token, Pool, Swap, Transfer
+from .writer import BatchWriter
+from .cache import MODELS
+from block_cache import BLOCK_TS
 
-# Simple in-process caches
-_token_cache: dict[str, int] = {}
-_pool_cache: dict[str, int] = {}
-_block_ts_cache: dict[int, datetime] = {}
+# Token/Pool instances live in the shared identity map (store.cache.MODELS)
 
-ERC20_ABI = [
-    {"name": "symbol", "outputs":[{"type":"string"}],"inputs":[],"stateMutability":"view","type":"function"},
-    {"name": "decimals","outputs":[{"type":"uint8"}],"inputs":[],"stateMutability":"view","type":"function"},
-]
-POOL_ABI = [
-    {"name":"token0","outputs":[{"type":"address"}],"inputs":[],"stateMutability":"view","type":"function"},
-    {"name":"token1","outputs":[{"type":"address"}],"inputs":[],"stateMutability":"view","type":"function"},
-    {"name":"fee","outputs":[{"type":"uint24"}],"inputs":[],"stateMutability":"view","type":"function"},
-]
+async def ensure_token(w3: AsyncWeb3, addr: str) -> Token:
+    # identity-map hit, else one batched metadata read (Multicall3 / JSON-RPC batch)
+    return await MODELS.token(w3, addr)
 
-async def ensure_token(w3: Web3, addr: str) -> Token:
-    addr = Web3.to_checksum_address(addr)
-    if addr in _token_cache:
-        return await Token.get(id=_token_cache[addr])
-    tok = await Token.get_or_none(address=addr)
-    if tok is None:
-        # Try fetch meta but don’t die if it fails
-        symbol, decimals = None, None
-        try:
-            c = w3.eth.contract(address=addr, abi=ERC20_ABI)
-            symbol = c.functions.symbol().call()
-            decimals = int(c.functions.decimals().call())
-        except Exception:
-            pass
-        tok = await Token.create(address=addr, symbol=symbol, decimals=decimals)
-    _token_cache[addr] = tok.id
-    return tok
-
-async def ensure_pool(w3: Web3, pool_addr: str) -> Pool:
-    pool_addr = Web3.to_checksum_address(pool_addr)
-    if pool_addr in _pool_cache:
-        return await Pool.get(id=_pool_cache[pool_addr])
-
-    p = await Pool.get_or_none(address=pool_addr)
-    if p is None:
-        # fetch token0/1 (+ fee if available)
-        c = w3.eth.contract(address=pool_addr, abi=POOL_ABI)
-        t0 = c.functions.token0().call()
-        t1 = c.functions.token1().call()
-        fee = None
-        try:
-            fee = int(c.functions.fee().call())
-        except Exception:
-            pass
-        tok0 = await ensure_token(w3, t0)
-        tok1 = await ensure_token(w3, t1)
-        p = await Pool.create(address=pool_addr, token0=tok0, token1=tok1, fee=fee)
-
-    _pool_cache[pool_addr] = p.id
-    return p
+async def ensure_pool(w3: AsyncWeb3, pool_addr: str) -> Pool:
+    # comes with token0/token1 attached; misses resolved like ensure_token
+    return await MODELS.pool(w3, pool_addr)
 
 def _coerce_event(evt: Dict[str, Any]) -> Dict[str, Any]:
     e = dict(evt)
@@ -73,61 +30,71 @@ def _coerce_event(evt: Dict[str, Any]) -> Dict[str, Any]:
         e["address"] = Web3.to_checksum_address(e["address"])
     return e
 
-def _block_ts(w3: Web3, block_number: int) -> datetime:
-    ts = _block_ts_cache.get(block_number)
-    if ts is None:
-        b = w3.eth.get_block(block_number)
-        ts = datetime.fromtimestamp(int(b.timestamp), tz=timezone.utc)
-        _block_ts_cache[block_number] = ts
-        if len(_block_ts_cache) > 4096:
-            _block_ts_cache.clear()
-    return ts
+async def _block_ts(w3: AsyncWeb3, block_number: int) -> datetime:
+    # same LRU (+ batched prefetch) the async handlers use; warm after aux_funcs.prefetch_block_ts
+    return await BLOCK_TS.get(w3, block_number)
 
-async def insert_swap_event(w3: Web3, evt: Dict[str, Any]) -> Tuple[Swap | None, bool]:
+async def insert_swap_event(w3: AsyncWeb3, evt: Dict[str, Any], writer: Optional[BatchWriter] = None) -> Tuple[Swap | None, bool | None]:
     """
     Returns (obj, created). Swallows duplicate via unique key (tx_hash, log_index).
+    With a writer the row is only buffered: (unsaved obj, None) until writer.flush().
+    w3 is an AsyncWeb3; the block timestamp comes from the shared BLOCK_TS, which
+    aux_funcs.prefetch_block_ts fills for a whole range in batched requests.
     """
     e = _coerce_event(evt)
     args = e.get("args", {})
     pool_addr = e["address"]
     pool = await ensure_pool(w3, pool_addr)
 
+    obj = Swap(
+        pool=pool,
+        block_number=int(e["blockNumber"]),
+        tx_hash=e["transactionHash"],
+        log_index=int(e["logIndex"]),
+        sender=args.get("sender"),
+        recipient=args.get("recipient"),
+        amount0_raw=int(args.get("amount0", 0)),
+        amount1_raw=int(args.get("amount1", 0)),
+        sqrt_price_x96=str(args.get("sqrtPriceX96", "")),
+        liquidity=str(args.get("liquidity", "")),
+        tick=int(args.get("tick", 0)) if args.get("tick") is not None else None,
+        amount0_num=int(args.get("amount0", 0)),
+        amount1_num=int(args.get("amount1", 0)),
+        sqrt_price_x96_num=int(args["sqrtPriceX96"]) if args.get("sqrtPriceX96") is not None else None,
+        liquidity_num=int(args["liquidity"]) if args.get("liquidity") is not None else None,
+        ts=await _block_ts(w3, int(e["blockNumber"])),
+    )
+    if writer is not None:
+        await writer.add(obj)
+        return obj, None
     try:
-        obj = await Swap.create(
-            pool=pool,
-            block_number=int(e["blockNumber"]),
-            tx_hash=e["transactionHash"],
-            log_index=int(e["logIndex"]),
-            sender=args.get("sender"),
-            recipient=args.get("recipient"),
-            amount0_raw=int(args.get("amount0", 0)),
-            amount1_raw=int(args.get("amount1", 0)),
-            sqrt_price_x96=str(args.get("sqrtPriceX96", "")),
-            liquidity=str(args.get("liquidity", "")),
-            tick=int(args.get("tick", 0)) if args.get("tick") is not None else None,
-            ts=_block_ts(w3, int(e["blockNumber"])),
-        )
+        await obj.save()
         return obj, True
     except IntegrityError:
         return await Swap.get_or_none(tx_hash=e["transactionHash"], log_index=int(e["logIndex"])), False
 
-async def insert_transfer_event(w3: Web3, evt: Dict[str, Any]) -> Tuple[Transfer | None, bool]:
+async def insert_transfer_event(w3: AsyncWeb3, evt: Dict[str, Any], writer: Optional[BatchWriter] = None) -> Tuple[Transfer | None, bool | None]:
     e = _coerce_event(evt)
     args = e.get("args", {})
     token_addr = e["address"]
     tok = await ensure_token(w3, token_addr)
 
+    obj = Transfer(
+        token=tok,
+        block_number=int(e["blockNumber"]),
+        tx_hash=e["transactionHash"],
+        log_index=int(e["logIndex"]),
+        from_addr=args.get("from"),
+        to_addr=args.get("to"),
+        value_raw=str(int(args.get("value", 0))),
+        value_num=int(args.get("value", 0)),
+        ts=await _block_ts(w3, int(e["blockNumber"])),
+    )
+    if writer is not None:
+        await writer.add(obj)
+        return obj, None
     try:
-        obj = await Transfer.create(
-            token=tok,
-            block_number=int(e["blockNumber"]),
-            tx_hash=e["transactionHash"],
-            log_index=int(e["logIndex"]),
-            from_addr=args.get("from"),
-            to_addr=args.get("to"),
-            value_raw=str(int(args.get("value", 0))),
-            ts=_block_ts(w3, int(e["blockNumber"])),
-        )
+        await obj.save()
         return obj, True
     except IntegrityError:
         return await Transfer.get_or_none(tx_hash=e["transactionHash"], log_index=int(e["logIndex"])), False
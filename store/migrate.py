@@ -0,0 +1,110 @@
+# store/migrate.py
+from __future__ import annotations
+from typing import Dict, List, Tuple
+
+from tortoise import Tortoise, run_async
+
+from store.fields import WIDTH, encode_u256
+
+# table -> [(new numeric column, source decimal-string column)]
+NUMERIC_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "swaps": [
+        ("amount0_num", "amount0_raw"),
+        ("amount1_num", "amount1_raw"),
+        ("sqrt_price_x96_num", "sqrt_price_x96"),
+        ("liquidity_num", "liquidity"),
+    ],
+    "transfers": [
+        ("value_num", "value_raw"),
+    ],
+}
+
+def _conn():
+    return Tortoise.get_connection("default")
+
+async def _existing_columns(table: str) -> set[str]:
+    conn = _conn()
+    if conn.capabilities.dialect == "sqlite":
+        _, rows = await conn.execute_query(f"PRAGMA table_info({table})")
+        return {r["name"] for r in rows}
+    _, rows = await conn.execute_query(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = $1", [table]
+    )
+    return {r["column_name"] for r in rows}
+
+async def add_missing_columns() -> List[str]:
+    """
+    ALTER pre-existing swaps/transfers tables to add the *_num columns.
+    Must run before generate_schemas(safe=True): that only creates missing
+    tables, and its CREATE INDEX IF NOT EXISTS on a column SQLite doesn't
+    know yet would index a string literal instead.
+    """
+    conn = _conn()
+    sql_type = "NUMERIC(78,0)" if conn.capabilities.dialect == "postgres" else f"VARCHAR({WIDTH})"
+    added = []
+    for table, cols in NUMERIC_COLUMNS.items():
+        existing = await _existing_columns(table)
+        if not existing:
+            continue
+        for col, _ in cols:
+            if col not in existing:
+                await conn.execute_script(f"ALTER TABLE {table} ADD COLUMN {col} {sql_type}")
+                added.append(f"{table}.{col}")
+    return added
+
+async def backfill_numeric(batch: int = 5000, verbose: bool = True) -> Dict[str, int]:
+    """Fill *_num from the decimal-string columns, `batch` rows at a time."""
+    conn = _conn()
+    pg = conn.capabilities.dialect == "postgres"
+    done: Dict[str, int] = {}
+    for table, cols in NUMERIC_COLUMNS.items():
+        done[table] = 0
+        src = ", ".join(s for _, s in cols)
+        null_check = " OR ".join(f"{c} IS NULL" for c, _ in cols)
+        if pg:
+            # server-side cast, no round trip through Python
+            sets = ", ".join(f"{c} = NULLIF({s}, '')::NUMERIC(78,0)" for c, s in cols)
+            while True:
+                _, rows = await conn.execute_query(
+                    f"UPDATE {table} SET {sets} WHERE id IN "
+                    f"(SELECT id FROM {table} WHERE {null_check} LIMIT {batch}) RETURNING id"
+                )
+                n = len(rows)
+                done[table] += n
+                if verbose and n:
+                    print(f"[migrate] {table}: {done[table]} rows")
+                if n < batch:
+                    break
+            continue
+        sets = ", ".join(f"{c} = ?" for c, _ in cols)
+        last_id = 0
+        while True:
+            _, rows = await conn.execute_query(
+                f"SELECT id, {src} FROM {table} WHERE id > ? AND ({null_check}) ORDER BY id LIMIT {batch}",
+                [last_id],
+            )
+            if not rows:
+                break
+            values = []
+            for r in rows:
+                enc = [encode_u256(int(r[s])) if r[s] not in (None, "") else None for _, s in cols]
+                values.append([*enc, r["id"]])
+            await conn.execute_many(f"UPDATE {table} SET {sets} WHERE id = ?", values)
+            last_id = rows[-1]["id"]
+            done[table] += len(rows)
+            if verbose:
+                print(f"[migrate] {table}: {done[table]} rows")
+    return done
+
+# python -m store.migrate   (uses DB_URL like store.db)
+if __name__ == "__main__":
+    from store.db import init_db, close_db
+
+    async def _main():
+        await init_db()
+        added = await add_missing_columns()
+        if added:
+            print(f"[migrate] added columns: {', '.join(added)}")
+        print(f"[migrate] backfilled: {await backfill_numeric()}")
+        await close_db()
+    run_async(_main())
@@ -1,6 +1,8 @@
 # store/models.py
 from tortoise import fields, models
 
+from .fields import U256Field
+
 
 class Token(models.Model):
     """
@@ -46,7 +48,9 @@ class Pool(models.Model):
 class Swap(models.Model):
     """
     Uniswap V3 Swap event.
-    Large on-chain ints stored as strings to avoid 64-bit overflow (sqrtPriceX96, liquidity).
+    Large on-chain ints are kept twice: *_raw / sqrt_price_x96 / liquidity as
+    decimal strings (as decoded), and *_num as U256Field numbers that SQL can
+    sum, compare and order (see store.fields).
     """
     id = fields.IntField(pk=True)
     pool = fields.ForeignKeyField("models.Pool", related_name="swaps")
@@ -65,6 +69,14 @@ class Swap(models.Model):
     liquidity = fields.CharField(max_length=100)       # uint128 as decimal string
     tick = fields.IntField(null=True)
 
+    # Same values as native numbers (NUMERIC(78,0) on Postgres, sortable
+    # encoding on SQLite) so sums/min/max/ORDER BY run in SQL.
+    # Nullable until `python -m store.migrate` backfills older rows.
+    amount0_num = U256Field(null=True, index=True)
+    amount1_num = U256Field(null=True, index=True)
+    sqrt_price_x96_num = U256Field(null=True)
+    liquidity_num = U256Field(null=True)
+
     # Block timestamp (UTC) you resolve via w3.eth.get_block
     ts = fields.DatetimeField(null=True, index=True)
 
@@ -78,11 +90,28 @@ class Swap(models.Model):
     def __str__(self):
         return f"<Swap {self.tx_hash}@{self.log_index} pool={self.pool_id}>"
 
+    @property
+    def amount0(self) -> int:
+        return self.amount0_num if self.amount0_num is not None else int(self.amount0_raw)
+
+    @property
+    def amount1(self) -> int:
+        return self.amount1_num if self.amount1_num is not None else int(self.amount1_raw)
+
+    @property
+    def sqrt_price(self) -> int:
+        return self.sqrt_price_x96_num if self.sqrt_price_x96_num is not None else int(self.sqrt_price_x96 or 0)
+
+    @property
+    def liquidity_int(self) -> int:
+        return self.liquidity_num if self.liquidity_num is not None else int(self.liquidity or 0)
+
 
 class Transfer(models.Model):
     """
     ERC-20 Transfer event.
-    Store raw value as string (uint256 can exceed bigint).
+    value_raw is the uint256 as a decimal string, value_num the same as a
+    U256Field number (see Swap).
     """
     id = fields.IntField(pk=True)
     token = fields.ForeignKeyField("models.Token", related_name="transfers")
@@ -95,6 +124,7 @@ class Transfer(models.Model):
     to_addr = fields.CharField(max_length=42, index=True)
 
     value_raw = fields.CharField(max_length=100)  # uint256 as decimal string
+    value_num = U256Field(null=True, index=True)   # same, as a native number (see Swap)
     ts = fields.DatetimeField(null=True, index=True)
 
     created_at = fields.DatetimeField(auto_now_add=True)
@@ -106,3 +136,148 @@ class Transfer(models.Model):
 
     def __str__(self):
         return f"<Transfer {self.tx_hash}@{self.log_index} token={self.token_id}>"
+
+    @property
+    def value(self) -> int:
+        return self.value_num if self.value_num is not None else int(self.value_raw)
+
+
+class Block(models.Model):
+    """
+    Block header cache (number -> unix timestamp) so backfills never
+    re-fetch a header. Filled by block_cache.BlockTimestamps(persist=True).
+    """
+    number = fields.IntField(pk=True)
+    timestamp = fields.BigIntField()
+
+    class Meta:
+        table = "blocks"
+
+    def __str__(self):
+        return f"<Block {self.number} @{self.timestamp}>"
+
+
+class Candle(models.Model):
+    """
+    OHLCV bar per pool and interval (seconds), built by store.candles.
+    Price = token1 per token0 in human units (decimals applied); volumes are
+    |amount| in human units. last_block/last_log_index mark the last swap
+    folded in, so incremental updates never count a swap twice.
+    """
+    id = fields.IntField(pk=True)
+    pool = fields.ForeignKeyField("models.Pool", related_name="candles")
+    interval = fields.IntField()
+    bucket = fields.BigIntField()  # unix seconds, start of the bar
+
+    open = fields.FloatField()
+    high = fields.FloatField()
+    low = fields.FloatField()
+    close = fields.FloatField()
+    volume0 = fields.FloatField(default=0)
+    volume1 = fields.FloatField(default=0)
+    swaps = fields.IntField(default=0)
+
+    last_block = fields.IntField()
+    last_log_index = fields.IntField()
+
+    class Meta:
+        table = "candles"
+        unique_together = (("pool", "interval", "bucket"),)
+
+    def __str__(self):
+        return f"<Candle pool={self.pool_id} {self.interval}s @{self.bucket}>"
+
+
+class PoolRollup(models.Model):
+    """
+    Per-pool totals per time bucket, maintained by store.rollups.
+    volume0/volume1 are exact sums of |amount| (raw units); traders is the
+    number of distinct swap senders in the bucket (see PoolTrader).
+    """
+    id = fields.IntField(pk=True)
+    pool = fields.ForeignKeyField("models.Pool", related_name="rollups")
+    interval = fields.IntField()
+    bucket = fields.BigIntField()  # unix seconds
+
+    volume0 = U256Field(default=0)
+    volume1 = U256Field(default=0)
+    swaps = fields.IntField(default=0)
+    traders = fields.IntField(default=0)
+
+    last_block = fields.IntField()
+    last_log_index = fields.IntField()
+
+    class Meta:
+        table = "pool_rollups"
+        unique_together = (("pool", "interval", "bucket"),)
+
+
+class PoolTrader(models.Model):
+    """Exact set of swap senders per pool and bucket (backs PoolRollup.traders)."""
+    id = fields.IntField(pk=True)
+    pool = fields.ForeignKeyField("models.Pool", related_name="traders")
+    interval = fields.IntField()
+    bucket = fields.BigIntField()
+    address = fields.CharField(max_length=42)
+
+    class Meta:
+        table = "pool_rollup_traders"
+        unique_together = (("pool", "interval", "bucket", "address"),)
+
+
+class TokenRollup(models.Model):
+    """
+    Per-token transfer totals per time bucket, maintained by store.rollups.
+    burned = value sent to the zero / 0x…dEaD address, minted = from zero.
+    """
+    id = fields.IntField(pk=True)
+    token = fields.ForeignKeyField("models.Token", related_name="rollups")
+    interval = fields.IntField()
+    bucket = fields.BigIntField()
+
+    transfers = fields.IntField(default=0)
+    volume = U256Field(default=0)
+    burned = U256Field(default=0)
+    minted = U256Field(default=0)
+
+    last_block = fields.IntField()
+    last_log_index = fields.IntField()
+
+    class Meta:
+        table = "token_rollups"
+        unique_together = (("token", "interval", "bucket"),)
+
+
+class Balance(models.Model):
+    """
+    Current ERC-20 balance per (token, address), kept by store.balances from
+    Transfer deltas. Signed: the zero address goes negative by the minted supply.
+    """
+    id = fields.IntField(pk=True)
+    token = fields.ForeignKeyField("models.Token", related_name="balances")
+    address = fields.CharField(max_length=42)
+    balance = U256Field(default=0)
+
+    last_block = fields.IntField()
+    last_log_index = fields.IntField()
+
+    class Meta:
+        table = "balances"
+        unique_together = (("token", "address"),)
+        indexes = (("token", "balance"), ("token", "last_block"))
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Balance at the end of `block` (a multiple of the snapshot interval),
+    written only for addresses that changed since the previous snapshot.
+    """
+    id = fields.IntField(pk=True)
+    token = fields.ForeignKeyField("models.Token", related_name="balance_snapshots")
+    address = fields.CharField(max_length=42)
+    block = fields.IntField()
+    balance = U256Field()
+
+    class Meta:
+        table = "balance_snapshots"
+        unique_together = (("token", "address", "block"),)
@@ -0,0 +1,267 @@
+# store/rollups.py
+from __future__ import annotations
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Type, Union
+
+from tortoise.expressions import Q
+from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from .models import Pool, PoolRollup, PoolTrader, Swap, Token, TokenRollup, Transfer
+
+logger = logging.getLogger("Rollups")
+
+HOUR, DAY = 3600, 86400
+ZERO = "0x0000000000000000000000000000000000000000"
+DEAD = "0x000000000000000000000000000000000000dEaD"
+BURN_ADDRESSES = {ZERO, DEAD}
+
+# row shapes handed to apply_*: (block, log_index, ts, ...)
+SWAP_FIELDS = ("block_number", "log_index", "ts", "sender", "amount0_raw", "amount1_raw")
+TRANSFER_FIELDS = ("block_number", "log_index", "ts", "from_addr", "to_addr", "value_raw")
+
+def _bucket(ts: datetime, interval: int) -> int:
+    t = int(ts.timestamp())
+    return t - t % interval
+
+def _fold_swaps(r: PoolRollup, items: List[Tuple]) -> None:
+    r.volume0 += sum(abs(int(a0)) for *_, a0, _a1 in items)
+    r.volume1 += sum(abs(int(a1)) for *_, a1 in items)
+    r.swaps += len(items)
+
+def _fold_transfers(r: TokenRollup, items: List[Tuple]) -> None:
+    r.transfers += len(items)
+    for _b, _l, _ts, frm, to, value in items:
+        v = int(value)
+        r.volume += v
+        if to in BURN_ADDRESSES:
+            r.burned += v
+        if frm == ZERO:
+            r.minted += v
+
+
+class RollupEngine:
+    """
+    Materialized per-pool / per-token totals by time bucket (hour, day).
+
+    on_flush is a BatchWriter hook, so rollups commit in the same
+    transaction as the swaps/transfers they count. Like the candles, each
+    pool/token keeps a (last_block, last_log_index) watermark: replayed rows
+    are skipped, and rows older than the watermark (an out-of-order
+    backfill) need rebuild() for their block range.
+    """
+
+    def __init__(self, intervals: Sequence[int] = (HOUR, DAY), batch_size: int = 20_000):
+        self.intervals = sorted(intervals)
+        self.batch_size = batch_size
+
+    async def _watermark(self, model: Type[Model], key: str, key_id: int, conn=None) -> Tuple[int, int]:
+        last = await (
+            model.filter(**{key: key_id}, interval=self.intervals[0])
+            .using_db(conn)
+            .order_by("-bucket")
+            .first()
+            .values_list("last_block", "last_log_index")
+        )
+        return tuple(last) if last else (-1, -1)
+
+    # ---------------------------------------------------------------
+    # BatchWriter hook
+    # ---------------------------------------------------------------
+    async def on_flush(self, conn, rows: Dict[type, List[Model]]) -> None:
+        for model, key, fields_, apply in (
+            (Swap, "pool_id", SWAP_FIELDS, self.apply_swaps),
+            (Transfer, "token_id", TRANSFER_FIELDS, self.apply_transfers),
+        ):
+            groups: Dict[int, List[Model]] = {}
+            for obj in rows.get(model, []):
+                if obj.ts is not None:
+                    groups.setdefault(getattr(obj, key), []).append(obj)
+            for key_id, objs in groups.items():
+                rollup = PoolRollup if model is Swap else TokenRollup
+                wm = await self._watermark(rollup, key, key_id, conn)
+                items = sorted(
+                    (tuple(getattr(o, f) for f in fields_) for o in objs),
+                    key=lambda r: (r[0], r[1]),
+                )
+                items = [r for r in items if (r[0], r[1]) > wm]
+                if items:
+                    await apply(conn, key_id, items)
+
+    # ---------------------------------------------------------------
+    # folding rows into buckets
+    # ---------------------------------------------------------------
+    async def _apply(
+        self,
+        conn,
+        model: Type[Model],
+        key: str,
+        key_id: int,
+        rows: List[Tuple],
+        fold: Callable[[Any, List[Tuple]], None],
+        update_fields: List[str],
+        extra: Optional[Callable] = None,
+    ) -> None:
+        for interval in self.intervals:
+            groups: Dict[int, List[Tuple]] = {}
+            for r in rows:
+                groups.setdefault(_bucket(r[2], interval), []).append(r)
+            existing = {
+                r.bucket: r
+                for r in await model.filter(**{key: key_id}, interval=interval, bucket__in=list(groups)).using_db(conn)
+            }
+            extra_counts = await extra(conn, key_id, interval, groups) if extra else {}
+            new, changed = [], []
+            for bucket, items in groups.items():
+                r = existing.get(bucket)
+                if r is None:
+                    r = model(**{key: key_id}, interval=interval, bucket=bucket)
+                    new.append(r)
+                else:
+                    changed.append(r)
+                fold(r, items)
+                if extra_counts:
+                    r.traders += extra_counts.get(bucket, 0)
+                r.last_block, r.last_log_index = items[-1][0], items[-1][1]
+            if changed:
+                await model.bulk_update(changed, fields=update_fields, using_db=conn)
+            if new:
+                await model.bulk_create(new, using_db=conn)
+
+    async def _new_traders(self, conn, pool_id: int, interval: int, groups: Dict[int, List[Tuple]]) -> Dict[int, int]:
+        """Insert unseen (bucket, sender) pairs; returns new senders per bucket."""
+        wanted: Set[Tuple[int, str]] = {(b, r[3]) for b, items in groups.items() for r in items if r[3]}
+        if not wanted:
+            return {}
+        seen = set(await PoolTrader.filter(
+            pool_id=pool_id, interval=interval,
+            bucket__in=list(groups), address__in=list({a for _, a in wanted}),
+        ).using_db(conn).values_list("bucket", "address"))
+        fresh = wanted - seen
+        if fresh:
+            await PoolTrader.bulk_create(
+                [PoolTrader(pool_id=pool_id, interval=interval, bucket=b, address=a) for b, a in fresh],
+                using_db=conn,
+            )
+        counts: Dict[int, int] = {}
+        for b, _ in fresh:
+            counts[b] = counts.get(b, 0) + 1
+        return counts
+
+    async def apply_swaps(self, conn, pool_id: int, rows: List[Tuple]) -> None:
+        """rows: SWAP_FIELDS tuples, in (block, log_index) order."""
+        await self._apply(
+            conn, PoolRollup, "pool_id", pool_id, rows, _fold_swaps,
+            ["volume0", "volume1", "swaps", "traders", "last_block", "last_log_index"],
+            extra=self._new_traders,
+        )
+
+    async def apply_transfers(self, conn, token_id: int, rows: List[Tuple]) -> None:
+        """rows: TRANSFER_FIELDS tuples, in (block, log_index) order."""
+        await self._apply(
+            conn, TokenRollup, "token_id", token_id, rows, _fold_transfers,
+            ["transfers", "volume", "burned", "minted", "last_block", "last_log_index"],
+        )
+
+    # ---------------------------------------------------------------
+    # rebuild
+    # ---------------------------------------------------------------
+    async def rebuild(self, from_block: int = 0, to_block: Optional[int] = None) -> Dict[str, int]:
+        """
+        Recompute every bucket touched by blocks [from_block, to_block].
+        Buckets are time-based, so the window is widened to whole days and
+        all rows inside it are re-read, including ones outside the block range.
+        """
+        done = {}
+        for model, key, fields_, rollup, apply in (
+            (Swap, "pool_id", SWAP_FIELDS, PoolRollup, self.apply_swaps),
+            (Transfer, "token_id", TRANSFER_FIELDS, TokenRollup, self.apply_transfers),
+        ):
+            q = model.filter(block_number__gte=from_block, ts__isnull=False)
+            if to_block is not None:
+                q = q.filter(block_number__lte=to_block)
+            first = await q.order_by("ts").first().values_list("ts", flat=True)
+            last = await q.order_by("-ts").first().values_list("ts", flat=True)
+            if first is None:
+                done[model.Meta.table] = 0
+                continue
+            span = self.intervals[-1]
+            t0, t1 = _bucket(first, span), _bucket(last, span) + span
+            await rollup.filter(bucket__gte=t0, bucket__lt=t1).delete()
+            if model is Swap:
+                await PoolTrader.filter(bucket__gte=t0, bucket__lt=t1).delete()
+
+            lo, hi = datetime.fromtimestamp(t0, first.tzinfo), datetime.fromtimestamp(t1, first.tzinfo)
+            wm, n = (-1, -1), 0
+            while True:
+                page = await (
+                    model.filter(ts__gte=lo, ts__lt=hi)
+                    .filter(Q(block_number__gt=wm[0]) | Q(block_number=wm[0], log_index__gt=wm[1]))
+                    .order_by("block_number", "log_index")
+                    .limit(self.batch_size)
+                    .values_list(key, *fields_)
+                )
+                if not page:
+                    break
+                groups: Dict[int, List[Tuple]] = {}
+                for key_id, *r in page:
+                    groups.setdefault(key_id, []).append(tuple(r))
+                async with in_transaction() as conn:
+                    for key_id, items in groups.items():
+                        await apply(conn, key_id, items)
+                wm = (page[-1][1], page[-1][2])
+                n += len(page)
+            done[model.Meta.table] = n
+            logger.info(f"Rebuilt {rollup.Meta.table} from {n} rows ({t0} .. {t1})")
+        return done
+
+
+# ---------------------------------------------------------------------
+# Reads: O(buckets), never a scan of swaps/transfers
+# ---------------------------------------------------------------------
+async def _resolve(model: Type[Model], ref: Union[int, str]) -> int:
+    return ref if isinstance(ref, int) else (await model.get(address=ref)).id
+
+async def pool_stats(pool: Union[int, str], since: int, until: Optional[int] = None, interval: int = HOUR) -> Dict[str, int]:
+    """
+    Totals for a pool over [since, until) unix seconds (bucket-aligned),
+    e.g. pool_stats(monkey_lp, time.time() - 86400) for the last 24h.
+    """
+    pool_id = await _resolve(Pool, pool)
+    q = dict(pool_id=pool_id, interval=interval, bucket__gte=int(since) - int(since) % interval)
+    if until is not None:
+        q["bucket__lt"] = int(until)
+    rows = await PoolRollup.filter(**q).values_list("volume0", "volume1", "swaps")
+    traders = await PoolTrader.filter(**q).distinct().values_list("address", flat=True)
+    return {
+        "volume0": sum(r[0] for r in rows),
+        "volume1": sum(r[1] for r in rows),
+        "swaps": sum(r[2] for r in rows),
+        "traders": len(traders),
+    }
+
+async def token_stats(token: Union[int, str], since: int, until: Optional[int] = None, interval: int = HOUR) -> Dict[str, int]:
+    """Transfer count / volume / burned / minted for a token over [since, until)."""
+    token_id = await _resolve(Token, token)
+    q = dict(token_id=token_id, interval=interval, bucket__gte=int(since) - int(since) % interval)
+    if until is not None:
+        q["bucket__lt"] = int(until)
+    rows = await TokenRollup.filter(**q).values_list("transfers", "volume", "burned", "minted")
+    return {
+        name: sum(r[i] for r in rows)
+        for i, name in enumerate(("transfers", "volume", "burned", "minted"))
+    }
+
+# python -m store.rollups [from_block] [to_block]   (uses DB_URL like store.db)
+if __name__ == "__main__":
+    import sys
+    from tortoise import run_async
+    from store.db import init_db, close_db
+
+    async def _main():
+        await init_db()
+        args = [int(a) for a in sys.argv[1:3]]
+        print(f"[rollups] rebuilt: {await RollupEngine().rebuild(*args)}")
+        await close_db()
+    run_async(_main())
@@ -0,0 +1,83 @@
+# store/writer.py
+from __future__ import annotations
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+
+from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from metrics import DB_FLUSH_ROWS, DB_FLUSH_SECONDS
+
+
+class BatchWriter:
+    """
+    Write-behind buffer for event rows (Swap, Transfer, ...).
+
+    Handlers add() unsaved model instances; flush() writes everything buffered
+    with one bulk_create per model (ON CONFLICT DO NOTHING on the
+    (tx_hash, log_index) unique key) inside a single transaction.
+    A flush also happens on add() once max_rows or max_age seconds is reached.
+
+    hooks are awaited as hook(conn, rows_by_model) inside the same
+    transaction, after the inserts, so derived tables (candles, rollups)
+    commit or roll back together with the rows they are built from. The
+    rows may include duplicates that the insert ignored.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 5000,
+        max_age: float = 5.0,
+        batch_size: int = 1000,
+        hooks: Optional[List[Callable[[Any, Dict[Type[Model], List[Model]]], Awaitable]]] = None,
+    ):
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.hooks = list(hooks or [])
+        self._rows: Dict[Type[Model], List[Model]] = {}
+        self._count = 0
+        self._oldest: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    async def add(self, obj: Model) -> None:
+        self._rows.setdefault(type(obj), []).append(obj)
+        self._count += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if self._count >= self.max_rows or time.monotonic() - self._oldest >= self.max_age:
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write all buffered rows in one transaction. Returns rows submitted."""
+        async with self._lock:
+            if not self._count:
+                return 0
+            rows, count = self._rows, self._count
+            self._rows, self._count, self._oldest = {}, 0, None
+            t0 = time.perf_counter()
+            try:
+                async with in_transaction() as conn:
+                    for model, objs in rows.items():
+                        await model.bulk_create(
+                            objs,
+                            batch_size=self.batch_size,
+                            ignore_conflicts=True,
+                            using_db=conn,
+                        )
+                    for hook in self.hooks:
+                        await hook(conn, rows)
+            except BaseException:
+                # keep them for the next attempt; duplicates are ignored on insert
+                for model, objs in rows.items():
+                    self._rows.setdefault(model, [])[:0] = objs
+                self._count += count
+                self._oldest = self._oldest or time.monotonic()
+                raise
+            DB_FLUSH_SECONDS.observe(time.perf_counter() - t0)
+            DB_FLUSH_ROWS.observe(count)
+            return count
@@ -0,0 +1,114 @@
+# subscription.py
+from __future__ import annotations
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Dict, Optional
+
+import aiohttp
+from web3._utils.method_formatters import log_entry_formatter
+from web3.datastructures import AttributeDict
+
+logger = logging.getLogger("LogSubscription")
+
+
+class SubscriptionClosed(ConnectionError):
+    """The WebSocket went away; the subscription has to be reopened."""
+
+
+class LogSubscription:
+    """
+    eth_subscribe("logs") over a WebSocket JSON-RPC endpoint.
+
+        async with LogSubscription(ws_url, {"address": [...], "topics": [[...]]}) as sub:
+            log = await sub.get()   # same shape as an eth_getLogs entry
+
+    A reader task drains the socket into a queue from the moment the
+    subscription is confirmed, so logs that arrive while the caller is busy
+    (e.g. gap-filling with eth_getLogs) are kept, in arrival order.
+    get() raises SubscriptionClosed once the socket drops.
+    """
+
+    def __init__(self, url: str, filter_params: Dict[str, Any], heartbeat: float = 20, timeout: float = 10):
+        self.url = url
+        self.filter_params = filter_params
+        self.heartbeat = heartbeat
+        self.timeout = timeout
+        self.subscription_id: Optional[str] = None
+        self._ids = itertools.count(1)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._reader: Optional[asyncio.Task] = None
+        self.received = 0
+
+    async def __aenter__(self) -> "LogSubscription":
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, connect=self.timeout))
+        try:
+            self._ws = await self._session.ws_connect(self.url, heartbeat=self.heartbeat)
+            req_id = next(self._ids)
+            await self._ws.send_str(json.dumps({
+                "jsonrpc": "2.0", "id": req_id, "method": "eth_subscribe", "params": ["logs", self.filter_params],
+            }))
+            # notifications can't arrive before the id they're addressed to
+            while self.subscription_id is None:
+                msg = await asyncio.wait_for(self._ws.receive(), self.timeout)
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    raise SubscriptionClosed(f"{self.url} closed during eth_subscribe ({msg.type.name})")
+                reply = json.loads(msg.data)
+                if reply.get("id") != req_id:
+                    continue
+                if "error" in reply:
+                    raise RuntimeError(f"eth_subscribe failed on {self.url}: {reply['error']}")
+                self.subscription_id = reply["result"]
+        except BaseException:
+            await self._close()
+            raise
+        self._reader = asyncio.create_task(self._read())
+        logger.info(f"Subscribed to logs on {self.url} ({self.subscription_id})")
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        if self._ws is not None and not self._ws.closed and self.subscription_id:
+            try:
+                await self._ws.send_str(json.dumps({
+                    "jsonrpc": "2.0", "id": next(self._ids),
+                    "method": "eth_unsubscribe", "params": [self.subscription_id],
+                }))
+            except Exception:
+                pass
+        await self._close()
+
+    async def _close(self) -> None:
+        if self._ws is not None:
+            await self._ws.close()
+        if self._session is not None:
+            await self._session.close()
+
+    async def _read(self) -> None:
+        reason = "closed"
+        try:
+            async for msg in self._ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    reason = msg.type.name
+                    break
+                note = json.loads(msg.data)
+                params = note.get("params") or {}
+                if note.get("method") == "eth_subscription" and params.get("subscription") == self.subscription_id:
+                    self.received += 1
+                    self._queue.put_nowait(AttributeDict(log_entry_formatter(params["result"])))
+        except Exception as e:
+            reason = str(e) or type(e).__name__
+        self._queue.put_nowait(SubscriptionClosed(f"{self.url}: {reason}"))
+
+    async def get(self) -> AttributeDict:
+        """Next log notification; raises SubscriptionClosed once the socket is gone."""
+        item = await self._queue.get()
+        if isinstance(item, SubscriptionClosed):
+            self._queue.put_nowait(item)  # every later get() fails the same way
+            raise item
+        return item
@@ -0,0 +1,42 @@
+import asyncio
+from types import SimpleNamespace
+
+from block_cache import BlockTimestamps
+
+class _Eth:
+    def __init__(self):
+        self.calls = []
+
+    async def get_block(self, n):
+        self.calls.append(n)
+        return {"timestamp": 1_700_000_000 + 2 * n}
+
+def test_prefetch_resolves_each_block_once():
+    w3 = SimpleNamespace(eth=_Eth())
+    bt = BlockTimestamps(maxsize=4)
+
+    async def main():
+        await bt.prefetch(w3, [5, 3, 5, 4])
+        assert (await bt.get(w3, 4)).timestamp() == 1_700_000_008
+        await bt.prefetch(w3, [3, 6, 7])
+    asyncio.run(main())
+    assert w3.eth.calls == [3, 4, 5, 6, 7]
+    assert 4 in bt and 3 not in bt  # 4 was read again, 3 is the coldest
+
+def test_persistence_resumes_after_a_db_error(tmp_path):
+    from store.db import close_db, init_db
+    from store.models import Block
+
+    w3 = SimpleNamespace(eth=_Eth())
+    bt = BlockTimestamps(persist=True, persist_retry=0)
+
+    async def main():
+        await bt.prefetch(w3, [1])  # no DB yet: timestamps still resolve
+        assert bt.persist and 1 in bt
+        await init_db(f"sqlite://{tmp_path / 'db.sqlite3'}")
+        try:
+            await bt.prefetch(w3, [2, 3])
+            return sorted(await Block.all().values_list("number", flat=True))
+        finally:
+            await close_db()
+    assert asyncio.run(main()) == [2, 3]
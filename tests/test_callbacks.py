@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from abi.get_abis import get_abi
+from benchmarks.mockchain import MockChain
+from evme import AsyncEVME
+from metrics import CALLBACK_ERRORS
+
+@pytest.fixture
+def chain():
+    chain = MockChain(head=300, density=2.0, pools=1, tokens=1)
+    chain.start()
+    yield chain
+    chain.stop()
+
+@pytest.mark.parametrize("handler_workers", [0, 2])
+def test_failing_callback_is_skipped_not_fatal(chain, handler_workers):
+    seen = []
+
+    async def record(evt):
+        if evt["blockNumber"] % 7 == 0:
+            raise RuntimeError("handler bug")
+        seen.append((evt["address"], evt["blockNumber"], evt["logIndex"]))
+
+    pool, token = chain.pools[0], chain.tokens[0]
+    errors = CALLBACK_ERRORS.labels(pool, "Swap")
+    before = errors.value
+
+    async def main():
+        fetcher = AsyncEVME(
+            [chain.url],
+            {pool: get_abi("lp_pair_abi"), token: get_abi("erc20_abi")},
+            {pool: {"Swap": record}, token: {"Transfer": record}},
+            start_from_block=1,
+            handler_workers=handler_workers,
+            metrics_log_every=None,
+        )
+        try:
+            await fetcher.fetch_logs(chunk_size=50)
+        finally:
+            await fetcher.rpc.close()
+        return fetcher
+
+    fetcher = asyncio.run(main())
+    logs = [lg for n in range(1, chain.head + 1) for lg in chain.block_logs(n)]
+    ok = sorted((lg["address"], int(lg["blockNumber"], 16), int(lg["logIndex"], 16))
+                for lg in logs if int(lg["blockNumber"], 16) % 7)
+    failed_swaps = sum(1 for lg in logs if lg["address"] == pool.lower() and int(lg["blockNumber"], 16) % 7 == 0)
+    assert sorted((a.lower(), b, i) for a, b, i in seen) == ok
+    assert errors.value - before == failed_swaps > 0
+    assert fetcher.from_block == chain.head + 1
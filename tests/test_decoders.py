@@ -0,0 +1,97 @@
+from eth_abi import encode
+from hexbytes import HexBytes
+from web3 import Web3
+
+from abi.get_abis import get_abi
+from decoders import EventDecoder, LogDecoder, get_event_decoder
+
+ALICE = "0x" + "aa" * 20
+BOB = "0x" + "bb" * 20
+TOKEN = Web3.to_checksum_address("0x" + "12" * 20)
+
+ERC721_TRANSFER = {
+    "anonymous": False, "name": "Transfer", "type": "event",
+    "inputs": [
+        {"indexed": True, "name": "from", "type": "address"},
+        {"indexed": True, "name": "to", "type": "address"},
+        {"indexed": True, "name": "tokenId", "type": "uint256"},
+    ],
+}
+
+def _topic(value, typ="address"):
+    return HexBytes(encode([typ], [value]))
+
+def _log(topics, data=b"", log_index=0):
+    return {
+        "address": TOKEN, "topics": topics, "data": HexBytes(data), "logIndex": log_index,
+        "transactionIndex": 0, "transactionHash": HexBytes(b"\x01" * 32),
+        "blockHash": HexBytes(b"\x02" * 32), "blockNumber": 7,
+    }
+
+def _erc20():
+    return get_event_decoder(get_abi("erc20_abi"), "Transfer")
+
+def test_same_signature_is_keyed_by_topic_count():
+    erc20, erc721 = _erc20(), EventDecoder(ERC721_TRANSFER)
+    assert erc20.topic0 == erc721.topic0
+    assert (erc20.topic_count, erc721.topic_count) == (3, 4)
+
+    dec = LogDecoder([erc20, erc721])
+    t0 = HexBytes(erc20.topic0)
+    fungible = _log([t0, _topic(ALICE), _topic(BOB)], encode(["uint256"], [10 ** 30]))
+    nft = _log([t0, _topic(ALICE), _topic(BOB), _topic(42, "uint256")], log_index=1)
+    out = dec.decode_logs([fungible, nft])
+    assert dict(out[0]["args"]) == {"from": Web3.to_checksum_address(ALICE), "to": Web3.to_checksum_address(BOB),
+                                    "value": 10 ** 30}
+    assert dict(out[1]["args"]) == {"from": Web3.to_checksum_address(ALICE), "to": Web3.to_checksum_address(BOB),
+                                    "tokenId": 42}
+
+def test_unknown_layout_or_bad_data_decodes_to_none():
+    dec = LogDecoder([_erc20()])
+    t0 = HexBytes(_erc20().topic0)
+    logs = [
+        _log([t0, _topic(ALICE), _topic(BOB), _topic(1, "uint256")]),  # ERC-721 layout, not registered
+        _log([t0, _topic(ALICE), _topic(BOB)], b"\x00" * 5),            # truncated data
+        _log([HexBytes(b"\x09" * 32)]),                                 # unknown event
+        _log([]),                                                       # anonymous log
+        _log([t0, _topic(ALICE), _topic(BOB)], encode(["uint256"], [1])),
+    ]
+    out = dec.decode_logs(logs)
+    assert out[:4] == [None] * 4 and out[4]["args"]["value"] == 1
+
+def test_matches_web3_process_log():
+    abi = get_abi("erc20_abi")
+    contract = Web3().eth.contract(address=TOKEN, abi=abi)
+    t0 = HexBytes(_erc20().topic0)
+    log = _log([t0, _topic(ALICE), _topic(BOB)], encode(["uint256"], [123456789]))
+    ours = _erc20().decode(log)
+    theirs = contract.events.Transfer().process_log(log)
+    assert dict(ours["args"]) == dict(theirs["args"])
+    assert {k: ours[k] for k in ours if k != "args"} == {k: theirs[k] for k in ours if k != "args"}
+
+def test_fetcher_skips_a_same_signature_event_the_abi_lacks():
+    from evme import AsyncEVME
+
+    nft_addr = Web3.to_checksum_address("0x" + "34" * 20)
+
+    async def noop(evt):
+        pass
+
+    # both Transfer layouts are in the shared LogDecoder; each contract only dispatches its own
+    fetcher = AsyncEVME(
+        ["http://127.0.0.1:9"],
+        {TOKEN: get_abi("erc20_abi"), nft_addr: [ERC721_TRANSFER]},
+        {TOKEN: {"Transfer": noop}, nft_addr: {"Transfer": noop}},
+        start_from_block=1, metrics_log_every=None,
+    )
+    t0 = HexBytes(_erc20().topic0)
+    fungible = _log([t0, _topic(ALICE), _topic(BOB)], encode(["uint256"], [5]))
+    nft_layout = [t0, _topic(ALICE), _topic(BOB), _topic(9, "uint256")]
+    events = fetcher._decode_range([
+        (TOKEN, fungible),
+        (TOKEN, _log(nft_layout, log_index=1)),
+        (nft_addr, {**_log(nft_layout, log_index=2), "address": nft_addr}),
+    ])
+    assert [(evt["address"], evt["args"].get("value", evt["args"].get("tokenId"))) for _cb, evt in events] == [
+        (TOKEN, 5), (nft_addr, 9),
+    ]
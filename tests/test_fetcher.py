@@ -0,0 +1,40 @@
+import pytest
+from web3 import Web3
+
+from benchmarks.mockchain import MockChain
+from weirdTool.fetcher import iter_swaps_multi
+
+def _chain(**kw):
+    chain = MockChain(head=400, density=2.0, pools=3, tokens=4, **kw)
+    chain.start()
+    return chain
+
+def _scan(chain, **kw):
+    w3 = Web3(Web3.HTTPProvider(chain.url))
+    return list(iter_swaps_multi(w3, chain.pools, from_block=1, to_block=chain.head, block_span=50,
+                                 segment_blocks=100, verbose=False, sleep_s=0, **kw))
+
+def test_swaps_in_chain_order():
+    chain = _chain()
+    try:
+        swaps = _scan(chain, max_workers=4)
+    finally:
+        chain.stop()
+    pools = {p.lower() for p in chain.pools}
+    expected = [(int(lg["blockNumber"], 16), int(lg["logIndex"], 16))
+                for n in range(1, chain.head + 1) for lg in chain.block_logs(n) if lg["address"] in pools]
+    assert [(s.blockNumber, s.logIndex) for s in swaps] == expected
+
+def test_unrecoverable_range_raises_or_is_reported():
+    chain = _chain(error_rate=1.0)
+    seen = []
+    try:
+        with pytest.raises(RuntimeError, match="failed 2 times"):
+            _scan(chain, retries=1)
+        assert _scan(chain, retries=1, skip_failed=True, progress=seen.append) == []
+    finally:
+        chain.stop()
+    assert [(p.from_block, p.to_block) for p in seen] == [(1, 100), (101, 200), (201, 300), (301, 400)]
+    failed = seen[-1].failed
+    assert failed[0][0] == 1 and failed[-1][1] == 400
+    assert all(a[1] + 1 == b[0] for a, b in zip(failed, failed[1:]))  # every block accounted for
@@ -0,0 +1,79 @@
+import asyncio
+import random
+
+import pytest
+
+from store.fields import OFFSET, WIDTH, decode_u256, encode_u256, sqlite_sum_sql, sqlite_sum_value
+
+U256_MAX = (1 << 256) - 1
+EDGES = [0, 1, -1, U256_MAX, U256_MAX - 1, -(1 << 255), (1 << 255) - 1, 10 ** 18, -(10 ** 18)]
+
+def test_encode_decode_round_trip():
+    for v in EDGES:
+        raw = encode_u256(v)
+        assert len(raw) == WIDTH and decode_u256(raw) == v
+
+def test_encoded_order_is_numeric_order():
+    rng = random.Random(7)
+    values = EDGES + [rng.randrange(-(1 << 255), 1 << 256) for _ in range(500)]
+    assert sorted(values, key=encode_u256) == sorted(values)
+
+def test_out_of_range_raises():
+    with pytest.raises(ValueError):
+        encode_u256(-OFFSET - 1)
+    with pytest.raises(ValueError):
+        encode_u256(10 ** WIDTH - OFFSET)
+
+def test_limb_sum_is_exact_in_sqlite():
+    import sqlite3
+
+    rng = random.Random(11)
+    values = EDGES * 3 + [rng.randrange(-(1 << 255), 1 << 256) for _ in range(200)] + [None]
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.execute(f"CREATE TABLE t (v VARCHAR({WIDTH}))")
+    db.executemany("INSERT INTO t VALUES (?)", [(None if v is None else encode_u256(v),) for v in values])
+    row = db.execute(f"SELECT {sqlite_sum_sql('v', 's')} FROM t").fetchone()
+    assert sqlite_sum_value(row, "s") == sum(v for v in values if v is not None)
+    empty = db.execute(f"SELECT {sqlite_sum_sql('v', 's')} FROM t WHERE v IS NULL").fetchone()
+    assert sqlite_sum_value(empty, "s") is None
+
+def test_aggregates_and_order_by_on_the_model(tmp_path):
+    from store import aggregates
+    from store.db import close_db, init_db
+    from store.models import Pool, Swap, Token, Transfer
+
+    amounts = [U256_MAX, 5, -(1 << 255), 1 << 200, -7, (1 << 255) - 1, 0]
+    alice, bob = "0x" + "a" * 40, "0x" + "b" * 40
+
+    async def main():
+        await init_db(f"sqlite://{tmp_path / 'db.sqlite3'}")
+        try:
+            t0 = await Token.create(address="0x" + "1" * 40)
+            t1 = await Token.create(address="0x" + "2" * 40)
+            pool = await Pool.create(address="0x" + "3" * 40, token0=t0, token1=t1)
+            for i, a in enumerate(amounts):
+                await Swap.create(pool=pool, block_number=i, tx_hash="0x%064x" % i, log_index=0,
+                                  amount0_raw=str(a), amount1_raw=str(-a), sqrt_price_x96="1", liquidity="1",
+                                  amount0_num=a, amount1_num=-a)
+                value = abs(a)
+                await Transfer.create(token=t0, block_number=i, tx_hash="0x%064x" % i, log_index=1,
+                                      from_addr=bob, to_addr=alice if i % 2 else bob,
+                                      value_raw=str(value), value_num=value)
+            ordered = await Swap.all().order_by("amount0_num").values_list("amount0_num", flat=True)
+            return (
+                ordered,
+                await aggregates.pool_volume(pool.id),
+                await aggregates.holder_totals(t0.id, alice),
+                await aggregates.top_receivers(t0.id, limit=1),
+                pool.id,
+            )
+        finally:
+            await close_db()
+
+    ordered, volume, totals, top, pool_id = asyncio.run(main())
+    assert ordered == sorted(amounts)
+    assert volume == {pool_id: (sum(a for a in amounts if a > 0), sum(-a for a in amounts if -a > 0), len(amounts))}
+    received = sum(abs(a) for i, a in enumerate(amounts) if i % 2)
+    assert totals == (received, 0)
+    assert top == [(bob, sum(abs(a) for i, a in enumerate(amounts) if not i % 2))]
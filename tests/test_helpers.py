@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from benchmarks.mockchain import MockChain
+from rpc import AsyncRPCBackend
+
+@pytest.fixture
+def chain():
+    chain = MockChain(head=10, pools=2, tokens=3)
+    chain.start()
+    yield chain
+    chain.stop()
+
+def test_helpers_resolve_metadata_in_batches(chain, tmp_path):
+    from store.cache import ModelCache
+    from store.db import close_db, init_db
+    from store.models import Token
+    from store import helpers
+
+    backend = AsyncRPCBackend()
+
+    async def main(cache):
+        await init_db(f"sqlite://{tmp_path / 'db.sqlite3'}")
+        try:
+            await cache.warm()
+            # a row another process created without metadata gets it backfilled
+            await Token.create(address=chain.tokens[0])
+            w3 = await backend.connect(chain.url)
+            await cache.resolve(w3, pools=chain.pools, tokens=chain.tokens)
+            pool = await helpers.ensure_pool(w3, chain.pools[1].lower())
+            tok = await helpers.ensure_token(w3, chain.tokens[0])
+            return pool, tok, await Token.all().order_by("id").values_list("symbol", "decimals")
+        finally:
+            await close_db()
+            await backend.close()
+
+    cache = ModelCache()
+    original = helpers.MODELS
+    helpers.MODELS = cache
+    try:
+        before = chain.calls["eth_call"]
+        pool, tok, rows = asyncio.run(main(cache))
+    finally:
+        helpers.MODELS = original
+    assert (pool.token0.address, pool.token1.address) == (chain.tokens[1], chain.tokens[2])
+    assert tok.symbol == f"T{int(chain.tokens[0][-4:], 16)}"
+    assert rows == [(f"T{int(t[-4:], 16)}", 18) for t in chain.tokens]
+    # 2 pools x 3 reads, then 3 tokens x 2 reads; the helpers' lookups are hits
+    assert chain.calls["eth_call"] - before == 12
@@ -0,0 +1,58 @@
+from hexbytes import HexBytes
+
+from log_cache import LogCache, filter_key
+
+TOPIC = "0x" + "ab" * 32
+KEY = filter_key("0x" + "1" * 40, [TOPIC])
+
+def _logs(lo, hi, per_block=2):
+    return [
+        {"blockNumber": n, "logIndex": i, "address": "0x" + "1" * 40, "topics": [HexBytes(TOPIC)],
+         "data": HexBytes(b"\x01" * 32), "transactionHash": HexBytes(n.to_bytes(32, "big"))}
+        for n in range(lo, hi + 1) for i in range(per_block)
+    ]
+
+def _blocks(logs):
+    return sorted({lg["blockNumber"] for lg in logs})
+
+def test_lookup_returns_cached_logs_and_the_gaps(tmp_path):
+    cache = LogCache(str(tmp_path / "c.sqlite3"), finalized_depth=0)
+    assert cache.lookup(KEY, 1, 100) == ([], [(1, 100)])
+    cache.store(KEY, 10, 19, _logs(10, 19), head=1000)
+    cache.store(KEY, 40, 59, _logs(40, 59), head=1000)
+    cache.store(KEY, 50, 69, _logs(50, 69), head=1000)  # overlaps the previous segment
+    logs, gaps = cache.lookup(KEY, 1, 100)
+    assert gaps == [(1, 9), (20, 39), (70, 100)]
+    assert _blocks(logs) == list(range(10, 20)) + list(range(40, 70))
+    assert len(logs) == 2 * len(_blocks(logs))  # overlap not returned twice
+    assert logs[0]["topics"][0] == HexBytes(TOPIC) and isinstance(logs[0]["data"], HexBytes)
+
+    logs, gaps = cache.lookup(KEY, 45, 65)  # fully inside cached segments
+    assert gaps == [] and _blocks(logs) == list(range(45, 66))
+    assert cache.lookup(filter_key("0x" + "2" * 40, [TOPIC]), 10, 19) == ([], [(10, 19)])
+    cache.close()
+
+def test_only_finalized_blocks_are_stored(tmp_path):
+    cache = LogCache(str(tmp_path / "c.sqlite3"), finalized_depth=64)
+    assert not cache.store(KEY, 980, 1000, _logs(980, 1000), head=1000)
+    assert cache.store(KEY, 900, 1000, _logs(900, 1000), head=1000)
+    logs, gaps = cache.lookup(KEY, 900, 1000)
+    assert gaps == [(937, 1000)] and _blocks(logs)[-1] == 936
+    cache.close()
+
+def test_filter_key_normalization():
+    addr = "0x" + "Ab" * 20
+    assert filter_key(addr, [TOPIC, None, None]) == filter_key(addr.lower(), [TOPIC.upper().replace("0X", "0x")])
+    assert filter_key([addr, "0x" + "1" * 40], [[TOPIC, "0x" + "cd" * 32]]) == \
+        filter_key(["0x" + "1" * 40, addr], [["0x" + "cd" * 32, TOPIC]])
+    assert filter_key(addr, [TOPIC]) != filter_key(addr, [TOPIC, TOPIC])
+
+def test_eviction_keeps_recently_used_segments(tmp_path):
+    cache = LogCache(str(tmp_path / "c.sqlite3"), finalized_depth=0)
+    cache.store(KEY, 1, 10, _logs(1, 10), head=100)
+    cache.max_bytes = int(cache.stats()["bytes"] * 2.5)  # room for two segments
+    cache.store(KEY, 11, 20, _logs(11, 20), head=100)
+    cache.lookup(KEY, 1, 10)  # touch the older one
+    cache.store(KEY, 21, 30, _logs(21, 30), head=100)
+    assert cache.lookup(KEY, 1, 30)[1] == [(11, 20)]
+    cache.close()
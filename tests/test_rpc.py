@@ -0,0 +1,22 @@
+import asyncio
+
+from rpc import AsyncRPCBackend
+
+URL = "http://127.0.0.1:1/"
+
+def test_shared_backend_closes_after_last_release():
+    async def main():
+        backend = AsyncRPCBackend()
+        await backend.connect(URL)
+        session = backend._sessions[URL]
+        backend.retain()  # e.g. two fetchers on the process-wide backend
+        backend.retain()
+        await backend.release()
+        assert not session.closed  # the other holder still uses it
+        await backend.release()
+        assert session.closed
+        # a later user gets a fresh session, not the closed one
+        await backend.connect(URL)
+        assert not backend._sessions[URL].closed
+        await backend.close()
+    asyncio.run(main())
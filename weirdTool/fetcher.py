@@ -1,9 +1,18 @@
-from typing import Iterable, List, Optional, Dict, Any, Tuple, Callable
-from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Dict, Any, Tuple, Callable, Deque
+from dataclasses import dataclass, field
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
+import heapq
+import time
 from web3 import Web3
-from web3._utils.events import get_event_data
 from hexbytes import HexBytes
+from adaptive_range import AdaptiveRange
+from decoders import get_event_decoder
+from log_cache import LogCache, filter_key
+
+# blocks per segment: the unit of ordering / dedup / progress in iter_swaps_multi
+SEGMENT_BLOCKS = 50_000
 
 SWAP_EVENT_ABI = {
     "anonymous": False,
@@ -41,13 +50,14 @@ def _topic_addr(addr: str) -> str:
     a = Web3.to_checksum_address(addr)
     return "0x" + "00"*12 + a.lower().replace("0x","")
 
+_SWAP_DECODER = get_event_decoder(SWAP_EVENT_ABI)
+
 def _decode_swap(w3: Web3, log: Dict[str, Any]) -> DecodedSwap:
-    ev = get_event_data(w3.codec, SWAP_EVENT_ABI, log)
-    args = ev["args"]
+    args = _SWAP_DECODER.decode_args(log["topics"], log["data"])
     return DecodedSwap(
         pool=log["address"],
         blockNumber=log["blockNumber"],
-        txHash=ev["transactionHash"].hex(),
+        txHash=log["transactionHash"].hex(),
         logIndex=log["logIndex"],
         sender=args["sender"],
         recipient=args["recipient"],
@@ -58,7 +68,122 @@ def _decode_swap(w3: Web3, log: Dict[str, Any]) -> DecodedSwap:
         tick=int(args["tick"]),
     )
 
-def get_swaps_multi(
+@dataclass
+class ScanProgress:
+    from_block: int          # segment just yielded
+    to_block: int
+    blocks_done: int
+    blocks_total: int
+    logs: int                # raw logs fetched so far
+    swaps: int               # swaps yielded so far
+    elapsed: float
+    failed: List[Tuple[int, int]] = field(default_factory=list)  # ranges given up on (skip_failed=True)
+
+    @property
+    def blocks_per_s(self) -> float:
+        return self.blocks_done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def swaps_per_s(self) -> float:
+        return self.swaps / self.elapsed if self.elapsed else 0.0
+
+def _sweep(
+    w3: Web3,
+    ranges: AdaptiveRange,
+    address: Any,
+    topics: List[Any],
+    key: Any,
+    seg_lo: int,
+    seg_hi: int,
+    block_span: Optional[int],
+    retries: int,
+    sleep_s: float,
+    verbose: bool,
+    cache: Optional[LogCache] = None,
+    head: Optional[int] = None,
+    failed: Optional[List[Tuple[int, int]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    eth_getLogs over [seg_lo, seg_hi] with adaptive sub-ranges and retries.
+    With a cache, only the gaps it doesn't hold are requested.
+    A range that still fails after `retries` raises RuntimeError, or with a
+    `failed` list is appended to it and skipped.
+    """
+    label = f"{address[:8]}.." if isinstance(address, str) else f"{len(address)} pools"
+    if cache is None:
+        return _sweep_gap(w3, ranges, address, topics, key, seg_lo, seg_hi,
+                          block_span, retries, sleep_s, verbose, label, failed=failed)
+    fkey = filter_key(address, topics)
+    logs, gaps = cache.lookup(fkey, seg_lo, seg_hi)
+    if verbose and logs:
+        print(f"[{label}] blocks {seg_lo}-{seg_hi} → {len(logs)} logs from cache, {len(gaps)} gap(s)")
+    for gap_lo, gap_hi in gaps:
+        logs.extend(_sweep_gap(w3, ranges, address, topics, key, gap_lo, gap_hi,
+                               block_span, retries, sleep_s, verbose, label, cache, fkey, head, failed))
+    return logs
+
+def _sweep_gap(
+    w3: Web3,
+    ranges: AdaptiveRange,
+    address: Any,
+    topics: List[Any],
+    key: Any,
+    seg_lo: int,
+    seg_hi: int,
+    block_span: Optional[int],
+    retries: int,
+    sleep_s: float,
+    verbose: bool,
+    label: str,
+    cache: Optional[LogCache] = None,
+    fkey: Optional[str] = None,
+    head: Optional[int] = None,
+    failed: Optional[List[Tuple[int, int]]] = None,
+) -> List[Dict[str, Any]]:
+    logs: List[Dict[str, Any]] = []
+    lo = seg_lo
+    while lo <= seg_hi:
+        span = ranges.span(key, block_span)
+        hi = min(lo + span - 1, seg_hi)
+        attempt = 0
+        while True:
+            try:
+                flt = {
+                    "fromBlock": lo, "toBlock": hi,
+                    "address": address,
+                    "topics": topics,
+                }
+                got = w3.eth.get_logs(flt)
+                if verbose:
+                    print(f"[{label}] blocks {lo}-{hi} → {len(got)} logs")
+                ranges.on_success(key, hi - lo + 1, len(got))
+                if cache is not None:
+                    cache.store(fkey, lo, hi, got, head)
+                logs.extend(got)
+                break
+            except Exception as e:
+                if hi > lo and ranges.on_error(key, hi - lo + 1, e):
+                    hi = min(lo + ranges.span(key) - 1, seg_hi)
+                    if verbose:
+                        print(f"[{label}] range too heavy, span → {hi - lo + 1}: {e}")
+                    continue
+                attempt += 1
+                if attempt > retries:
+                    if failed is None:
+                        raise RuntimeError(f"[{label}] eth_getLogs for blocks {lo}-{hi} failed {attempt} times: {e}") from e
+                    print(f"[{label}] blocks {lo}-{hi} ✖ error: {e} (skipped)")
+                    failed.append((lo, hi))
+                    break
+                if verbose:
+                    print(f"[{label}] blocks {lo}-{hi} ! retry {attempt}/{retries}: {e}")
+                sleep(sleep_s * attempt)
+        lo = hi + 1
+    return logs
+
+def _log_key(lg: Dict[str, Any]) -> Tuple[int, int]:
+    return (lg["blockNumber"], lg["logIndex"])
+
+def iter_swaps_multi(
     w3: Web3,
     pools: Iterable[str],
     *,
@@ -66,75 +191,128 @@ def get_swaps_multi(
     role: str = "any",                     # "sender" | "recipient" | "any"
     from_block: int = 0,
     to_block: int | str = "latest",
-    block_span: Optional[int] = 5000,
+    block_span: Optional[int] = 5000,      # initial span; adapted per lane
     verbose: bool = True,                  # <— progress prints
     retries: int = 3,                      # simple retry per chunk
     sleep_s: float = 0.8,                  # backoff base
-) -> List[DecodedSwap]:
+    ranges: Optional[AdaptiveRange] = None,  # share one to remember spans across calls
+    max_workers: int = 8,                  # concurrent eth_getLogs cap
+    multi_address: bool = True,            # one request for all pools (False if the RPC rejects address lists)
+    segment_blocks: int = SEGMENT_BLOCKS,  # unit of ordering / dedup / progress
+    lookahead: Optional[int] = None,       # segments in flight (default: max_workers)
+    progress: Optional[Callable[[ScanProgress], None]] = None,
+    cache: Optional[LogCache] = None,      # read-through on-disk log cache
+    skip_failed: bool = False,             # skip ranges that fail every retry (see ScanProgress.failed) instead of raising
+) -> Iterator[DecodedSwap]:
+    """
+    Streaming get_swaps_multi: yields decoded swaps in (blockNumber, logIndex)
+    order as soon as the block segment they fall in is complete.
+
+    Work is split into lanes (all pools in one address-list filter, or one
+    lane per pool) x roles x block segments, run on a thread pool of
+    max_workers with at most `lookahead` segments in flight. The per-lane
+    results of a segment are k-way merged (heapq.merge) and deduped within
+    that segment only: the same log can only show up twice in one block.
+    role="any" costs two requests per range (user as topic1, then topic2)
+    for all pools together.
+
+    A range that still fails after `retries` raises RuntimeError: the swaps
+    would otherwise be silently incomplete. With skip_failed=True it is
+    skipped instead and listed in ScanProgress.failed.
+    """
     pools = [Web3.to_checksum_address(p) for p in pools]
     topic0 = _topic0_for_swap(w3)
     user_topic = _topic_addr(user) if user else None
 
-    end = w3.eth.block_number if to_block == "latest" else int(to_block)
+    head = w3.eth.block_number if to_block == "latest" or cache is not None else None
+    end = head if to_block == "latest" else int(to_block)
     start = int(from_block)
-    def ranges() -> Iterable[Tuple[int,int]]:
-        if not block_span:
-            yield start, end
-        else:
-            cur = start
-            while cur <= end:
-                hi = min(cur + block_span - 1, end)
-                yield cur, hi
-                cur = hi + 1
-
-    def fetch_one(pool_addr: str, role_: str) -> List[Dict[str, Any]]:
-        logs: List[Dict[str, Any]] = []
-        topics = [topic0, None, None]
-        if user_topic:
+    if ranges is None:
+        # block_span=None keeps the old "one request per pool" start, but may still shrink
+        full = end - start + 1
+        ranges = AdaptiveRange(initial=block_span or full, max_span=max(100_000, full))
+
+    lanes: List[Any] = [pools] if multi_address and len(pools) > 1 else pools
+    if not user_topic:
+        roles: List[Optional[str]] = [None]
+    elif role == "any":
+        roles = ["sender", "recipient"]
+    else:
+        roles = [role]
+    jobs_per_segment = []
+    for address in lanes:
+        for role_ in roles:
+            topics = [topic0, None, None]
             if role_ == "sender":    topics[1] = user_topic
             elif role_ == "recipient": topics[2] = user_topic
-        for lo, hi in ranges():
-            attempt = 0
-            while True:
-                try:
-                    flt = {
-                        "fromBlock": lo, "toBlock": hi,
-                        "address": pool_addr,
-                        "topics": topics,
-                    }
-                    got = w3.eth.get_logs(flt)
-                    if verbose:
-                        print(f"[{pool_addr[:8]}..] blocks {lo}-{hi} → {len(got)} logs")
-                    logs.extend(got)
-                    break
-                except Exception as e:
-                    attempt += 1
-                    if attempt > retries:
-                        if verbose:
-                            print(f"[{pool_addr[:8]}..] blocks {lo}-{hi} ✖ error: {e} (giving up)")
-                        break
-                    if verbose:
-                        print(f"[{pool_addr[:8]}..] blocks {lo}-{hi} ! retry {attempt}/{retries}: {e}")
-                    sleep(sleep_s * attempt)
-        return logs
-
-    raw_logs: List[Dict[str, Any]] = []
-    for pool_addr in pools:
-        if user and role == "any":
-            raw_logs.extend(fetch_one(pool_addr, "sender"))
-            raw_logs.extend(fetch_one(pool_addr, "recipient"))
-        else:
-            raw_logs.extend(fetch_one(pool_addr, role))
-
-    # Dedup + decode
-    seen = set(); decoded: List[DecodedSwap] = []
-    for lg in raw_logs:
-        key = (lg["transactionHash"].hex(), lg["logIndex"])
-        if key in seen: continue
-        seen.add(key)
-        decoded.append(_decode_swap(w3, lg))
-
-    decoded.sort(key=lambda x: (x.blockNumber, x.logIndex))
+            key = (address if isinstance(address, str) else tuple(address), role_)
+            jobs_per_segment.append((address, topics, key))
+
+    seg = max(1, segment_blocks)
+    segments = deque((lo, min(lo + seg - 1, end)) for lo in range(start, end + 1, seg))
+    lookahead = max(1, lookahead or max_workers)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    in_flight: Deque[Tuple[int, int, List[Any], List[Any]]] = deque()
+    t0 = time.monotonic()
+    n_logs = n_swaps = blocks_done = 0
+    failed: List[Tuple[int, int]] = []
+    try:
+        while segments or in_flight:
+            while segments and len(in_flight) < lookahead:
+                lo, hi = segments.popleft()
+                # one list per job, so worker threads never append to the same one
+                job_failed = [[] if skip_failed else None for _ in jobs_per_segment]
+                futs = [
+                    executor.submit(_sweep, w3, ranges, address, topics, key, lo, hi,
+                                    block_span, retries, sleep_s, verbose, cache, head, jf)
+                    for (address, topics, key), jf in zip(jobs_per_segment, job_failed)
+                ]
+                in_flight.append((lo, hi, futs, job_failed))
+            lo, hi, futs, job_failed = in_flight.popleft()
+            parts = [sorted(f.result(), key=_log_key) for f in futs]
+            for jf in job_failed:
+                failed.extend(jf or ())
+            n_logs += sum(len(p) for p in parts)
+            last = None
+            for lg in heapq.merge(*parts, key=_log_key):
+                k = _log_key(lg)
+                if k == last:
+                    continue
+                last = k
+                n_swaps += 1
+                yield _decode_swap(w3, lg)
+            blocks_done += hi - lo + 1
+            if progress:
+                progress(ScanProgress(lo, hi, blocks_done, end - start + 1, n_logs, n_swaps,
+                                      time.monotonic() - t0, sorted(failed)))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def get_swaps_multi(
+    w3: Web3,
+    pools: Iterable[str],
+    *,
+    user: Optional[str] = None,           # filter by user address
+    role: str = "any",                     # "sender" | "recipient" | "any"
+    from_block: int = 0,
+    to_block: int | str = "latest",
+    block_span: Optional[int] = 5000,      # initial span; adapted per lane
+    verbose: bool = True,                  # <— progress prints
+    retries: int = 3,                      # simple retry per chunk
+    sleep_s: float = 0.8,                  # backoff base
+    ranges: Optional[AdaptiveRange] = None,  # share one to remember spans across calls
+    max_workers: int = 8,                  # concurrent eth_getLogs cap
+    multi_address: bool = True,            # one request for all pools (False if the RPC rejects address lists)
+    segment_blocks: int = SEGMENT_BLOCKS,  # unit of ordering / dedup / progress
+    cache: Optional[LogCache] = None,      # read-through on-disk log cache
+) -> List[DecodedSwap]:
+    """All of iter_swaps_multi() as a list (sorted, deduped)."""
+    decoded = list(iter_swaps_multi(
+        w3, pools, user=user, role=role, from_block=from_block, to_block=to_block,
+        block_span=block_span, verbose=verbose, retries=retries, sleep_s=sleep_s,
+        ranges=ranges, max_workers=max_workers, multi_address=multi_address,
+        segment_blocks=segment_blocks, cache=cache,
+    ))
     if verbose:
         print(f"Done. total decoded swaps: {len(decoded)}")
     return decoded
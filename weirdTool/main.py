@@ -2,7 +2,8 @@ from typing import Iterable, List, Optional, Dict, Any, Tuple, Callable
 from dataclasses import dataclass
 from time import sleep
 from web3 import Web3
-from weirdTool.fetcher import get_swaps_multi
+from weirdTool.fetcher import iter_swaps_multi, ScanProgress
+from log_cache import LogCache
 
 w3 = Web3(Web3.HTTPProvider("https://evm.shidoscan.net/"))
 POOLS = [
@@ -11,7 +12,11 @@ POOLS = [
     "0x7cf3600309337c77453123FB2e695c508C61Ed12",
     "0x7b65b7cf3c8b20a2c6f034d329b70daf84258e50"
 ]
-swaps = get_swaps_multi(w3, POOLS, user="0x386f4A00d86e783b9a0f83A7A767f6384b94e529", from_block=4_790_000, to_block="latest", block_span=10000, verbose=True)
-print("first 3:")
-for s in swaps[:3]:
+
+def show_progress(p: ScanProgress) -> None:
+    print(f"-- blocks {p.blocks_done:,}/{p.blocks_total:,} | {p.swaps} swaps | "
+          f"{p.blocks_per_s:,.0f} blk/s, {p.swaps_per_s:,.1f} swaps/s")
+
+# swaps come out in block order while the scan is still running
+for s in iter_swaps_multi(w3, POOLS, user="0x386f4A00d86e783b9a0f83A7A767f6384b94e529", from_block=4_790_000, to_block="latest", block_span=10000, verbose=False, progress=show_progress, cache=LogCache("shido_logs.sqlite3")):
     print(s.blockNumber, s.txHash, s.pool, s.sender, s.recipient, s.amount0, s.amount1)